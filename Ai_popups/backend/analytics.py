@@ -0,0 +1,214 @@
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from interactions import ItemLookup
+
+# Interaction actions the aggregates understand
+IMPRESSION_ACTION = "popup_shown"
+CLOSE_ACTION = "popup_closed"
+CONVERSION_ACTION = "add_to_cart"
+
+
+def item_details(row: Dict[str, Any], item_lookup: ItemLookup) -> Optional[Tuple[str, float, float]]:
+    """(category, original_price, current_price) stored with the event, or looked up for
+    rows written before events carried them; None if the item is unknown"""
+    if row.get("category") is not None:
+        return row["category"], row["original_price"], row["current_price"]
+    return item_lookup(row["item_id"]) if row.get("item_id") else None
+
+
+class InteractionAggregates:
+    """Running dashboard counters, updated in O(1) per interaction event.
+
+    Reading the summary never touches the raw event log; the log is only
+    replayed once through InteractionQueue.replay() when the process starts.
+    """
+
+    def __init__(self, item_lookup: ItemLookup, top_categories: int = 3):
+        self.item_lookup = item_lookup
+        self.top_categories = top_categories
+        self.reset()
+
+    def reset(self):
+        self.events = 0
+        self.popups_shown = 0
+        self.popups_closed = 0
+        self.conversions = 0
+        self.discount_total = 0.0
+        self.discount_count = 0
+        self.revenue = 0.0
+        self.category_conversions: Counter = Counter()
+
+    def apply(self, row: Dict[str, Any]):
+        """Fold one interaction row (see interactions.to_row) into the counters"""
+        self.events += 1
+        action = row.get("action")
+        if action == IMPRESSION_ACTION:
+            self.popups_shown += 1
+        elif action == CLOSE_ACTION:
+            self.popups_closed += 1
+        elif action == CONVERSION_ACTION:
+            self.conversions += 1
+            data = row.get("data") or {}
+            discount = data.get("discount_used")
+            reported = isinstance(discount, (int, float))
+            if reported:
+                self.discount_total += discount
+                self.discount_count += 1
+            item = item_details(row, self.item_lookup)
+            if item is not None:
+                category, original_price, current_price = item
+                self.category_conversions[category] += 1
+                # The discount is the total off the original price, markdown included
+                self.revenue += original_price * (1 - discount / 100) if reported else current_price
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total_popups_shown": self.popups_shown,
+            "conversion_rate": round(self.conversions / self.popups_shown, 4) if self.popups_shown else 0.0,
+            "average_discount": round(self.discount_total / self.discount_count, 1) if self.discount_count else 0,
+            "items_saved_from_waste": self.conversions,
+            "revenue_generated": round(self.revenue, 2),
+            "top_categories": [
+                {"category": category, "conversions": conversions}
+                for category, conversions in self.category_conversions.most_common(self.top_categories)
+            ],
+        }
+
+
+# Per-bucket counter slots
+IMPRESSIONS, CLOSES, CONVERSIONS = range(3)
+ACTION_SLOTS = {IMPRESSION_ACTION: IMPRESSIONS, CLOSE_ACTION: CLOSES, CONVERSION_ACTION: CONVERSIONS}
+
+
+class _Bucket:
+    """Impression/close/conversion counts for one time bucket, overall and by category and item"""
+
+    __slots__ = ("id", "total", "by_category", "by_item")
+
+    def __init__(self, bucket_id: int):
+        self.id = bucket_id
+        self.total = [0, 0, 0]
+        self.by_category: Dict[str, List[int]] = {}
+        self.by_item: Dict[str, List[int]] = {}
+
+    def add(self, slot: int, category: Optional[str], item_id: Optional[str], amount: int = 1):
+        self.total[slot] += amount
+        if category is not None:
+            self.by_category.setdefault(category, [0, 0, 0])[slot] += amount
+        if item_id is not None:
+            self.by_item.setdefault(item_id, [0, 0, 0])[slot] += amount
+
+    def merge(self, other: "_Bucket"):
+        for slot in range(3):
+            self.total[slot] += other.total[slot]
+        for target, source in ((self.by_category, other.by_category), (self.by_item, other.by_item)):
+            for key, counts in source.items():
+                merged = target.setdefault(key, [0, 0, 0])
+                for slot in range(3):
+                    merged[slot] += counts[slot]
+
+    def counts(self, category: Optional[str] = None, item_id: Optional[str] = None) -> List[int]:
+        if item_id is not None:
+            return self.by_item.get(item_id, [0, 0, 0])
+        if category is not None:
+            return self.by_category.get(category, [0, 0, 0])
+        return self.total
+
+
+class _Ring:
+    """Fixed number of buckets of one width, addressed by bucket id modulo size"""
+
+    def __init__(self, name: str, width: int, size: int):
+        self.name = name
+        self.width = width
+        self.size = size
+        self.slots: List[Optional[_Bucket]] = [None] * size
+        self.latest = -1
+
+
+class RollupStore:
+    """Per-minute, per-hour and per-day interaction series in fixed-size ring buffers.
+
+    Events are only written to the finest ring. When a bucket is overwritten
+    it is folded into the next coarser ring, and buckets falling off the
+    coarsest ring are dropped, so memory is bounded by the ring sizes no
+    matter how long the process runs. Queries read at most one ring of each
+    finer resolution in addition to the requested one.
+    """
+
+    def __init__(self, item_lookup: ItemLookup, resolutions=(("minute", 60, 60), ("hour", 3600, 48), ("day", 86400, 90))):
+        self.item_lookup = item_lookup
+        self.rings = [_Ring(name, width, size) for name, width, size in resolutions]
+        self.resolutions = {ring.name: level for level, ring in enumerate(self.rings)}
+
+    def reset(self):
+        for ring in self.rings:
+            ring.slots = [None] * ring.size
+            ring.latest = -1
+
+    def apply(self, row: Dict[str, Any]):
+        """Count one interaction row in the bucket for its receive time"""
+        slot = ACTION_SLOTS.get(row.get("action"))
+        if slot is None:
+            return
+        item_id = row.get("item_id")
+        item = item_details(row, self.item_lookup)
+        bucket = self._bucket_for(0, int(row["received_at"]))
+        if bucket is not None:
+            bucket.add(slot, item[0] if item is not None else None, item_id)
+
+    def _bucket_for(self, level: int, start: int) -> Optional[_Bucket]:
+        """Bucket covering `start` (epoch seconds) in ring `level`, or in a coarser
+        ring if it is too old for this one; None if it is older than every ring"""
+        while level < len(self.rings):
+            ring = self.rings[level]
+            bucket_id = start // ring.width
+            ring.latest = max(ring.latest, bucket_id)
+            if bucket_id > ring.latest - ring.size:
+                index = bucket_id % ring.size
+                existing = ring.slots[index]
+                if existing is not None and existing.id == bucket_id:
+                    return existing
+                if existing is None or existing.id < bucket_id:
+                    ring.slots[index] = bucket = _Bucket(bucket_id)
+                    if existing is not None:
+                        # The overwritten bucket ages out into the coarser ring
+                        coarser = self._bucket_for(level + 1, existing.id * ring.width)
+                        if coarser is not None:
+                            coarser.merge(existing)
+                    return bucket
+            # Too old for this ring; it belongs to a coarser resolution
+            level += 1
+        return None
+
+    def series(self, resolution: str, category: Optional[str] = None, item_id: Optional[str] = None, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Counts for each bucket of `resolution` in its window, oldest first"""
+        level = self.resolutions[resolution]
+        ring = self.rings[level]
+        now = int(now if now is not None else time.time())
+        last = now // ring.width
+        first = last - ring.size + 1
+        totals = [[0, 0, 0] for _ in range(ring.size)]
+        # Buckets not yet folded up still live in the finer rings
+        for finer in self.rings[: level + 1]:
+            for bucket in finer.slots:
+                if bucket is None:
+                    continue
+                target = bucket.id * finer.width // ring.width
+                if first <= target <= last:
+                    counts = bucket.counts(category, item_id)
+                    row = totals[target - first]
+                    for slot in range(3):
+                        row[slot] += counts[slot]
+        return [
+            {
+                "start": datetime.fromtimestamp((first + offset) * ring.width, tz=timezone.utc).isoformat(),
+                "impressions": counts[IMPRESSIONS],
+                "closes": counts[CLOSES],
+                "conversions": counts[CONVERSIONS],
+            }
+            for offset, counts in enumerate(totals)
+        ]
@@ -0,0 +1,88 @@
+"""Startup benchmark: catalog load time per file format versus building Pydantic models.
+
+Run from the backend directory:
+
+    python benchmarks/bench_catalog_load.py --sizes 10000,100000,1000000 --output load.json
+
+For each size a synthetic catalog is written as .jsonl, .csv and .npz in a
+temporary directory, then timed through load_catalog() and engine
+construction. "pydantic_models" times building validated ClearanceItem
+objects, which is what the old import-time literal catalog did.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from candidate_index import CandidateIndex  # noqa: E402
+from catalog import CatalogArrays, load_catalog, save_npz  # noqa: E402
+from models import ClearanceItem  # noqa: E402
+from synthetic import make_records  # noqa: E402
+
+FIELDS = list(ClearanceItem.model_fields)
+
+
+def write_files(directory: str, size: int, seed: int) -> Dict[str, str]:
+    paths = {fmt: os.path.join(directory, f"catalog_{size}.{fmt}") for fmt in ("jsonl", "csv", "npz")}
+    with open(paths["jsonl"], "w", encoding="utf-8") as jsonl, open(paths["csv"], "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for record in make_records(size, seed):
+            jsonl.write(json.dumps(record) + "\n")
+            writer.writerow(record)
+    save_npz(load_catalog(paths["jsonl"]), paths["npz"])
+    return paths
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 3)
+
+
+def bench_size(directory: str, size: int, seed: int) -> Dict[str, Any]:
+    paths = write_files(directory, size, seed)
+    result: Dict[str, Any] = {"catalog_size": size, "file_mb": {}, "load_s": {}}
+    for fmt, path in paths.items():
+        result["file_mb"][fmt] = round(os.path.getsize(path) / (1024 * 1024), 2)
+        result["load_s"][fmt] = timed(lambda: load_catalog(path))
+
+    catalog = load_catalog(paths["npz"])
+    result["index_build_s"] = timed(lambda: CandidateIndex(catalog))
+    result["pydantic_models_s"] = timed(lambda: [ClearanceItem(**record) for record in make_records(size, seed)])
+    return result
+
+
+def int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int_list, default=[10000, 100000, 1000000], help="comma-separated catalog sizes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = []
+        for size in args.sizes:
+            results.append(bench_size(directory, size, args.seed))
+            print(f"catalog_size={size}: load_s={results[-1]['load_s']}", file=sys.stderr)
+
+    text = json.dumps({"results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,81 @@
+"""Memory benchmark: bytes per item for Pydantic models versus the columnar catalog.
+
+Run from the backend directory:
+
+    python benchmarks/bench_memory.py --sizes 100000,1000000 --output memory.json
+
+Allocations are measured with tracemalloc (numpy buffers included).
+"pydantic_models" is a list of validated ClearanceItem objects, which is
+how the catalog used to be held; "columns" is CatalogArrays with packed
+text; "snapshot" adds the candidate and secondary indexes built per
+catalog snapshot. Retained is what stays allocated after the build, peak
+includes temporaries created while loading.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import CatalogArrays  # noqa: E402
+from catalog_store import CatalogSnapshot  # noqa: E402
+from models import ClearanceItem  # noqa: E402
+from synthetic import make_records  # noqa: E402
+
+
+def measure(build: Callable[[], Any], size: int) -> Dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return {
+        "retained_mb": round(retained / (1024 * 1024), 1),
+        "retained_bytes_per_item": round(retained / size, 1),
+        "peak_bytes_per_item": round(peak / size, 1),
+    }
+
+
+def bench_size(size: int, seed: int) -> Dict[str, Any]:
+    # Records are generated inside each build, as a loader parses them, so
+    # only what the layout keeps alive counts towards retained memory
+    result: Dict[str, Any] = {"catalog_size": size}
+    result["pydantic_models"] = measure(lambda: [ClearanceItem(**record) for record in make_records(size, seed)], size)
+    result["columns"] = measure(lambda: CatalogArrays.from_records(make_records(size, seed)), size)
+    result["snapshot"] = measure(lambda: CatalogSnapshot(CatalogArrays.from_records(make_records(size, seed)), version=1), size)
+    return result
+
+
+def int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int_list, default=[100000, 1000000], help="comma-separated catalog sizes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.append(bench_size(size, args.seed))
+        summary = {name: results[-1][name]["retained_bytes_per_item"] for name in ("pydantic_models", "columns", "snapshot")}
+        print(f"catalog_size={size}: bytes/item {summary}", file=sys.stderr)
+
+    text = json.dumps({"results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
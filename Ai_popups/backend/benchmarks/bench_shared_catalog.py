@@ -0,0 +1,119 @@
+"""Memory benchmark: private catalog copies versus one shared memory-mapped catalog.
+
+Run from the backend directory (Linux only, reads /proc/self/smaps_rollup):
+
+    python benchmarks/bench_shared_catalog.py --size 1000000 --workers 1,2,4,8
+
+For each worker count, that many processes either load their own copy of
+a synthetic catalog from .npz ("private") or map the published columns
+("shared"). Each builds a snapshot and reads every column, as a
+uvicorn worker would. Total PSS (proportional set size) across the
+workers is reported, so shared pages count once rather than per
+process.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shared_catalog  # noqa: E402
+from catalog import CatalogArrays, load_catalog, save_npz  # noqa: E402
+from catalog_store import CatalogSnapshot  # noqa: E402
+from synthetic import make_records  # noqa: E402
+
+
+def smaps_mb(field: str) -> float:
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def worker(mode: str, source: str, ready, measure_now, done):
+    baseline = smaps_mb("Pss")
+    t0 = time.perf_counter()
+    if mode == "shared":
+        catalog = shared_catalog.map_catalog(source, shared_catalog.read_manifest(source))
+    else:
+        catalog = load_catalog(source)
+    snapshot = CatalogSnapshot(catalog, version=1)
+    # Touch every column, as scoring and rendering would
+    total = float(catalog.urgency.sum() + catalog.discount_pct.sum() + catalog.stock.sum() + catalog.days.sum())
+    total += len(catalog.names.data) + len(catalog.descriptions.data) + len(catalog.image_urls.data)
+    total += snapshot.index.eligible.count()
+    load_s = time.perf_counter() - t0
+    ready.put(total)
+    # PSS splits shared pages between the processes mapping them, so only read it once all are up
+    measure_now.wait()
+    ready.put({"load_s": load_s, "pss_mb": smaps_mb("Pss") - baseline})
+    done.wait()
+
+
+def measure(mode: str, source: str, workers: int) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    ready, measure_now, done = context.Queue(), context.Event(), context.Event()
+    processes = [context.Process(target=worker, args=(mode, source, ready, measure_now, done)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get()
+    measure_now.set()
+    reports = [ready.get() for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+    return {
+        "workers": workers,
+        "catalog_pss_mb_total": round(sum(r["pss_mb"] for r in reports), 1),
+        "load_s_max": round(max(r["load_s"] for r in reports), 3),
+    }
+
+
+def int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1000000, help="catalog size")
+    parser.add_argument("--workers", type=int_list, default=[1, 2, 4, 8], help="comma-separated worker counts")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = CatalogArrays.from_records(make_records(args.size, args.seed))
+        npz_path = os.path.join(directory, "catalog.npz")
+        save_npz(catalog, npz_path)
+        shared_dir = os.path.join(directory, "shared")
+        with shared_catalog.publish_lock(shared_dir):
+            shared_catalog.publish(catalog, shared_dir, None)
+        del catalog
+
+        results = []
+        for workers in args.workers:
+            entry = {
+                "private": measure("private", npz_path, workers),
+                "shared": measure("shared", shared_dir, workers),
+            }
+            results.append(entry)
+            print(f"workers={workers}: catalog PSS private={entry['private']['catalog_pss_mb_total']}MB "
+                  f"shared={entry['shared']['catalog_pss_mb_total']}MB", file=sys.stderr)
+
+    text = json.dumps({"catalog_size": args.size, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
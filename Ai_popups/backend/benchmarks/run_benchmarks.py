@@ -0,0 +1,276 @@
+"""Micro-benchmarks and in-process load tests for the popup API.
+
+Run from the backend directory:
+
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000 --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json
+
+Each catalog size gets a fresh engine. Results are written as JSON so runs
+can be diffed; --compare exits non-zero when any p95 regressed by more
+than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+import server  # noqa: E402
+from catalog import CatalogArrays  # noqa: E402
+from catalog_store import CatalogStore  # noqa: E402
+from encoding import encode_popup  # noqa: E402
+from scoring_pool import EXECUTOR_MODES, ScoringExecutor  # noqa: E402
+from synthetic import make_profiles, make_records  # noqa: E402
+from urgency import refresh_urgency  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def latency_stats(samples: List[float], wall: float) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "throughput_per_s": round(len(samples) / wall, 2) if wall > 0 else 0.0,
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def time_calls(fn: Callable[[int], Any], iterations: int) -> Dict[str, float]:
+    samples = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return latency_stats(samples, time.perf_counter() - start)
+
+
+def micro_benchmarks(engine: "server.ClearanceEngine", profiles, iterations: int) -> Dict[str, Any]:
+    categories = [None] + list(engine.catalog.categories)
+    catalog = engine.catalog
+
+    def select(i):
+        profile = profiles[i % len(profiles)]
+        engine.select_best_items(profile, 1, categories[i % len(categories)], [])
+
+    def discount(i):
+        engine.calculate_dynamic_discount(catalog.item(i % len(catalog)), profiles[i % len(profiles)])
+
+    snapshot = engine.store.current
+    sample = [i % len(catalog) for i in range(3)]
+
+    def serialize(i):
+        server.render_popup_response(encode_popup(
+            [snapshot.item_json(position) for position in sample],
+            [40, 35, 50],
+            ["Only 2 left in stock!"] * 3,
+            ["Save money and the planet with this clearance find 🌍"] * 3,
+            90,
+        ))
+
+    now = time.time()
+
+    def urgency_pass(i):
+        # An hour apart, so each pass rewrites a large share of the catalog
+        refresh_urgency(snapshot, now + i * 3600)
+
+    return {
+        "select_best_items": time_calls(select, iterations),
+        "calculate_dynamic_discount": time_calls(discount, iterations * 10),
+        "serialize_response": time_calls(serialize, iterations * 10),
+        "urgency_refresh": time_calls(urgency_pass, max(5, iterations // 20)),
+    }
+
+
+async def asgi_request(app, method: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+    """Drive one HTTP request through the ASGI app in-process"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+async def load_test(profiles, total: int, concurrency: int, seed: int, executor: str) -> Dict[str, Any]:
+    server.scoring_executor = ScoringExecutor(server.engine.store, mode=executor)
+    await server.scoring_executor.start()
+    rng = random.Random(seed)
+    categories = [None] + list(server.engine.catalog.categories)
+    bodies = [
+        json.dumps({
+            "user_profile": profiles[i % len(profiles)].model_dump(),
+            "current_page": "home",
+            "target_category": rng.choice(categories),
+            "session_data": {"shown_popups": []},
+        }).encode()
+        for i in range(total)
+    ]
+    samples: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            body = bodies[next_index]
+            next_index += 1
+            t0 = time.perf_counter()
+            status, _ = await asgi_request(server.app, "POST", "/api/popup", body)
+            samples.append(time.perf_counter() - t0)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats = latency_stats(samples, time.perf_counter() - start)
+    fallbacks = server.scoring_executor.timeouts + server.scoring_executor.rejected
+    server.scoring_executor.shutdown()
+    return {"concurrency": concurrency, "executor": executor, "errors": errors, "fallbacks": fallbacks, **stats}
+
+
+def run(args) -> Dict[str, Any]:
+    random.seed(args.seed)
+    profiles = make_profiles(args.profiles, seed=args.seed)
+    results = []
+    for size in args.sizes:
+        t0 = time.perf_counter()
+        engine = server.ClearanceEngine(CatalogStore.from_catalog(CatalogArrays.from_records(make_records(size, seed=args.seed))))
+        build_s = time.perf_counter() - t0
+        server.engine = engine
+        server.catalog_store = engine.store
+
+        entry: Dict[str, Any] = {"catalog_size": size, "engine_build_s": round(build_s, 3)}
+        entry["micro"] = micro_benchmarks(engine, profiles, args.iterations)
+        entry["http"] = [
+            asyncio.run(load_test(profiles, args.requests, concurrency, args.seed, args.executor))
+            for concurrency in args.concurrency
+        ]
+        entry["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        results.append(entry)
+        print(f"catalog_size={size}: select p95={entry['micro']['select_best_items']['p95_ms']}ms, "
+              f"http p95={[h['p95_ms'] for h in entry['http']]}ms, peak RSS={entry['peak_rss_mb']}MB", file=sys.stderr)
+        del engine
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "requests": args.requests,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every p95 that grew by more than `tolerance` (a fraction) versus the baseline"""
+    regressions = []
+    old_by_size = {r["catalog_size"]: r for r in baseline["results"]}
+    for new in current["results"]:
+        old = old_by_size.get(new["catalog_size"])
+        if old is None:
+            continue
+        pairs = [(f"micro.{name}", old["micro"].get(name), stats) for name, stats in new["micro"].items()]
+        old_http = {h["concurrency"]: h for h in old["http"]}
+        pairs += [(f"http.c{h['concurrency']}", old_http.get(h["concurrency"]), h) for h in new["http"]]
+        for name, before, after in pairs:
+            if before and before["p95_ms"] > 0 and after["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"size={new['catalog_size']} {name}: p95 {before['p95_ms']}ms -> {after['p95_ms']}ms"
+                )
+    return regressions
+
+
+def int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int_list, default=[1000, 10000, 100000],
+                        help="comma-separated catalog sizes (up to 1000000)")
+    parser.add_argument("--concurrency", type=int_list, default=[1, 8, 32], help="comma-separated concurrency levels")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--profiles", type=int, default=1000, help="number of synthetic user profiles")
+    parser.add_argument("--executor", choices=EXECUTOR_MODES, default="inline", help="where /api/popup scoring runs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,54 @@
+"""Seeded synthetic catalogs and user profiles for benchmarks"""
+import random
+from typing import Any, Dict, Iterator, List
+
+from models import UserProfile
+
+CATEGORIES = ["electronics", "clothing", "home", "fitness", "office"]
+
+PRODUCT_WORDS = {
+    "electronics": ["Wireless", "Bluetooth", "Smart", "Portable", "Charger", "Speaker", "Headphones", "Hub"],
+    "clothing": ["Cotton", "Denim", "Jacket", "Sneakers", "Hoodie", "Scarf", "Shirt", "Boots"],
+    "home": ["Ceramic", "Bamboo", "Lamp", "Pillow", "Mug", "Blanket", "Candle", "Planter"],
+    "fitness": ["Yoga", "Resistance", "Dumbbell", "Mat", "Bottle", "Bands", "Roller", "Tracker"],
+    "office": ["Desk", "Ergonomic", "Notebook", "Organizer", "Planner", "Stapler", "Chair", "Lamp"],
+}
+
+
+def make_records(size: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Yield `size` item records spread across the existing categories.
+
+    Values follow the ranges of the hand-written catalog: 20-70% markdowns,
+    1-15 units of stock and 1-10 days until removal.
+    """
+    rng = random.Random(seed)
+    for i in range(size):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        words = PRODUCT_WORDS[category]
+        original_price = round(rng.uniform(5, 300), 2)
+        current_price = round(original_price * (1 - rng.uniform(0.2, 0.7)), 2)
+        yield {
+            "id": f"{category[0]}{i}",
+            "name": f"{rng.choice(words)} {rng.choice(words)} {i}",
+            "original_price": original_price,
+            "current_price": current_price,
+            "category": category,
+            "stock_count": rng.randint(1, 15),
+            "days_until_removal": rng.randint(1, 10),
+            "urgency_score": round(rng.uniform(0.3, 0.95), 2),
+            "image_url": f"https://images.example.com/{category}/{i}.jpg?w=400",
+            "description": f"Synthetic {category} clearance item number {i}",
+        }
+
+
+def make_profiles(count: int, seed: int = 0) -> List[UserProfile]:
+    """User profiles with 0-4 browsed and 0-2 purchased categories"""
+    rng = random.Random(seed)
+    return [
+        UserProfile(
+            user_id=f"bench_user_{i}",
+            browsing_history=rng.sample(CATEGORIES, rng.randint(0, 4)),
+            purchase_history=rng.sample(CATEGORIES, rng.randint(0, 2)),
+        )
+        for i in range(count)
+    ]
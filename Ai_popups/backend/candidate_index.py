@@ -0,0 +1,185 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+from catalog import CatalogArrays
+from scoring import clearance_mask, is_true_clearance
+
+
+class Bitset:
+    """Fixed-size bitset packed into little-endian 64-bit words"""
+
+    __slots__ = ("size", "words")
+
+    def __init__(self, size: int, words: Optional[np.ndarray] = None):
+        self.size = size
+        self.words = words if words is not None else np.zeros((size + 63) >> 6, dtype="<u8")
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "Bitset":
+        size = len(mask)
+        padded = np.zeros(((size + 63) >> 6) << 6, dtype=bool)
+        padded[:size] = mask
+        return cls(size, np.packbits(padded, bitorder="little").view("<u8"))
+
+    @classmethod
+    def from_indices(cls, size: int, indices: np.ndarray) -> "Bitset":
+        mask = np.zeros(size, dtype=bool)
+        mask[indices] = True
+        return cls.from_mask(mask)
+
+    def copy(self) -> "Bitset":
+        return Bitset(self.size, self.words.copy())
+
+    def set(self, index: int):
+        self.words[index >> 6] |= np.uint64(1 << (index & 63))
+
+    def clear(self, index: int):
+        self.words[index >> 6] &= ~np.uint64(1 << (index & 63))
+
+    def set_many(self, indices: np.ndarray):
+        np.bitwise_or.at(self.words, indices >> 6, np.left_shift(np.uint64(1), (indices & 63).astype(np.uint64)))
+
+    def clear_many(self, indices: np.ndarray):
+        np.bitwise_and.at(self.words, indices >> 6, ~np.left_shift(np.uint64(1), (indices & 63).astype(np.uint64)))
+
+    def contains_many(self, indices: np.ndarray) -> np.ndarray:
+        return ((self.words[indices >> 6] >> (indices & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+    def assign(self, index: int, value: bool):
+        if value:
+            self.set(index)
+        else:
+            self.clear(index)
+
+    def __contains__(self, index: int) -> bool:
+        return bool((int(self.words[index >> 6]) >> (index & 63)) & 1)
+
+    def __and__(self, other: "Bitset") -> "Bitset":
+        return Bitset(self.size, self.words & other.words)
+
+    def __or__(self, other: "Bitset") -> "Bitset":
+        return Bitset(self.size, self.words | other.words)
+
+    def andnot(self, other: "Bitset") -> "Bitset":
+        return Bitset(self.size, self.words & ~other.words)
+
+    def any(self) -> bool:
+        return bool(self.words.any())
+
+    def to_mask(self) -> np.ndarray:
+        return np.unpackbits(self.words.view(np.uint8), bitorder="little", count=self.size).astype(bool)
+
+    def indices(self) -> np.ndarray:
+        """Set bit positions in ascending (catalog) order"""
+        return np.flatnonzero(self.to_mask())
+
+    def count(self) -> int:
+        return int(np.unpackbits(self.words.view(np.uint8)).sum())
+
+
+class CandidateIndex:
+    """Precomputed bitsets for category membership, clearance eligibility and session exclusions.
+
+    Items past their removal time are marked in `expired` and are never eligible.
+    """
+
+    def __init__(self, catalog: CatalogArrays, max_sessions: int = 10000):
+        self.catalog = catalog
+        n = len(catalog)
+        self.all = Bitset.from_mask(np.ones(n, dtype=bool))
+        self.empty = Bitset(n)
+        self.by_category: Dict[int, Bitset] = {
+            code: Bitset.from_mask(catalog.category == code) for code in range(len(catalog.categories))
+        }
+        self.expired = Bitset(n)
+        self.eligible = Bitset.from_mask(clearance_mask(catalog))
+
+        # Per-session sorted positions of shown items, least recently used first. Kept as
+        # small arrays rather than catalog-sized bitsets, so memory follows what was shown
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, Tuple[np.ndarray, Set[str]]]" = OrderedDict()
+        # Scoring may run on several threads at once
+        self._sessions_lock = threading.Lock()
+
+    def category(self, category: Optional[str]) -> Bitset:
+        """Bitset for a category; None means the whole catalog"""
+        if not category:
+            return self.all
+        return self.by_category.get(self.catalog.category_code(category), self.empty)
+
+    def eligible_in(self, category: Optional[str]) -> Bitset:
+        """True clearance items, restricted to a category if one is given"""
+        return self.category(category) & self.eligible
+
+    def exclusions(self, session_id: str, shown_popups: Iterable[str]) -> np.ndarray:
+        """Return the session's sorted shown positions, folding in any newly shown ids"""
+        shown = shown_popups if isinstance(shown_popups, (set, frozenset)) else set(shown_popups)
+        with self._sessions_lock:
+            return self._exclusions(session_id, shown)
+
+    def _exclusions(self, session_id: str, shown: Set[str]) -> np.ndarray:
+        entry = self.sessions.get(session_id)
+        added = shown - entry[1] if entry is not None else shown
+        if entry is None or len(shown) - len(added) != len(entry[1]):
+            # New session, or the client's list is no longer a superset: rebuild from scratch
+            entry = (np.unique(self.catalog.indices_of(shown)), set(shown))
+            self.sessions[session_id] = entry
+            if len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        elif added:
+            positions, known = entry
+            entry = (np.union1d(positions, self.catalog.indices_of(added)), known | added)
+            self.sessions[session_id] = entry
+        self.sessions.move_to_end(session_id)
+        return entry[0]
+
+    def without(self, candidates: Bitset, positions: np.ndarray) -> Bitset:
+        """Copy of candidates with the given positions cleared"""
+        remaining = candidates.copy()
+        if len(positions):
+            remaining.clear_many(positions)
+        return remaining
+
+    def copy(self, catalog: CatalogArrays) -> "CandidateIndex":
+        """Index for an edited copy of this index's catalog (same item positions).
+
+        Category sets never change and are shared; eligibility, expiry and the
+        session cache are copied so the copy can be refreshed on its own.
+        """
+        index = copy.copy(self)
+        index.catalog = catalog
+        index.expired = self.expired.copy()
+        index.eligible = self.eligible.copy()
+        with self._sessions_lock:
+            index.sessions = OrderedDict(self.sessions)
+        index._sessions_lock = threading.Lock()
+        return index
+
+    def refresh_item(self, index: int):
+        """Re-evaluate eligibility for one item after its price or urgency changed"""
+        catalog = self.catalog
+        eligible = is_true_clearance(catalog.urgency[index], catalog.discount_pct[index]) and index not in self.expired
+        self.eligible.assign(index, eligible)
+
+    def refresh_items(self, indices: np.ndarray):
+        """refresh_item for an array of positions"""
+        eligible = clearance_mask(self.catalog, indices) & ~self.expired.contains_many(indices)
+        self.eligible.set_many(indices[eligible])
+        self.eligible.clear_many(indices[~eligible])
+
+    def refresh_all(self):
+        """Re-evaluate eligibility for every item; swapped in whole so readers never see a partial update"""
+        self.eligible = Bitset.from_mask(clearance_mask(self.catalog) & ~self.expired.to_mask())
+
+    def expire(self, indices: np.ndarray):
+        """Take items out of every candidate set once their clearance window has ended"""
+        self.expired.set_many(indices)
+        self.eligible.clear_many(indices)
+
+    def unexpire(self, indices: np.ndarray):
+        """Undo expire() for items given a later removal time; refresh them afterwards"""
+        self.expired.clear_many(indices)
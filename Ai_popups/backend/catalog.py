@@ -0,0 +1,389 @@
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from models import ClearanceItem
+from timestamps import parse_timestamp
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; it roughly triples .jsonl load speed
+    _json_loads = json.loads
+
+# Separator for text columns packed into one blob in .npz catalogs
+TEXT_SEPARATOR = "\x1f"
+
+DAY_SECONDS = 86400
+
+
+class TextColumn:
+    """Strings packed into one UTF-8 buffer with offsets, decoded only when an item is read.
+
+    Keeps long names, image URLs and descriptions out of per-item Python
+    str objects, which cost ~50 bytes of header each on top of the text.
+    """
+
+    __slots__ = ("data", "offsets", "present")
+
+    def __init__(self, data: Union[bytes, np.ndarray], offsets: np.ndarray, present: Optional[np.ndarray] = None):
+        # bytes, or a uint8 array when the column is memory-mapped
+        self.data = data
+        self.offsets = offsets
+        # None when every value is present
+        self.present = present
+
+    @staticmethod
+    def _offsets_dtype(total: int):
+        return np.uint32 if total < 2 ** 32 else np.int64
+
+    @classmethod
+    def from_strings(cls, values: Sequence[Optional[str]]) -> "TextColumn":
+        encoded = [(value or "").encode("utf-8") for value in values]
+        lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        present = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+        return cls(
+            b"".join(encoded),
+            offsets.astype(cls._offsets_dtype(int(offsets[-1]))),
+            None if present.all() else present,
+        )
+
+    @classmethod
+    def from_separated(cls, blob: np.ndarray, present: np.ndarray) -> "TextColumn":
+        """Build from the .npz layout: values joined by TEXT_SEPARATOR"""
+        count = len(present)
+        if count == 0:
+            return cls(b"", np.zeros(1, dtype=np.uint32))
+        separator = ord(TEXT_SEPARATOR)
+        is_separator = blob == separator
+        breaks = np.flatnonzero(is_separator)
+        if len(breaks) != count - 1:
+            raise ValueError("Text column does not match its item count")
+        starts = np.concatenate(([0], breaks + 1))
+        ends = np.concatenate((breaks, [len(blob)]))
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=offsets[1:])
+        present = np.asarray(present, dtype=bool)
+        return cls(
+            blob[~is_separator].tobytes(),
+            offsets.astype(cls._offsets_dtype(int(offsets[-1]))),
+            None if present.all() else present,
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if self.present is not None and not self.present[index]:
+            return None
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.nbytes + (self.present.nbytes if self.present is not None else 0)
+
+
+class Layout:
+    """Identity of one order of item ids.
+
+    Catalogs holding the same ids at the same positions share a Layout, so
+    per-position data derived from ids (factor rows) is computed once.
+    """
+
+    __slots__ = ("__weakref__",)
+
+
+class CatalogArrays:
+    """Struct-of-arrays view of the clearance catalog used by the scoring engine.
+
+    Numeric fields live in typed arrays, categories are interned to small
+    integer codes and free text lives in TextColumns. ClearanceItem models
+    are only built by item() when an item is actually returned from the API.
+    """
+
+    def __init__(
+        self,
+        ids: Union[List[str], TextColumn],
+        names: Union[TextColumn, Sequence[str]],
+        categories: List[str],
+        category: np.ndarray,
+        urgency: np.ndarray,
+        original_price: np.ndarray,
+        current_price: np.ndarray,
+        stock: np.ndarray,
+        days: np.ndarray,
+        image_urls: Union[TextColumn, Sequence[Optional[str]]],
+        descriptions: Union[TextColumn, Sequence[Optional[str]]],
+        discount_pct: Optional[np.ndarray] = None,
+        id_index: Optional[Mapping[str, int]] = None,
+        removal_at: Optional[np.ndarray] = None,
+        counted_from: Optional[float] = None,
+    ):
+        # ids stay plain strings, since id_to_index holds them anyway, unless a
+        # prebuilt (shared) id index is supplied
+        self.ids = ids
+        self.names = _text_column(names)
+        self.categories = categories
+        self.category_codes: Dict[str, int] = {name: code for code, name in enumerate(categories)}
+        self.category = np.asarray(category, dtype=np.int32)
+        self.urgency = np.asarray(urgency, dtype=np.float64)
+        self.original_price = np.asarray(original_price, dtype=np.float64)
+        self.current_price = np.asarray(current_price, dtype=np.float64)
+        self.stock = np.asarray(stock, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int64)
+        self.image_urls = _text_column(image_urls)
+        self.descriptions = _text_column(descriptions)
+        # Absolute removal time (Unix seconds); `days` and `urgency` are derived from it and
+        # stock by urgency.refresh_urgency. Items without one count their days down from
+        # `counted_from`: the source file's mtime when loaded from a file, so every load of
+        # the same file agrees, and otherwise now.
+        if removal_at is None:
+            removal_at = np.full(len(self.days), np.nan)
+        self.removal_at = np.asarray(removal_at, dtype=np.float64)
+        missing = np.isnan(self.removal_at)
+        if missing.any():
+            start = time.time() if counted_from is None else counted_from
+            self.removal_at = np.where(missing, start + self.days * DAY_SECONDS, self.removal_at)
+        if id_index is not None:
+            self.id_to_index = id_index
+        else:
+            self.id_to_index = {item_id: i for i, item_id in enumerate(ids)}
+            if len(self.id_to_index) != len(ids):
+                raise ValueError("Catalog contains duplicate item ids")
+
+        # Same arithmetic as the per-item code path so thresholds compare identically
+        if discount_pct is None:
+            discount_pct = ((self.original_price - self.current_price) / self.original_price) * 100
+        self.discount_pct = np.asarray(discount_pct, dtype=np.float64)
+        self.layout = Layout()
+
+    def copy_numeric(self, columns: Optional[Iterable[str]] = None) -> "CatalogArrays":
+        """Copy with private numeric columns, for editing while this catalog is still served.
+
+        Only `columns` (attribute names; default all numeric ones) are copied.
+        Ids, text, the id index and the other columns never change and are shared.
+        """
+        copied = None if columns is None else set(columns)
+
+        def column(name: str) -> np.ndarray:
+            values = getattr(self, name)
+            return values.copy() if copied is None or name in copied else values
+
+        copy = CatalogArrays(
+            self.ids, self.names, self.categories, column("category"), column("urgency"),
+            column("original_price"), column("current_price"), column("stock"), column("days"),
+            self.image_urls, self.descriptions, discount_pct=column("discount_pct"),
+            id_index=self.id_to_index, removal_at=column("removal_at"),
+        )
+        copy.layout = self.layout
+        return copy
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], source: str = "catalog", counted_from: Optional[float] = None) -> "CatalogArrays":
+        """Build columns from dicts with ClearanceItem's field names"""
+        ids, names, image_urls, descriptions = [], [], [], []
+        category, urgency, original_price, current_price, stock, days, removal_at = [], [], [], [], [], [], []
+        categories: List[str] = []
+        codes: Dict[str, int] = {}
+        for number, record in enumerate(records, 1):
+            try:
+                name = record["category"]
+                code = codes.get(name)
+                if code is None:
+                    code = codes[name] = len(categories)
+                    categories.append(name)
+                category.append(code)
+                ids.append(str(record["id"]))
+                names.append(record["name"])
+                original_price.append(float(record["original_price"]))
+                current_price.append(float(record["current_price"]))
+                stock.append(int(record["stock_count"]))
+                days.append(int(record["days_until_removal"]))
+                urgency.append(float(record["urgency_score"]))
+                removal_at.append(parse_timestamp(record.get("removal_at")))
+                image_urls.append(record.get("image_url") or None)
+                descriptions.append(record.get("description") or None)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"{source}: invalid record {number}: {e!r}") from e
+        return cls(
+            ids, names, categories, category, urgency, original_price, current_price, stock, days,
+            image_urls, descriptions, removal_at=removal_at, counted_from=counted_from,
+        )
+
+    @classmethod
+    def from_items(cls, items: Sequence[ClearanceItem]) -> "CatalogArrays":
+        return cls.from_records((vars(item) for item in items), source="items")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def item(self, index: int) -> ClearanceItem:
+        """Materialize one catalog row as a ClearanceItem (values were validated at load)"""
+        return ClearanceItem.model_construct(
+            id=self.ids[index],
+            name=self.names[index],
+            original_price=float(self.original_price[index]),
+            current_price=float(self.current_price[index]),
+            category=self.categories[self.category[index]],
+            stock_count=int(self.stock[index]),
+            days_until_removal=int(self.days[index]),
+            urgency_score=float(self.urgency[index]),
+            image_url=self.image_urls[index],
+            description=self.descriptions[index],
+        )
+
+    def items_at(self, indices: Iterable[int]) -> List[ClearanceItem]:
+        return [self.item(index) for index in indices]
+
+    # Pydantic field name (or record key) -> column attribute for fields the engine reads
+    NUMERIC_FIELDS = {
+        "urgency_score": "urgency",
+        "original_price": "original_price",
+        "current_price": "current_price",
+        "stock_count": "stock",
+        "days_until_removal": "days",
+        "removal_at": "removal_at",
+    }
+
+    def update_item(self, index: Union[int, np.ndarray], **changes):
+        """Apply numeric field changes to one item's columns, or to many given arrays of positions and values"""
+        unknown = set(changes) - set(self.NUMERIC_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported catalog update fields: {sorted(unknown)}")
+        if "days_until_removal" in changes and "removal_at" not in changes:
+            # Keep the removal time authoritative so the next urgency pass agrees
+            changes["removal_at"] = time.time() + changes["days_until_removal"] * DAY_SECONDS
+        for field, value in changes.items():
+            getattr(self, self.NUMERIC_FIELDS[field])[index] = value
+        original, current = self.original_price[index], self.current_price[index]
+        self.discount_pct[index] = ((original - current) / original) * 100
+
+    def category_code(self, category: str) -> int:
+        """Return the interned code for a category, or -1 if it is not in the catalog"""
+        return self.category_codes.get(category, -1)
+
+    def category_mask(self, categories) -> np.ndarray:
+        """Boolean mask of items whose category is in the given collection"""
+        codes = [self.category_codes[c] for c in set(categories) if c in self.category_codes]
+        if not codes:
+            return np.zeros(len(self), dtype=bool)
+        return np.isin(self.category, codes)
+
+    def indices_of(self, item_ids) -> np.ndarray:
+        """Map item ids to catalog positions, silently dropping unknown ids"""
+        lookup = self.id_to_index
+        return np.fromiter((lookup[i] for i in item_ids if i in lookup), dtype=np.int64)
+
+
+def _text_column(values) -> TextColumn:
+    return values if isinstance(values, TextColumn) else TextColumn.from_strings(values)
+
+
+def _pack_text(values: Iterable[Optional[str]]) -> Dict[str, np.ndarray]:
+    values = list(values)
+    if any(value is not None and TEXT_SEPARATOR in value for value in values):
+        raise ValueError("Text fields may not contain the \\x1f separator")
+    blob = TEXT_SEPARATOR.join(value or "" for value in values).encode("utf-8")
+    return {
+        "text": np.frombuffer(blob, dtype=np.uint8),
+        "present": np.fromiter((value is not None for value in values), dtype=bool, count=len(values)),
+    }
+
+
+def _unpack_text(text: np.ndarray, present: np.ndarray, count: int) -> List[Optional[str]]:
+    values = text.tobytes().decode("utf-8").split(TEXT_SEPARATOR) if count else []
+    if not present.all():
+        values = [value if keep else None for value, keep in zip(values, present.tolist())]
+    return values
+
+
+def save_npz(catalog: CatalogArrays, path: str):
+    """Write the catalog in the compact columnar .npz format"""
+    arrays = {
+        "category": catalog.category,
+        "urgency": catalog.urgency,
+        "original_price": catalog.original_price,
+        "current_price": catalog.current_price,
+        "stock": catalog.stock,
+        "days": catalog.days,
+        "removal_at": catalog.removal_at,
+    }
+    for column, values in (
+        ("ids", catalog.ids),
+        ("names", catalog.names),
+        ("categories", catalog.categories),
+        ("image_urls", catalog.image_urls),
+        ("descriptions", catalog.descriptions),
+    ):
+        packed = _pack_text(values)
+        arrays[f"{column}_text"] = packed["text"]
+        arrays[f"{column}_present"] = packed["present"]
+    np.savez(path, **arrays)
+
+
+def _load_npz(path: str) -> CatalogArrays:
+    with np.load(path) as data:
+        text = {
+            column: _unpack_text(data[f"{column}_text"], data[f"{column}_present"], len(data[f"{column}_present"]))
+            for column in ("ids", "categories")
+        }
+        # Free-text columns stay packed; only the separators are stripped
+        text.update({
+            column: TextColumn.from_separated(data[f"{column}_text"], data[f"{column}_present"])
+            for column in ("names", "image_urls", "descriptions")
+        })
+        return CatalogArrays(
+            text["ids"], text["names"], text["categories"], data["category"],
+            data["urgency"], data["original_price"], data["current_price"], data["stock"], data["days"],
+            text["image_urls"], text["descriptions"],
+            # Catalogs converted before removal times existed count down from the file's mtime
+            removal_at=data["removal_at"] if "removal_at" in data.files else None,
+            counted_from=os.path.getmtime(path),
+        )
+
+
+def _read_jsonl(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield _json_loads(line)
+
+
+def _read_csv(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def load_catalog(path: str) -> CatalogArrays:
+    """Load a catalog from .jsonl, .csv or .npz straight into columns.
+
+    Items without a removal_at count days_until_removal down from the file's
+    mtime, so restarts, reloads and worker processes all agree on it; write
+    the file again (or touch it) to restart those windows.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".npz":
+        return _load_npz(path)
+    if suffix == ".jsonl":
+        return CatalogArrays.from_records(_read_jsonl(path), source=path, counted_from=os.path.getmtime(path))
+    if suffix == ".csv":
+        return CatalogArrays.from_records(_read_csv(path), source=path, counted_from=os.path.getmtime(path))
+    raise ValueError(f"Unsupported catalog format: {path}")
+
+
+if __name__ == "__main__":
+    # Convert between formats, e.g. python catalog.py data/clearance_items.jsonl catalog.npz
+    if len(sys.argv) != 3 or not sys.argv[2].endswith(".npz"):
+        sys.exit("usage: python catalog.py <source .jsonl/.csv/.npz> <target .npz>")
+    save_npz(load_catalog(sys.argv[1]), sys.argv[2])
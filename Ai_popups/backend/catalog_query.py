@@ -0,0 +1,235 @@
+import base64
+import copy
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from candidate_index import Bitset
+from catalog import CatalogArrays
+
+# Bucket upper edges; a value v falls in bucket searchsorted(edges, v, "right")
+URGENCY_EDGES = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+DISCOUNT_EDGES = [10, 20, 30, 40, 50, 60, 70, 80, 90]
+
+# Stock levels in bucket order: 0, 1-2, 3-9, 10+
+STOCK_LEVELS = ["out", "low", "limited", "plenty"]
+STOCK_EDGES = [1, 3, 10]
+
+# Sort key -> catalog column; prefix with "-" for descending
+SORT_FIELDS = {
+    "urgency": "urgency",
+    "discount": "discount_pct",
+    "price": "current_price",
+    "stock": "stock",
+    "days": "days",
+}
+
+
+class BucketIndex:
+    """One bitset per value band of a numeric column"""
+
+    def __init__(self, values: np.ndarray, edges: Sequence[float]):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        # Bucket number per item; a handful of buckets fits in a byte
+        self.assignment = np.searchsorted(self.edges, values, side="right").astype(np.uint8)
+        self.buckets: List[Bitset] = [
+            Bitset.from_mask(self.assignment == bucket) for bucket in range(len(self.edges) + 1)
+        ]
+        self.size = len(values)
+
+    def bucket_of(self, value: float) -> int:
+        return int(np.searchsorted(self.edges, value, side="right"))
+
+    def select(self, low: Optional[float], high: Optional[float]) -> Bitset:
+        """Items in every bucket overlapping [low, high]; callers refine the edge buckets exactly"""
+        first = 0 if low is None else self.bucket_of(low)
+        last = len(self.buckets) - 1 if high is None else self.bucket_of(high)
+        bits = Bitset(self.size)
+        for bucket in range(first, last + 1):
+            bits = bits | self.buckets[bucket]
+        return bits
+
+    def copy(self) -> "BucketIndex":
+        index = copy.copy(self)
+        index.assignment = self.assignment.copy()
+        index.buckets = [bits.copy() for bits in self.buckets]
+        return index
+
+    def refresh_many(self, indices: np.ndarray, values: np.ndarray):
+        """refresh() for an array of positions, moving only the items whose bucket changed"""
+        buckets = np.searchsorted(self.edges, values, side="right").astype(np.uint8)
+        old = self.assignment[indices]
+        moved = buckets != old
+        indices, buckets, old = indices[moved], buckets[moved], old[moved]
+        for bucket, bits in enumerate(self.buckets):
+            bits.clear_many(indices[old == bucket])
+            bits.set_many(indices[buckets == bucket])
+        self.assignment[indices] = buckets
+
+    def refresh(self, index: int, value: float):
+        bucket = self.bucket_of(value)
+        old = self.assignment[index]
+        if bucket != old:
+            self.buckets[old].clear(index)
+            self.buckets[bucket].set(index)
+            self.assignment[index] = bucket
+
+
+# Band name -> (catalog column, bucket edges)
+BANDS = {
+    "urgency": ("urgency", URGENCY_EDGES),
+    "discount": ("discount_pct", DISCOUNT_EDGES),
+    "stock": ("stock", STOCK_EDGES),
+}
+
+
+class SecondaryIndexes:
+    """Urgency, discount and stock-level bands for the catalog read endpoints.
+
+    Category membership comes from the candidate index, and id lookups use
+    the catalog's own id_to_index map.
+    """
+
+    def __init__(self, catalog: CatalogArrays):
+        self.catalog = catalog
+        self.refresh_all()
+
+    def copy(self, catalog: CatalogArrays) -> "SecondaryIndexes":
+        """Bands for an edited copy of this index's catalog (same item positions)"""
+        indexes = copy.copy(self)
+        indexes.catalog = catalog
+        for band in BANDS:
+            setattr(indexes, band, getattr(self, band).copy())
+        return indexes
+
+    def stock_level(self, level: str) -> Bitset:
+        if level not in STOCK_LEVELS:
+            raise ValueError(f"stock_level must be one of {STOCK_LEVELS}")
+        return self.stock.buckets[STOCK_LEVELS.index(level)]
+
+    def refresh_item(self, index: int):
+        catalog = self.catalog
+        self.urgency.refresh(index, catalog.urgency[index])
+        self.discount.refresh(index, catalog.discount_pct[index])
+        self.stock.refresh(index, catalog.stock[index])
+
+    def refresh_items(self, indices: np.ndarray, bands: Sequence[str] = BANDS):
+        for band in bands:
+            column, _ = BANDS[band]
+            getattr(self, band).refresh_many(indices, getattr(self.catalog, column)[indices])
+
+    def refresh_all(self, bands: Sequence[str] = BANDS):
+        """Rebuild the given bands; cheaper than per-item refreshes once many items changed"""
+        for band in bands:
+            column, edges = BANDS[band]
+            setattr(self, band, BucketIndex(getattr(self.catalog, column), edges))
+
+
+def encode_cursor(version: int, sort: Optional[str], value: Optional[float], index: int) -> str:
+    raw = json.dumps({"c": version, "s": sort, "v": value, "i": index}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(data.get("c"), int) or not isinstance(data.get("i"), int):
+            raise ValueError(cursor)
+        if data.get("v") is not None and not isinstance(data["v"], (int, float)):
+            raise ValueError(cursor)
+    except (ValueError, AttributeError) as e:
+        raise ValueError("Invalid cursor") from e
+    return data
+
+
+def _refine(indices: np.ndarray, column: np.ndarray, low: Optional[float], high: Optional[float]) -> np.ndarray:
+    if low is None and high is None:
+        return indices
+    values = column[indices]
+    keep = np.ones(len(indices), dtype=bool)
+    if low is not None:
+        keep &= values >= low
+    if high is not None:
+        keep &= values <= high
+    return indices[keep]
+
+
+def query_catalog(
+    snapshot,
+    category: Optional[str] = None,
+    min_discount: Optional[float] = None,
+    max_discount: Optional[float] = None,
+    min_urgency: Optional[float] = None,
+    max_urgency: Optional[float] = None,
+    stock_level: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Tuple[np.ndarray, Optional[str]]:
+    """Filter, sort and page a catalog snapshot; returns (item indices, next cursor)"""
+    catalog = snapshot.catalog
+    secondary = snapshot.secondary
+
+    key_column = None
+    descending = False
+    if sort:
+        descending = sort.startswith("-")
+        field = sort.lstrip("-")
+        if field not in SORT_FIELDS:
+            raise ValueError(f"sort must be one of {sorted(SORT_FIELDS)}, optionally prefixed with '-'")
+        key_column = getattr(catalog, SORT_FIELDS[field])
+
+    # Coarse filtering on bitsets, then exact bounds on the surviving rows only
+    bits = snapshot.index.category(category).andnot(snapshot.index.expired)
+    if min_discount is not None or max_discount is not None:
+        bits = bits & secondary.discount.select(min_discount, max_discount)
+    if min_urgency is not None or max_urgency is not None:
+        bits = bits & secondary.urgency.select(min_urgency, max_urgency)
+    if stock_level:
+        bits = bits & secondary.stock_level(stock_level)
+    indices = bits.indices()
+    indices = _refine(indices, catalog.discount_pct, min_discount, max_discount)
+    indices = _refine(indices, catalog.urgency, min_urgency, max_urgency)
+
+    keys = None
+    if key_column is not None:
+        keys = key_column[indices].astype(np.float64)
+        if descending:
+            keys = -keys
+
+    # Keyset pagination: resume strictly after the (sort value, catalog index) of the last item
+    if cursor:
+        position = decode_cursor(cursor)
+        # Edits keep the source version: item positions are unchanged, and resuming after
+        # the last (value, index) stays correct when values changed between pages
+        if position["c"] != snapshot.source_version:
+            raise ValueError("Cursor is from an older catalog version; restart pagination")
+        if position["s"] != sort:
+            raise ValueError("Cursor was issued for a different sort order")
+        last_index = position["i"]
+        if keys is None:
+            after = indices > last_index
+        else:
+            last_key = -position["v"] if descending else position["v"]
+            after = (keys > last_key) | ((keys == last_key) & (indices > last_index))
+            keys = keys[after]
+        indices = indices[after]
+
+    has_more = limit is not None and len(indices) > limit
+    if keys is not None:
+        if has_more:
+            # Only items at or below the limit-th key can make the page
+            kth = np.partition(keys, limit - 1)[limit - 1]
+            keep = keys <= kth
+            indices, keys = indices[keep], keys[keep]
+        order = np.lexsort((indices, keys))
+        indices, keys = indices[order], keys[order]
+
+    if not has_more:
+        return indices, None
+    page = indices[:limit]
+    last = int(page[-1])
+    value = None if key_column is None else float(key_column[last])
+    return page, encode_cursor(snapshot.source_version, sort, value, last)
@@ -0,0 +1,448 @@
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import shared_catalog
+from candidate_index import CandidateIndex
+from catalog import CatalogArrays, load_catalog
+from catalog_query import BANDS, SecondaryIndexes
+from encoding import encode_item
+from expiry import ExpiryQueue
+from similarity import NeighborTable
+
+logger = logging.getLogger(__name__)
+
+# refresh_items rebuilds the indexes once more than 1/N of the catalog changed
+BULK_REFRESH_FRACTION = 64
+
+# Longest the expiry task sleeps, so earlier removal times set meanwhile are noticed promptly
+EXPIRY_MAX_SLEEP = 1.0
+
+# Columns every process derives itself from removal times and stock (see urgency.privatize_columns)
+LOCAL_COLUMNS = ("urgency", "days")
+
+# Snapshot revisions come from one counter, so snapshots sharing a version never share one
+_revisions = itertools.count(1)
+
+
+class CatalogDelta:
+    """New values of the items an edit changed.
+
+    Small enough to send to worker processes that hold an older copy of the
+    same catalog, which apply it with CatalogSnapshot.apply_delta instead of
+    loading the edited catalog again.
+    """
+
+    __slots__ = ("version", "positions", "columns")
+
+    def __init__(self, version: int, positions: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.version = version
+        self.positions = positions
+        # Column name -> values at `positions`
+        self.columns = columns
+
+    @classmethod
+    def of(cls, snapshot: "CatalogSnapshot", positions: np.ndarray, columns: Sequence[str]) -> "CatalogDelta":
+        """The values of `columns` at `positions` in `snapshot`"""
+        positions = np.asarray(positions, dtype=np.int64)
+        return cls(snapshot.version, positions, {column: np.array(getattr(snapshot.catalog, column)[positions]) for column in columns})
+
+    @classmethod
+    def between(cls, base: "CatalogSnapshot", edited: "CatalogSnapshot", columns: Sequence[str]) -> "CatalogDelta":
+        """What an edit changed in `columns`, leaving out those it did not touch"""
+        changed = np.zeros(len(base.catalog), dtype=bool)
+        touched = []
+        for column in columns:
+            differs = getattr(base.catalog, column) != getattr(edited.catalog, column)
+            if differs.any():
+                changed |= differs
+                touched.append(column)
+        return cls.of(edited, np.flatnonzero(changed), touched)
+
+
+class CatalogSnapshot:
+    """One loaded catalog with its indexes.
+
+    Requests read `store.current` once and use that snapshot throughout, so
+    a reload that swaps in a new snapshot never changes what an in-flight
+    request sees. An old snapshot is freed when the last request holding it
+    finishes.
+    """
+
+    def __init__(
+        self,
+        catalog: CatalogArrays,
+        version: int,
+        source_mtime: Optional[float] = None,
+        base: Optional["CatalogSnapshot"] = None,
+        source_version: Optional[int] = None,
+    ):
+        self.catalog = catalog
+        if base is None:
+            self.index = CandidateIndex(catalog)
+            self.secondary = SecondaryIndexes(catalog)
+            self.expiry = ExpiryQueue(catalog.removal_at)
+        else:
+            # An edited copy of base's catalog: positions are unchanged, so copy its indexes
+            self.index = base.index.copy(catalog)
+            self.secondary = base.secondary.copy(catalog)
+            self.expiry = base.expiry.copy(catalog.removal_at)
+        # Content-similarity neighbors in this catalog's positions, if a table was loaded
+        self.neighbors: Optional[NeighborTable] = base.neighbors if base is not None else None
+        # True once items were edited after loading, so the source no longer describes this snapshot
+        self.edited = base is not None
+        self.version = version
+        # Version of the load this snapshot descends from; edits keep it, and snapshots
+        # sharing it hold the same ids at the same positions
+        if base is not None:
+            self.source_version = base.source_version
+        else:
+            self.source_version = version if source_version is None else source_version
+        # Changed on every item change so cached responses can tell they are stale
+        self.revision = next(_revisions)
+        self.source_mtime = source_mtime
+        self.loaded_at = time.time()
+        # Encoded item JSON, filled in as items are first served
+        self._item_json: Dict[int, bytes] = dict(base._item_json) if base is not None else {}
+        # Items already past their removal time never become candidates
+        self.expire_due(self.loaded_at)
+
+    def item_json(self, index: int) -> bytes:
+        fragment = self._item_json.get(index)
+        if fragment is None:
+            fragment = self._item_json[index] = encode_item(self.catalog, index)
+        return fragment
+
+    def refresh_item(self, index: int):
+        """Bring every index up to date after an in-place change to one item"""
+        self.index.refresh_item(index)
+        self.secondary.refresh_item(index)
+        self._item_json.pop(index, None)
+        self.revision = next(_revisions)
+
+    def expire_due(self, now: float) -> np.ndarray:
+        """Expire every item whose removal time has passed; returns the newly expired positions"""
+        due = self.expiry.pop_due(now)
+        due = due[~self.index.expired.contains_many(due)]
+        if len(due):
+            self.index.expire(due)
+            self.revision = next(_revisions)
+        return due
+
+    def reschedule(self, indices: Sequence[int], now: float) -> np.ndarray:
+        """Requeue items after their removal time changed; returns those that are now expired.
+        Call refresh_items() on them afterwards to restore eligibility of revived items."""
+        indices = np.unique(np.asarray(indices, dtype=np.int64))
+        live = self.catalog.removal_at[indices] > now
+        self.index.unexpire(indices[live])
+        self.expiry.schedule(indices[live])
+        lapsed = indices[~live]
+        lapsed = lapsed[~self.index.expired.contains_many(lapsed)]
+        self.index.expire(lapsed)
+        return lapsed
+
+    def refresh_items(self, indices: Sequence[int], bands: Sequence[str] = tuple(BANDS)):
+        """refresh_item for many items at once, rebuilding the indexes outright when that is cheaper.
+
+        `bands` limits a rebuild to the secondary bands whose columns changed.
+        """
+        indices = np.unique(np.asarray(indices, dtype=np.int64))
+        if len(indices) == 0:
+            return
+        if len(indices) * BULK_REFRESH_FRACTION < len(self.catalog):
+            self.index.refresh_items(indices)
+            self.secondary.refresh_items(indices, bands)
+            for index in indices.tolist():
+                self._item_json.pop(index, None)
+        else:
+            self.index.refresh_all()
+            self.secondary.refresh_all(bands)
+            self._item_json = {}
+        self.revision = next(_revisions)
+
+    def apply_delta(self, delta: CatalogDelta, now: float) -> "CatalogSnapshot":
+        """Copy of this snapshot with an edit of the same catalog applied.
+
+        Only the delta's columns are copied and only its items' index entries
+        refreshed, so a small edit costs little however large the catalog is.
+        """
+        catalog = self.catalog.copy_numeric(delta.columns)
+        for column, values in delta.columns.items():
+            getattr(catalog, column)[delta.positions] = values
+        return self._successor(catalog, delta.version, delta.positions, now)
+
+    def follow(self, catalog: CatalogArrays, version: int, now: float) -> "CatalogSnapshot":
+        """Successor built from a published edit of this snapshot's catalog, mapped as `catalog`.
+
+        Both hold the same items at the same positions, so the indexes are
+        copied and only the items whose columns differ are refreshed. Urgency
+        and days are derived per process; ours are kept for unchanged items.
+        """
+        old = self.catalog
+        changed = np.zeros(len(old), dtype=bool)
+        for column in shared_catalog.NUMERIC_COLUMNS:
+            if column not in LOCAL_COLUMNS:
+                changed |= getattr(old, column) != getattr(catalog, column)
+        positions = np.flatnonzero(changed)
+        for column in LOCAL_COLUMNS:
+            values = np.array(getattr(old, column))
+            values[positions] = getattr(catalog, column)[positions]
+            setattr(catalog, column, values)
+        catalog.layout = old.layout
+        return self._successor(catalog, version, positions, now)
+
+    def _successor(self, catalog: CatalogArrays, version: int, positions: np.ndarray, now: float) -> "CatalogSnapshot":
+        moved = positions[self.catalog.removal_at[positions] != catalog.removal_at[positions]]
+        snapshot = CatalogSnapshot(catalog, version, self.source_mtime, base=self)
+        snapshot.reschedule(moved, now)
+        snapshot.refresh_items(positions)
+        return snapshot
+
+
+class CatalogStore:
+    """Holds the current catalog snapshot and swaps in new ones atomically.
+
+    reload() does all loading and index building off to the side and then
+    replaces the snapshot reference in a single assignment. Preparers run on
+    the new snapshot just before the swap, listeners just after it. edit()
+    swaps in an edited copy of the current snapshot the same way and tells
+    edit listeners what changed. Change listeners hear about edited items
+    and about items expiring, which an expiry task does in place as their
+    removal time passes.
+    """
+
+    def __init__(self, path: Optional[str], catalog: Optional[CatalogArrays] = None, shared_dir: Optional[str] = None):
+        self.path = path
+        # When set, catalogs are published to and memory-mapped from this directory
+        # so every worker process shares one copy (see shared_catalog)
+        self.shared_dir = shared_dir
+        self._reload_lock = threading.Lock()
+        # Held while expiry changes the current snapshot in place or edit() copies it,
+        # so a copy never catches an index half updated
+        self.write_lock = threading.Lock()
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self._edit_listeners: List[Callable[[CatalogSnapshot, CatalogDelta], None]] = []
+        self._preparers: List[Callable[[CatalogSnapshot], None]] = []
+        self._change_listeners: List[Callable[[CatalogSnapshot, np.ndarray, str], None]] = []
+        self._watch_task: Optional[asyncio.Task] = None
+        self._expiry_task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.reloads = 0
+        self.reload_failures = 0
+        self._failed_mtime: Optional[float] = None
+        if catalog is not None:
+            self._current = CatalogSnapshot(catalog, version=1)
+        elif shared_dir is not None:
+            self._current = self._load_shared()
+        else:
+            mtime = os.path.getmtime(path)
+            self._current = CatalogSnapshot(load_catalog(path), version=1, source_mtime=mtime)
+
+    @classmethod
+    def from_catalog(cls, catalog: CatalogArrays) -> "CatalogStore":
+        """In-memory store with no source file (reload is not available)"""
+        return cls(None, catalog)
+
+    @property
+    def current(self) -> CatalogSnapshot:
+        return self._current
+
+    def subscribe(self, listener: Callable[[CatalogSnapshot], None]):
+        """Call listener(snapshot) whenever a reloaded snapshot is swapped in"""
+        self._listeners.append(listener)
+
+    def on_edit(self, listener: Callable[[CatalogSnapshot, CatalogDelta], None]):
+        """Call listener(snapshot, delta) whenever edit() swaps in an edited snapshot"""
+        self._edit_listeners.append(listener)
+
+    def on_change(self, listener: Callable[[CatalogSnapshot, np.ndarray, str], None]):
+        """Call listener(snapshot, positions, reason) when items change in place ("updated" or "expired")"""
+        self._change_listeners.append(listener)
+
+    def notify_change(self, snapshot: CatalogSnapshot, indices: np.ndarray, reason: str):
+        if reason == "expired":
+            self.expired += len(indices)
+        if len(indices):
+            for listener in self._change_listeners:
+                listener(snapshot, indices, reason)
+
+    def expire_due(self, now: Optional[float] = None) -> int:
+        """Expire items of the current snapshot whose removal time has passed"""
+        snapshot = self._current
+        with self.write_lock:
+            expired = snapshot.expire_due(time.time() if now is None else now)
+        self.notify_change(snapshot, expired, "expired")
+        return len(expired)
+
+    def prepare(self, preparer: Callable[[CatalogSnapshot], None]):
+        """Call preparer(snapshot) on every reloaded snapshot before any request can see it"""
+        self._preparers.append(preparer)
+
+    def reload(self) -> CatalogSnapshot:
+        """Load the source file into a fresh snapshot and swap it in. Blocking; run it off the event loop."""
+        if self.path is None:
+            raise RuntimeError("Catalog store has no source file to reload from")
+        with self._reload_lock:
+            mtime = os.path.getmtime(self.path)
+            try:
+                if self.shared_dir is not None:
+                    snapshot = self._load_shared(self._current)
+                else:
+                    snapshot = CatalogSnapshot(load_catalog(self.path), self._current.version + 1, mtime)
+                for preparer in self._preparers:
+                    preparer(snapshot)
+            except Exception:
+                self.reload_failures += 1
+                self._failed_mtime = mtime
+                raise
+            self._current = snapshot
+            self.reloads += 1
+        logger.info("Catalog reloaded: version %d, %d items", snapshot.version, len(snapshot.catalog))
+        for listener in self._listeners:
+            listener(snapshot)
+        return snapshot
+
+    def edit(
+        self,
+        change: Callable[[CatalogSnapshot], bool],
+        columns: Sequence[str] = shared_catalog.NUMERIC_COLUMNS,
+        local: bool = False,
+    ) -> Optional[CatalogSnapshot]:
+        """Apply `change` to a copy of the current snapshot and swap the copy in.
+
+        change(draft) edits the draft's catalog and refreshes its indexes like an
+        in-place update would, and returns False to discard it. Only `columns`,
+        the numeric columns it may write, are copied. Requests keep reading the
+        previous snapshot meanwhile. With a shared directory the changed columns
+        are published as a new version, which other workers follow. Returns the
+        new snapshot, or None if discarded. Blocking; run it off the event loop.
+
+        local=True keeps the version, publishes nothing and tells no edit
+        listener, for columns every process derives itself (LOCAL_COLUMNS).
+        """
+        with self._reload_lock:
+            if local:
+                snapshot = self._edit(self._current, self._current.version, change, columns)
+                if snapshot is not None:
+                    # The source still describes it, apart from what every process derives
+                    snapshot.edited = self._current.edited
+            elif self.shared_dir is None:
+                base = self._current
+                snapshot = self._edit(base, base.version + 1, change, columns)
+                if snapshot is not None:
+                    delta = CatalogDelta.between(base, snapshot, columns)
+            else:
+                with shared_catalog.publish_lock(self.shared_dir):
+                    manifest = shared_catalog.read_manifest(self.shared_dir)
+                    base = self._current
+                    if manifest["version"] != base.version:
+                        # Edit what another worker published last, not our older copy of it
+                        base = self._snapshot_of(manifest, shared_catalog.map_catalog(self.shared_dir, manifest), base)
+                        for preparer in self._preparers:
+                            preparer(base)
+                    snapshot = self._edit(base, manifest["version"] + 1, change, columns)
+                    if snapshot is not None:
+                        delta = CatalogDelta.between(base, snapshot, columns)
+                        shared_catalog.publish_edit(snapshot.catalog, self.shared_dir, manifest, list(delta.columns))
+            if snapshot is None:
+                return None
+            self._current = snapshot
+        if local:
+            return snapshot
+        logger.info("Catalog edited: version %d, %d items changed", snapshot.version, len(delta.positions))
+        for listener in self._edit_listeners:
+            listener(snapshot, delta)
+        return snapshot
+
+    def _edit(self, base: CatalogSnapshot, version: int, change: Callable[[CatalogSnapshot], bool], columns: Sequence[str]) -> Optional[CatalogSnapshot]:
+        with self.write_lock:
+            draft = CatalogSnapshot(base.catalog.copy_numeric(columns), version, base.source_mtime, base=base)
+        return draft if change(draft) else None
+
+    def _load_shared(self, base: Optional[CatalogSnapshot] = None) -> CatalogSnapshot:
+        """Map the published catalog, first publishing the source file if nobody has yet"""
+        with shared_catalog.publish_lock(self.shared_dir):
+            mtime = os.path.getmtime(self.path)
+            manifest = shared_catalog.read_manifest(self.shared_dir)
+            if manifest is None or manifest["source_mtime"] != mtime:
+                manifest = shared_catalog.publish(load_catalog(self.path), self.shared_dir, mtime)
+            catalog = shared_catalog.map_catalog(self.shared_dir, manifest)
+        return self._snapshot_of(manifest, catalog, base)
+
+    @staticmethod
+    def _snapshot_of(manifest: Dict, catalog: CatalogArrays, base: Optional[CatalogSnapshot]) -> CatalogSnapshot:
+        """Snapshot of a mapped version, built on `base` when the version is an edit of it"""
+        source_version = manifest.get("source_version", manifest["version"])
+        if base is not None and base.source_version == source_version:
+            return base.follow(catalog, manifest["version"], time.time())
+        # Published versions are numbered globally, so all workers agree on them
+        return CatalogSnapshot(catalog, manifest["version"], manifest["source_mtime"], source_version=source_version)
+
+    def source_changed(self) -> bool:
+        if self.path is None:
+            return False
+        if self.shared_dir is not None:
+            # Another worker may already have published a newer version
+            manifest = shared_catalog.read_manifest(self.shared_dir)
+            if manifest is not None and manifest["version"] != self._current.version:
+                return True
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        # Don't retry a file version that already failed to load
+        return mtime != self._current.source_mtime and mtime != self._failed_mtime
+
+    async def watch(self, interval: float):
+        """Poll the source file and reload in a worker thread when it changes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            if self.source_changed():
+                try:
+                    await loop.run_in_executor(None, self.reload)
+                except Exception:
+                    # Keep serving the previous snapshot until the file is fixed
+                    logger.exception("Catalog reload from %s failed", self.path)
+
+    def start_watching(self, interval: float):
+        if interval > 0 and self.path is not None and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self.watch(interval))
+
+    async def run_expiry(self):
+        """Sleep until the next removal time of the current snapshot and expire what is due"""
+        while True:
+            delay = self._current.expiry.next_due() - time.time()
+            await asyncio.sleep(min(max(delay, 0.0), EXPIRY_MAX_SLEEP))
+            try:
+                self.expire_due()
+            except Exception:
+                logger.exception("Catalog expiry failed")
+
+    def start_expiry(self):
+        if self._expiry_task is None:
+            self._expiry_task = asyncio.create_task(self.run_expiry())
+
+    async def stop_expiry(self):
+        if self._expiry_task is not None:
+            self._expiry_task.cancel()
+            try:
+                await self._expiry_task
+            except asyncio.CancelledError:
+                pass
+            self._expiry_task = None
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
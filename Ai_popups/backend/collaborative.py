@@ -0,0 +1,402 @@
+"""Implicit-feedback collaborative filtering: ALS trained on the interaction log.
+
+Train by hand, or let the server do it every CF_TRAIN_INTERVAL seconds:
+
+    python collaborative.py interactions.db data/cf_model
+
+Views and add-to-cart events become a user x item matrix of confidence
+weights, factorized with alternating least squares (Hu, Koren & Volinsky).
+Each half-iteration takes a few conjugate gradient steps for every row at
+once, touching each interaction a constant number of times, so a pass
+costs time linear in the number of interactions. Factors are published like shared_catalog
+columns:
+
+    CURRENT        JSON manifest of the live model, replaced atomically
+    .lock          serializes training runs between processes
+    v<N>/*.npy     factor matrices, user/item id columns and id lookup tables
+
+Serving memory-maps the current version, so all workers share one copy,
+and scores a request's candidates with one matrix-vector product.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import shared_catalog
+from catalog import CatalogArrays, Layout, TextColumn
+from interactions import create_interaction_db, interactions_table
+from shared_catalog import SharedIdIndex
+
+logger = logging.getLogger("clearance")
+
+# Confidence weight of each interaction kind; others are ignored
+ACTION_WEIGHTS = {"add_to_cart": 3.0, "view": 1.0}
+
+# Model size and ALS hyperparameters: confidence is 1 + CONFIDENCE_ALPHA * summed weight
+FACTORS = 32
+ITERATIONS = 10
+REGULARIZATION = 0.1
+CONFIDENCE_ALPHA = 10.0
+
+# Conjugate gradient steps per row and half-iteration, warm-started from the last factors
+CG_STEPS = 3
+# Interactions solved together; bounds the (interactions, f) temporaries to ~32MB each
+SOLVE_BLOCK_INTERACTIONS = 1 << 18
+
+# Rows read from SQLite per query while collecting interactions
+READ_CHUNK_ROWS = 50000
+
+# Trainer processes run at lower CPU priority than the serving workers
+TRAINER_NICENESS = 10
+
+
+def iter_feedback(db, chunk_size: int = READ_CHUNK_ROWS) -> Iterable[Tuple[str, str, float]]:
+    """(user_id, item_id, weight) for every weighted interaction, in insertion order"""
+    table = interactions_table
+    last_id = 0
+    while True:
+        with db.connect() as conn:
+            result = conn.execute(
+                table.select()
+                .with_only_columns(table.c.id, table.c.user_id, table.c.item_id, table.c.action)
+                .where(table.c.id > last_id, table.c.action.in_(list(ACTION_WEIGHTS)))
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            ).all()
+        if not result:
+            return
+        last_id = result[-1][0]
+        for _, user_id, item_id, action in result:
+            if user_id and item_id:
+                yield str(user_id), item_id, ACTION_WEIGHTS[action]
+
+
+def feedback_matrix(feedback: Iterable[Tuple[str, str, float]]):
+    """User ids, item ids and the CSR matrix of summed weights between them"""
+    from scipy.sparse import csr_matrix
+
+    user_index: Dict[str, int] = {}
+    item_index: Dict[str, int] = {}
+    rows: List[int] = []
+    columns: List[int] = []
+    weights: List[float] = []
+    for user_id, item_id, weight in feedback:
+        rows.append(user_index.setdefault(user_id, len(user_index)))
+        columns.append(item_index.setdefault(item_id, len(item_index)))
+        weights.append(weight)
+    matrix = csr_matrix(
+        (np.array(weights, dtype=np.float32), (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64))),
+        shape=(len(user_index), len(item_index)),
+    )
+    # Repeated (user, item) pairs were summed by the conversion
+    matrix.sum_duplicates()
+    return list(user_index), list(item_index), matrix
+
+
+def _solve_rows(matrix, fixed: np.ndarray, current: np.ndarray, regularization: float, alpha: float) -> np.ndarray:
+    """Least-squares factors for every row of `matrix` given the other side's `fixed` factors.
+
+    Row u solves (Y^T C_u Y + regularization * I) x_u = Y^T C_u p_u with a few
+    conjugate gradient steps started from `current`. Y^T C_u Y is never
+    formed: it is Y^T Y, shared by every row, plus one term per interaction,
+    so each step costs O(interactions * f + rows * f^2).
+    """
+    n, factors = current.shape
+    gram = fixed.T @ fixed + regularization * np.eye(factors, dtype=np.float32)
+    solved = np.empty_like(current)
+    indptr = matrix.indptr
+    row = 0
+    while row < n:
+        end = int(np.searchsorted(indptr, indptr[row] + SOLVE_BLOCK_INTERACTIONS, side="right")) - 1
+        end = min(max(end, row + 1), n)
+        block = matrix[row:end]
+        owners = np.repeat(np.arange(end - row), np.diff(block.indptr))
+        vectors = fixed[block.indices]
+        extra = (alpha * block.data).astype(np.float32)
+
+        def product(x: np.ndarray) -> np.ndarray:
+            # (Y^T Y + regularization * I) x + sum over the row's items of extra * (y . x) y
+            weights = extra * np.einsum("nf,nf->n", vectors, x[owners])
+            return x @ gram + _row_sums(block, weights, vectors)
+
+        x = current[row:end].copy()
+        residual = _row_sums(block, 1.0 + extra, vectors) - product(x)
+        direction = residual.copy()
+        norm = np.einsum("rf,rf->r", residual, residual)
+        for _ in range(CG_STEPS):
+            projected = product(direction)
+            curvature = np.einsum("rf,rf->r", direction, projected)
+            step = np.divide(norm, curvature, out=np.zeros_like(norm), where=curvature > 0)
+            x += step[:, None] * direction
+            residual -= step[:, None] * projected
+            new_norm = np.einsum("rf,rf->r", residual, residual)
+            direction = residual + np.divide(new_norm, norm, out=np.zeros_like(norm), where=norm > 0)[:, None] * direction
+            norm = new_norm
+        solved[row:end] = x
+        row = end
+    return solved
+
+
+def _row_sums(block, weights: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Per row of `block`, the sum of its interactions' `vectors` scaled by `weights`"""
+    from scipy.sparse import csr_matrix
+
+    rows = csr_matrix((weights, np.arange(len(weights)), block.indptr), shape=(block.shape[0], len(weights)))
+    return rows @ vectors
+
+
+def train_als(
+    matrix,
+    factors: int = FACTORS,
+    iterations: int = ITERATIONS,
+    regularization: float = REGULARIZATION,
+    alpha: float = CONFIDENCE_ALPHA,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """User and item factor matrices for a user x item weight matrix"""
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(scale=0.01, size=(matrix.shape[0], factors)).astype(np.float32)
+    item_factors = rng.normal(scale=0.01, size=(matrix.shape[1], factors)).astype(np.float32)
+    transposed = matrix.T.tocsr()
+    for _ in range(iterations):
+        user_factors = _solve_rows(matrix, item_factors, user_factors, regularization, alpha)
+        item_factors = _solve_rows(transposed, user_factors, item_factors, regularization, alpha)
+    return user_factors, item_factors
+
+
+def publish_model(
+    directory: str,
+    user_ids: List[str],
+    item_ids: List[str],
+    user_factors: np.ndarray,
+    item_factors: np.ndarray,
+    interactions: int,
+) -> Dict[str, Any]:
+    """Write the factors as a new version and make it current. Call under publish_lock()."""
+    previous = shared_catalog.read_manifest(directory)
+    version = previous["version"] + 1 if previous else 1
+    name = f"v{version}"
+    target = os.path.join(directory, name)
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+
+    for side, ids, matrix in (("user", user_ids, user_factors), ("item", item_ids, item_factors)):
+        column = TextColumn.from_strings(ids)
+        np.save(os.path.join(target, f"{side}_factors.npy"), matrix)
+        np.save(os.path.join(target, f"{side}_ids.data.npy"), np.frombuffer(column.data, dtype=np.uint8))
+        np.save(os.path.join(target, f"{side}_ids.offsets.npy"), column.offsets)
+        np.save(os.path.join(target, f"{side}_ids.slots.npy"), SharedIdIndex.build(ids))
+
+    manifest = {
+        "version": version,
+        "path": name,
+        "users": len(user_ids),
+        "items": len(item_ids),
+        "interactions": interactions,
+        "trained_at": time.time(),
+    }
+    shared_catalog.write_manifest(directory, manifest)
+    shared_catalog.remove_old_versions(directory, keep=name)
+    return manifest
+
+
+def train_and_publish(db_path: str, directory: str, min_age: float = 0.0) -> Optional[Dict[str, Any]]:
+    """Train on the interaction log and publish the factors; returns the manifest, or None
+    when there is nothing to train on or another process published one less than
+    `min_age` seconds ago"""
+    with shared_catalog.publish_lock(directory):
+        previous = shared_catalog.read_manifest(directory)
+        if previous is not None and time.time() - previous["trained_at"] < min_age:
+            return None
+        user_ids, item_ids, matrix = feedback_matrix(iter_feedback(create_interaction_db(db_path)))
+        if matrix.nnz == 0:
+            return None
+        user_factors, item_factors = train_als(matrix)
+        return publish_model(directory, user_ids, item_ids, user_factors, item_factors, matrix.nnz)
+
+
+def init_trainer():
+    """Process pool initializer: keep training from competing with serving for the CPU"""
+    if hasattr(os, "nice"):
+        os.nice(TRAINER_NICENESS)
+
+
+class FactorModel:
+    """One published model, memory-mapped read-only"""
+
+    def __init__(self, directory: str, manifest: Dict[str, Any]):
+        target = os.path.join(directory, manifest["path"])
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(target, f"{name}.npy"), mmap_mode="r")
+
+        self.version = manifest["version"]
+        self.trained_at = manifest["trained_at"]
+        self.user_factors = load("user_factors")
+        self.item_factors = load("item_factors")
+        self.users = SharedIdIndex(load("user_ids.slots"), TextColumn(load("user_ids.data"), load("user_ids.offsets")))
+        self.item_ids = TextColumn(load("item_ids.data"), load("item_ids.offsets"))
+        # Factor row of every catalog position (-1 = untrained item), per catalog layout still in use
+        self._rows: "weakref.WeakKeyDictionary[Layout, np.ndarray]" = weakref.WeakKeyDictionary()
+
+    def item_rows(self, catalog: CatalogArrays) -> np.ndarray:
+        rows = self._rows.get(catalog.layout)
+        if rows is None:
+            lookup = catalog.id_to_index
+            positions = np.fromiter((lookup.get(item_id, -1) for item_id in self.item_ids), dtype=np.int64, count=len(self.item_ids))
+            rows = np.full(len(catalog), -1, dtype=np.int64)
+            trained = positions >= 0
+            rows[positions[trained]] = np.flatnonzero(trained)
+            self._rows[catalog.layout] = rows
+        return rows
+
+    def preference(self, user_id: str, catalog: CatalogArrays, candidates: np.ndarray) -> Optional[np.ndarray]:
+        """Predicted preference of a user for each candidate, or None for users the model never saw"""
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        rows = self.item_rows(catalog)[candidates]
+        predicted = self.item_factors[rows] @ self.user_factors[user]
+        predicted[rows < 0] = 0.0
+        return predicted
+
+
+class FactorStore:
+    """The current model in a model directory, swapped for a newer one when it is published"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.current: Optional[FactorModel] = None
+        self._manifest_mtime: Optional[int] = None
+
+    def refresh(self, catalog: Optional[CatalogArrays] = None) -> bool:
+        """Load a newly published model, if any; one stat() when nothing changed.
+        A new model is mapped onto `catalog` before it is swapped in."""
+        try:
+            mtime = os.stat(os.path.join(self.directory, shared_catalog.MANIFEST)).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._manifest_mtime:
+            return False
+        manifest = shared_catalog.read_manifest(self.directory)
+        if manifest is None:
+            return False
+        if self.current is not None and manifest["version"] == self.current.version:
+            self._manifest_mtime = mtime
+            return False
+        try:
+            model = FactorModel(self.directory, manifest)
+        except OSError:
+            # Mapped without publish_lock, which training holds for minutes, so a newer
+            # publish may have removed this version already; keep serving the current
+            # model and map the newer one on the next refresh
+            return False
+        self._manifest_mtime = mtime
+        if catalog is not None:
+            model.item_rows(catalog)
+        self.current = model
+        return True
+
+
+class CollaborativeTrainer:
+    """Retrains the store's model from the interaction log every `interval` seconds.
+
+    Training runs in a single low-priority worker process, so it never holds
+    the event loop or the GIL of a serving process. The process is spawned
+    and imports only this module and its dependencies: the app lives in
+    server.py, which spawn never re-runs. When several server
+    processes share a model directory, whichever trains first publishes and
+    the others skip their run and load its model. An interval of 0 disables
+    training; a model already in the directory is still served.
+    """
+
+    def __init__(self, store: FactorStore, db_path: str, interval: float, catalog: Callable[[], CatalogArrays]):
+        self.store = store
+        self.db_path = db_path
+        self.interval = interval
+        # Catalog to map new models onto before they go live
+        self.catalog = catalog
+        self.runs = 0
+        self.failures = 0
+        self.last_run_seconds = 0.0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    async def load(self):
+        """Pick up a newly published model, mapping it off the event loop"""
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self.store.refresh, self.catalog()):
+            logger.info("Serving collaborative filtering model v%d", self.store.current.version)
+
+    async def train(self):
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        # Skip when another process published within the last half interval
+        manifest = await loop.run_in_executor(self._pool, train_and_publish, self.db_path, self.store.directory, self.interval / 2)
+        if manifest is not None:
+            self.last_run_seconds = time.perf_counter() - t0
+            self.runs += 1
+            logger.info("Trained collaborative filtering model v%d on %d user/item pairs in %.1fs",
+                        manifest["version"], manifest["interactions"], self.last_run_seconds)
+        await self.load()
+
+    async def run(self):
+        model = self.store.current
+        delay = max(model.trained_at + self.interval - time.time(), 0.0) if model is not None else 0.0
+        while True:
+            await asyncio.sleep(delay)
+            delay = self.interval
+            try:
+                await self.train()
+            except Exception:
+                self.failures += 1
+                logger.exception("Collaborative filtering training failed")
+
+    async def start(self):
+        await self.load()
+        if self.enabled and self._task is None:
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=init_trainer)
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("interactions", help="interactions SQLite database")
+    parser.add_argument("output", help="model directory")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    manifest = train_and_publish(args.interactions, args.output)
+    if manifest is None:
+        print("No view or add_to_cart interactions to train on")
+    else:
+        print(f"v{manifest['version']}: {manifest['users']} users, {manifest['items']} items, "
+              f"{manifest['interactions']} pairs in {time.perf_counter() - t0:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,65 @@
+import json
+from typing import Any, Dict, List, Sequence
+
+from catalog import CatalogArrays
+from models import PopupResponse
+
+try:
+    import orjson
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+except ImportError:  # orjson is optional; compact json.dumps output is equivalent, only slower
+    orjson = None
+
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+# Body of every "don't show" popup response
+NO_POPUP_JSON = PopupResponse(show_popup=False).model_dump_json().encode()
+
+
+def item_fields(catalog: CatalogArrays, index: int) -> Dict[str, Any]:
+    """One row as a dict in ClearanceItem field order"""
+    return {
+        "id": catalog.ids[index],
+        "name": catalog.names[index],
+        "original_price": float(catalog.original_price[index]),
+        "current_price": float(catalog.current_price[index]),
+        "category": catalog.categories[catalog.category[index]],
+        "stock_count": int(catalog.stock[index]),
+        "days_until_removal": int(catalog.days[index]),
+        "urgency_score": float(catalog.urgency[index]),
+        "image_url": catalog.image_urls[index],
+        "description": catalog.descriptions[index],
+    }
+
+
+def encode_item(catalog: CatalogArrays, index: int) -> bytes:
+    """JSON for one item, byte-identical to ClearanceItem.model_dump_json()"""
+    if orjson is None:
+        return catalog.item(index).model_dump_json().encode()
+    return orjson.dumps(item_fields(catalog, index))
+
+
+def encode_popup(
+    item_fragments: Sequence[bytes],
+    discount_percentages: List[int],
+    urgency_messages: List[str],
+    sustainability_messages: List[str],
+    timer_seconds: int,
+) -> bytes:
+    """A PopupResponse body assembled from pre-encoded item JSON; same bytes as model_dump_json()"""
+    return b"".join((
+        b'{"show_popup":true,"items":[',
+        b",".join(item_fragments),
+        b'],"discount_percentages":',
+        dumps(discount_percentages),
+        b',"urgency_messages":',
+        dumps(urgency_messages),
+        b',"sustainability_messages":',
+        dumps(sustainability_messages),
+        b',"timer_seconds":',
+        str(int(timer_seconds)).encode(),
+        b"}",
+    ))
@@ -0,0 +1,65 @@
+import copy
+import heapq
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+class ExpiryQueue:
+    """Catalog positions ordered by removal time, popped as their clearance window ends.
+
+    The initial schedule is one argsort of the removal_at column; items whose
+    removal time changes later are pushed onto a heap. Entries are checked
+    against the column when popped, so superseded ones are skipped. Popping
+    k due items costs O(k log k) whatever the catalog size, so nothing ever
+    scans the whole catalog after it is loaded.
+    """
+
+    def __init__(self, removal_at: np.ndarray):
+        self.removal_at = removal_at
+        order = np.argsort(removal_at)
+        self._order = order.astype(np.int32) if len(order) < 2 ** 31 else order
+        self._times = removal_at[order]
+        # Next unpopped position in the sorted run
+        self._next = 0
+        self._heap: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._order) - self._next + len(self._heap)
+
+    def copy(self, removal_at: np.ndarray) -> "ExpiryQueue":
+        """Queue for an edited copy of the removal_at column; the sorted run is shared"""
+        queue = copy.copy(self)
+        queue.removal_at = removal_at
+        queue._heap = list(self._heap)
+        return queue
+
+    def schedule(self, indices: Sequence[int]):
+        """Queue items again after their removal time changed"""
+        removal_at = self.removal_at
+        for index in indices:
+            heapq.heappush(self._heap, (float(removal_at[index]), int(index)))
+
+    def next_due(self) -> float:
+        """Earliest queued removal time (possibly a superseded entry), or inf when empty"""
+        due = float(self._times[self._next]) if self._next < len(self._times) else float("inf")
+        if self._heap and self._heap[0][0] < due:
+            due = self._heap[0][0]
+        return due
+
+    def pop_due(self, now: float) -> np.ndarray:
+        """Positions whose removal time is at or before `now`, each at most once"""
+        start = self._next
+        end = start + int(np.searchsorted(self._times[start:], now, side="right"))
+        self._next = end
+        indices = self._order[start:end].astype(np.int64)
+        # Skip items rescheduled since the column was sorted; their heap entries stand in
+        indices = indices[self.removal_at[indices] == self._times[start:end]]
+        if self._heap and self._heap[0][0] <= now:
+            rescheduled = []
+            while self._heap and self._heap[0][0] <= now:
+                due, index = heapq.heappop(self._heap)
+                if self.removal_at[index] == due:
+                    rescheduled.append(index)
+            indices = np.concatenate((indices, np.array(rescheduled, dtype=np.int64)))
+        return np.unique(indices)
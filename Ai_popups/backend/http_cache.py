@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it clients get gzip
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+
+class EncodedBody:
+    """A response body encoded once, with precompressed variants and a strong ETag per coding.
+
+    Each coding is a different representation, so the gzip and brotli
+    variants get their own ETags ("<hash>-gzip", "<hash>-br") and a cache
+    never revalidates one coding's bytes with another's.
+    """
+
+    __slots__ = ("identity", "variants", "digest", "headers")
+
+    def __init__(self, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.identity = body
+        self.digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.headers = headers or {}
+        self.variants: Dict[str, bytes] = {}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=5)
+            # mtime=0 keeps the gzip bytes identical across rebuilds
+            self.variants["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+
+    def negotiate(self, accept_encoding: str) -> Tuple[Optional[str], bytes]:
+        """Pick the smallest variant the client accepts: (content-encoding or None, body)"""
+        accepted = set()
+        for part in accept_encoding.split(","):
+            coding, _, params = part.partition(";")
+            name, _, value = params.strip().partition("=")
+            try:
+                if name.strip() == "q" and float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+            accepted.add(coding.strip().lower())
+        for coding in ("br", "gzip"):
+            if coding in self.variants and (coding in accepted or "*" in accepted):
+                return coding, self.variants[coding]
+        return None, self.identity
+
+    def etag(self, coding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{coding}"' if coding else f'"{self.digest}"'
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.identity) + sum(len(variant) for variant in self.variants.values())
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cached_response(request: Request, body: EncodedBody, media_type: str = "application/json") -> Response:
+    """304 when the client's copy of the negotiated variant is current, otherwise that variant"""
+    coding, content = body.negotiate(request.headers.get("accept-encoding", ""))
+    etag = body.etag(coding)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", **body.headers}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+class ResponseCache:
+    """Encoded bodies keyed by request, valid for one catalog version and revision.
+
+    Entries are tagged with the catalog state they were built from, so an
+    in-place item update or a reload simply makes them miss; clear() drops
+    them eagerly when a new snapshot is swapped in. The cache is bounded both
+    by entry count and by the bytes of all variants it holds; bodies larger
+    than a quarter of the byte budget are served but never kept.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, EncodedBody]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: Hashable, state: Hashable) -> Optional[EncodedBody]:
+        """The cached body for key if it was built from this state; counts the hit or miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == state:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, state: Hashable, body: EncodedBody):
+        size = body.nbytes
+        if size * 4 > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1].nbytes
+            self._entries[key] = (state, body)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def get(self, key: Hashable, state: Hashable, build: Callable[[], EncodedBody]) -> EncodedBody:
+        body = self.lookup(key, state)
+        if body is None:
+            body = build()
+            self.put(key, state, body)
+        return body
+
+    def clear(self, *_):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, create_engine, event, inspect, select, text
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+interactions_table = Table(
+    "interactions",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", String, index=True),
+    Column("action", String, nullable=False, index=True),
+    Column("item_id", String, nullable=True),
+    Column("timestamp", String, nullable=True),
+    Column("received_at", Float, nullable=False),
+    Column("data", Text, nullable=True),
+    # The item as it was when the event arrived, so later price changes don't rewrite history
+    Column("category", String, nullable=True),
+    Column("original_price", Float, nullable=True),
+    Column("current_price", Float, nullable=True),
+)
+
+# Resolves an item id to (category, original_price, current_price), or None if unknown
+ItemLookup = Callable[[str], Optional[Tuple[str, float, float]]]
+
+
+def create_interaction_db(path: str):
+    """SQLite engine in WAL mode so batch inserts don't block readers"""
+    db = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(db, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    metadata.create_all(db)
+    _add_missing_columns(db)
+    return db
+
+
+def _add_missing_columns(db):
+    """Add nullable columns introduced after a database was created; old rows keep NULLs"""
+    existing = {column["name"] for column in inspect(db).get_columns(interactions_table.name)}
+    missing = [column for column in interactions_table.c if column.name not in existing]
+    if missing:
+        with db.begin() as conn:
+            for column in missing:
+                conn.execute(text(f"ALTER TABLE {interactions_table.name} ADD COLUMN {column.name} {column.type.compile(db.dialect)}"))
+
+
+def iter_rows(db, chunk_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """Replay stored interactions in insertion order, in the same shape as to_row"""
+    last_id = 0
+    columns = [c for c in interactions_table.c if c.name != "id"]
+    while True:
+        with db.connect() as conn:
+            result = conn.execute(
+                select(interactions_table.c.id, *columns)
+                .where(interactions_table.c.id > last_id)
+                .order_by(interactions_table.c.id)
+                .limit(chunk_size)
+            ).mappings().all()
+        if not result:
+            return
+        for record in result:
+            row = dict(record)
+            last_id = row.pop("id")
+            row["data"] = json.loads(row["data"]) if row["data"] is not None else None
+            yield row
+
+
+def to_row(payload: Dict[str, Any], received_at: Optional[float] = None) -> Dict[str, Any]:
+    """Flatten a /api/track-interaction payload into an interactions row.
+
+    data stays a dict here; it is JSON-encoded by the writer thread.
+    """
+    data = payload.get("data")
+    item_id = data.get("item_id") if isinstance(data, dict) else None
+    return {
+        "user_id": payload.get("user_id"),
+        "action": str(payload.get("action", "unknown")),
+        "item_id": str(item_id) if item_id is not None else None,
+        "timestamp": payload.get("timestamp"),
+        "received_at": received_at if received_at is not None else time.time(),
+        "data": data,
+        # Filled in from the catalog when the event is accepted
+        "category": None,
+        "original_price": None,
+        "current_price": None,
+    }
+
+
+class InteractionQueue:
+    """In-process write queue that batches interaction events into SQLite.
+
+    submit() never touches the disk: it places the event on a bounded queue
+    and returns False when the queue is full so callers can push back. A
+    background task drains the queue and writes a batch whenever it reaches
+    batch_size events or flush_interval seconds have passed, running the
+    insert in a worker thread so the event loop is never blocked on I/O.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        item_lookup: Optional[ItemLookup] = None,
+    ):
+        self.db_path = db_path
+        # Stamps each accepted event with its item's category and prices
+        self.item_lookup = item_lookup
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Call listener(row) for every accepted event, before it is written"""
+        self._listeners.append(listener)
+
+    def _accept(self, row: Dict[str, Any]):
+        if self.item_lookup is not None and row["item_id"]:
+            item = self.item_lookup(row["item_id"])
+            if item is not None:
+                row["category"], row["original_price"], row["current_price"] = item
+        self._queue.put_nowait(row)
+        for listener in self._listeners:
+            listener(row)
+
+    def replay(self):
+        """Feed every stored interaction to the listeners, e.g. to rebuild aggregates"""
+        for row in iter_rows(self.db):
+            for listener in self._listeners:
+                listener(row)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.db = await loop.run_in_executor(None, create_interaction_db, self.db_path)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, payload: Dict[str, Any]) -> bool:
+        """Enqueue one event; returns False if the queue is full or not running"""
+        if self._queue is None or self._stopping:
+            self.rejected += 1
+            return False
+        try:
+            self._accept(to_row(payload))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def submit_many(self, payloads: List[Dict[str, Any]]) -> bool:
+        """Enqueue a whole batch, or none of it if there isn't room for all events"""
+        if self._queue is None or self._stopping or self._queue.qsize() + len(payloads) > self.max_queue:
+            self.rejected += len(payloads)
+            return False
+        received_at = time.time()
+        for payload in payloads:
+            self._accept(to_row(payload, received_at))
+        self.accepted += len(payloads)
+        return True
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def stop(self):
+        """Stop accepting events and flush everything already queued"""
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+        self._queue = None
+        self.db.dispose()
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not (self._stopping and self._queue.empty()):
+            first = self._drain(1) or [await self._next(self.flush_interval)]
+            if first[0] is None:
+                continue
+            batch = first
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stopping:
+                batch.extend(self._drain(self.batch_size - len(batch)))
+                timeout = deadline - loop.time()
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+                row = await self._next(timeout)
+                if row is None:
+                    break
+                batch.append(row)
+            batch.extend(self._drain(self.batch_size - len(batch)))
+            try:
+                await self._write(batch)
+            except Exception:
+                logger.exception("Failed to write %d interaction events", len(batch))
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._insert, batch)
+        self.written += len(batch)
+        self.batches += 1
+
+    def _insert(self, batch: List[Dict[str, Any]]):
+        rows = [{**row, "data": json.dumps(row["data"]) if row["data"] is not None else None} for row in batch]
+        with self.db.begin() as conn:
+            conn.execute(interactions_table.insert(), rows)
@@ -0,0 +1,126 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from 50us up to 2.5s
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram for one label value"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class HistogramFamily:
+    """Histograms sharing a name and buckets, keyed by one label"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.children: Dict[str, Histogram] = {}
+
+    def labels(self, value: str) -> Histogram:
+        child = self.children.get(value)
+        if child is None:
+            child = self.children[value] = Histogram(self.buckets)
+        return child
+
+    @contextmanager
+    def time(self, value: str, record: Optional[Dict[str, float]] = None):
+        """Observe the wall time of the with-block under the given label.
+
+        With `record`, the time is stored there under the label instead, for
+        code running in a worker process whose histograms are never rendered;
+        the parent passes the dict to observe_all().
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if record is not None:
+                record[value] = record.get(value, 0.0) + elapsed
+            else:
+                self.labels(value).observe(elapsed)
+
+    def observe_all(self, timings: Dict[str, float]):
+        """Observe times recorded elsewhere, keyed by label"""
+        for value, seconds in timings.items():
+            self.labels(value).observe(seconds)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value, child in self.children.items():
+            labels = f'{self.label}="{value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{{{labels}}} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collects histograms and callback gauges/counters and renders Prometheus text format"""
+
+    def __init__(self):
+        self.histograms: List[HistogramFamily] = []
+        self.callbacks: List[Tuple[str, str, str, Callable[[], float]]] = []
+
+    def histogram(self, name: str, help_text: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> HistogramFamily:
+        family = HistogramFamily(name, help_text, label, buckets)
+        self.histograms.append(family)
+        return family
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """Register a gauge whose value is read when metrics are rendered"""
+        self.callbacks.append((name, help_text, "gauge", read))
+
+    def counter(self, name: str, help_text: str, read: Callable[[], float]):
+        """Register a monotonic counter whose value is read when metrics are rendered"""
+        self.callbacks.append((name, help_text, "counter", read))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self.histograms:
+            lines.extend(family.render())
+        for name, help_text, kind, read in self.callbacks:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(read())}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Time spent in each stage of /api/popup
+popup_stage_seconds = registry.histogram(
+    "popup_stage_seconds",
+    "Time spent in each stage of a /api/popup request",
+    "stage",
+)
@@ -0,0 +1,96 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Optional, Dict, Any, Union
+
+from timestamps import parse_timestamp
+
+# Upper bound on items returned in a single popup
+MAX_POPUP_ITEMS = 10
+
+# Pydantic models
+class UserProfile(BaseModel):
+    user_id: str
+    browsing_history: List[str] = []
+    purchase_history: List[str] = []
+    preferences: Dict[str, Any] = {}
+
+class ClearanceItem(BaseModel):
+    id: str
+    name: str
+    original_price: float
+    current_price: float
+    category: str
+    stock_count: int
+    days_until_removal: int
+    urgency_score: float
+    image_url: Optional[str] = None
+    description: Optional[str] = None
+
+class ProfileDelta(BaseModel):
+    """Profile changes since the previous request of a session"""
+    browsing_history: List[str] = []
+    purchase_history: List[str] = []
+    preferences: Dict[str, Any] = {}
+
+class PopupRequest(BaseModel):
+    # Full profile: required to start a session, optional afterwards
+    user_profile: Optional[UserProfile] = None
+    # Server-issued session id (X-Session-Id of an earlier response); with a full
+    # profile it restarts that session, keeping the items already shown in it
+    session_id: Optional[str] = None
+    profile_delta: Optional[ProfileDelta] = None
+    # Session version (X-Session-Version of the previous response) the delta applies to
+    base_version: Optional[str] = None
+    current_page: str
+    target_category: Optional[str] = None
+    session_data: Dict[str, Any] = {}
+    count: int = Field(1, ge=1, le=MAX_POPUP_ITEMS)
+
+    @model_validator(mode="after")
+    def check_session(self) -> "PopupRequest":
+        if self.user_profile is None and not (self.session_id and self.base_version):
+            raise ValueError("Either user_profile, or session_id and base_version, are required")
+        shown = self.session_data.get("shown_popups")
+        if shown is not None and not (isinstance(shown, list) and all(isinstance(item_id, str) for item_id in shown)):
+            raise ValueError("session_data.shown_popups must be a list of item ids")
+        return self
+
+    @property
+    def shown_popups(self) -> List[str]:
+        return self.session_data.get("shown_popups") or []
+
+class InteractionEvent(BaseModel):
+    user_id: Optional[str] = None
+    action: str
+    timestamp: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+
+class InventoryUpdate(BaseModel):
+    """New stock, price or removal time for one item; omitted fields keep their value"""
+    item_id: str
+    stock_count: Optional[int] = Field(None, ge=0)
+    current_price: Optional[float] = Field(None, gt=0)
+    # Unix seconds or an ISO-8601 timestamp; normalized to Unix seconds
+    removal_at: Optional[Union[float, str]] = None
+
+    @field_validator("removal_at")
+    @classmethod
+    def check_removal_at(cls, value):
+        if value is None:
+            return None
+        try:
+            return parse_timestamp(value)
+        except ValueError:
+            raise ValueError("removal_at must be Unix seconds or an ISO-8601 timestamp between 1970 and 9999")
+
+class InventoryBatch(BaseModel):
+    updates: List[InventoryUpdate] = Field(..., min_length=1)
+    # Apply nothing if any update is rejected
+    all_or_nothing: bool = False
+
+class PopupResponse(BaseModel):
+    show_popup: bool
+    items: Optional[List[ClearanceItem]] = None
+    discount_percentages: Optional[List[int]] = None
+    urgency_messages: Optional[List[str]] = None
+    sustainability_messages: Optional[List[str]] = None
+    timer_seconds: int = 0
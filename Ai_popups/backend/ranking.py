@@ -0,0 +1,81 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from catalog_store import CatalogSnapshot
+from collaborative import FactorModel
+from metrics import popup_stage_seconds
+from models import UserProfile
+from scoring import score_candidates
+from selection import diverse_top_k, top_k
+
+logger = logging.getLogger("clearance")
+
+
+def rank_items(
+    snapshot: CatalogSnapshot,
+    user_profile: UserProfile,
+    count: int,
+    target_category: Optional[str],
+    shown_popups: Optional[List[str]],
+    recently_shown: Iterable[str],
+    max_per_category: int = 1,
+    interest: Sequence[str] = (),
+    factors: Optional[FactorModel] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> List[int]:
+    """Catalog positions of the best items for a user.
+
+    Reads only the snapshot and its arguments, so it can run on the event
+    loop, in a worker thread or in a worker process with its own snapshot.
+    `interest` holds ids of items the user recently engaged with; candidates
+    similar to them are boosted when the snapshot has a neighbor table.
+    `factors` adds the collaborative filtering preference of users it knows.
+    Stage times go to popup_stage_seconds, or into `timings` when given
+    (worker processes send them back to the parent).
+    """
+    catalog = snapshot.catalog
+    index = snapshot.index
+
+    with popup_stage_seconds.time("candidates", timings):
+        # Category filter and TRUE clearance filter (high urgency or significant discount)
+        # are both precomputed bitsets, so this is a single AND
+        true_clearance = index.eligible_in(target_category)
+        considered = true_clearance
+
+        # Remove already shown items from this session
+        if shown_popups:
+            considered = index.without(considered, index.exclusions(user_profile.user_id, shown_popups))
+
+        # If no items left, reset and allow repeats from true clearance items
+        if not considered.any():
+            considered = true_clearance
+            logger.debug("No new items available, allowing repeats from true clearance items")
+
+        candidates = considered.indices()
+    logger.debug("Considering %d true clearance items for category '%s'", len(candidates), target_category)
+
+    with popup_stage_seconds.time("scoring", timings):
+        similarity = None
+        if snapshot.neighbors is not None and interest:
+            similarity = snapshot.neighbors.boost(catalog.indices_of(interest), candidates)
+        preference = factors.preference(user_profile.user_id, catalog, candidates) if factors is not None else None
+        scores = score_candidates(
+            catalog,
+            candidates,
+            user_profile.browsing_history,
+            user_profile.purchase_history,
+            catalog.indices_of(recently_shown),
+            similarity=similarity,
+            preference=preference,
+        )
+
+    # Partial top-k selection instead of sorting every scored item
+    with popup_stage_seconds.time("selection", timings):
+        if target_category:
+            # For category-specific requests, just take the top items
+            selected = top_k(candidates, scores, count)
+        else:
+            # Ensure we don't show the same items repeatedly by adding category diversity
+            selected = diverse_top_k(candidates, scores, catalog.category, count, max_per_category)
+
+    return selected[:count]
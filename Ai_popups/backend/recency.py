@@ -0,0 +1,136 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+# Rough per-entry costs used for the memory counter: an OrderedDict slot
+# plus its float timestamp, and the per-user container overhead
+ENTRY_BYTES = 100 + sys.getsizeof(0.0)
+USER_BYTES = 400
+
+
+class _History:
+    """Insertion-ordered item history for one user, oldest first"""
+
+    __slots__ = ("items", "last_seen")
+
+    def __init__(self, now: float):
+        self.items: "OrderedDict[str, float]" = OrderedDict()
+        self.last_seen = now
+
+
+class RecencyStore:
+    """Per-user, bounded store of recently shown items.
+
+    Each user keeps at most `per_user_limit` items in insertion order, entries
+    expire after `ttl_seconds`, and the total number of entries across all
+    users is capped at `max_entries` by evicting the least recently active
+    users first. Inserts and lookups are O(1) amortized.
+    """
+
+    def __init__(
+        self,
+        per_user_limit: int = 5,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1_000_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.per_user_limit = per_user_limit
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._users: "OrderedDict[str, _History]" = OrderedDict()
+        self._entries = 0
+
+        # Eviction counters, by reason
+        self.evicted_over_user_limit = 0
+        self.evicted_expired = 0
+        self.evicted_idle_users = 0
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def add(self, user_id: str, item_id: str):
+        """Record that item_id was just shown to user_id"""
+        now = self.clock()
+        history = self._touch(user_id, now, create=True)
+        items = history.items
+        if item_id in items:
+            items.move_to_end(item_id)
+        else:
+            self._entries += 1
+            if len(items) >= self.per_user_limit:
+                items.popitem(last=False)
+                self._entries -= 1
+                self.evicted_over_user_limit += 1
+        items[item_id] = now
+        self._enforce_limits(now, keep=user_id)
+
+    def contains(self, user_id: str, item_id: str) -> bool:
+        """Whether item_id was shown to user_id within the TTL"""
+        history = self._users.get(user_id)
+        if history is None:
+            return False
+        shown_at = history.items.get(item_id)
+        return shown_at is not None and self.clock() - shown_at < self.ttl_seconds
+
+    def recent(self, user_id: str) -> List[str]:
+        """Unexpired items recently shown to user_id, oldest first"""
+        now = self.clock()
+        history = self._touch(user_id, now, create=False)
+        if history is None:
+            return []
+        self._expire(user_id, history, now)
+        return list(history.items)
+
+    def _touch(self, user_id: str, now: float, create: bool) -> Optional[_History]:
+        history = self._users.get(user_id)
+        if history is None:
+            if not create:
+                return None
+            history = self._users[user_id] = _History(now)
+        else:
+            self._users.move_to_end(user_id)
+        history.last_seen = now
+        return history
+
+    def _expire(self, user_id: str, history: _History, now: float):
+        """Drop expired entries from the front of one user's history"""
+        items = history.items
+        cutoff = now - self.ttl_seconds
+        while items:
+            item_id, shown_at = next(iter(items.items()))
+            if shown_at > cutoff:
+                break
+            del items[item_id]
+            self._entries -= 1
+            self.evicted_expired += 1
+        if not items:
+            del self._users[user_id]
+
+    def _enforce_limits(self, now: float, keep: str):
+        """Evict idle users: expired ones first, then LRU while over the entry ceiling"""
+        cutoff = now - self.ttl_seconds
+        while self._users:
+            user_id, history = next(iter(self._users.items()))
+            if user_id == keep:
+                break
+            if history.last_seen > cutoff and self._entries <= self.max_entries:
+                break
+            del self._users[user_id]
+            self._entries -= len(history.items)
+            if history.last_seen <= cutoff:
+                self.evicted_expired += len(history.items)
+            else:
+                self.evicted_idle_users += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Size, estimated memory use and eviction counters"""
+        return {
+            "users": len(self._users),
+            "entries": self._entries,
+            "estimated_bytes": self._entries * ENTRY_BYTES + len(self._users) * USER_BYTES,
+            "evicted_over_user_limit": self.evicted_over_user_limit,
+            "evicted_expired": self.evicted_expired,
+            "evicted_idle_users": self.evicted_idle_users,
+        }
@@ -0,0 +1,88 @@
+import random
+from typing import Optional
+
+import numpy as np
+
+from catalog import CatalogArrays
+
+# Thresholds for "true clearance" items
+MIN_CLEARANCE_URGENCY = 0.7
+MIN_CLEARANCE_DISCOUNT = 40
+
+# Score adjustments applied on top of the urgency score
+BROWSING_BOOST = 0.2
+PURCHASE_BOOST = 0.3
+RECENTLY_SHOWN_PENALTY = 0.3
+# Applied to content similarity with the user's recent items, capped at 1
+SIMILARITY_BOOST = 0.3
+# Applied to the collaborative filtering preference, clipped to [0, 1]
+PREFERENCE_BOOST = 0.3
+RANDOM_BOOST_RANGE = (0.1, 0.5)
+
+# Below this many draws, calling the generator directly is cheaper than
+# moving its state into numpy and back
+STATE_TRANSFER_MIN_DRAWS = 512
+
+
+def uniform_from_random(n: int, low: float, high: float, rng: Optional[random.Random] = None) -> np.ndarray:
+    """Draw n values exactly as n successive rng.uniform(low, high) calls would.
+
+    CPython's random module and numpy's legacy RandomState share the MT19937
+    generator and the same 53-bit double construction, so the state is handed
+    to numpy for a vectorized draw and then handed back. Seeded runs therefore
+    produce the same boosts as the per-item loop did.
+    """
+    rng = rng if rng is not None else random._inst
+    if n < STATE_TRANSFER_MIN_DRAWS:
+        # Copying the 624-word state costs more than a short Python loop
+        return np.fromiter((rng.uniform(low, high) for _ in range(n)), dtype=np.float64, count=n)
+    version, internal, gauss_next = rng.getstate()
+    state = np.random.RandomState()
+    state.set_state(("MT19937", np.array(internal[:-1], dtype=np.uint32), internal[-1]))
+    draws = state.random_sample(n)
+    _, key, pos, _, _ = state.get_state()
+    rng.setstate((version, tuple(key.tolist()) + (int(pos),), gauss_next))
+    return low + (high - low) * draws
+
+
+def is_true_clearance(urgency: float, discount_pct: float) -> bool:
+    """Scalar form of clearance_mask for single-item updates"""
+    return bool(urgency >= MIN_CLEARANCE_URGENCY or discount_pct >= MIN_CLEARANCE_DISCOUNT)
+
+
+def clearance_mask(catalog: CatalogArrays, indices: Optional[np.ndarray] = None) -> np.ndarray:
+    """Items with high urgency (>= 0.7) OR a significant discount (>= 40%), optionally only at `indices`"""
+    urgency, discount_pct = catalog.urgency, catalog.discount_pct
+    if indices is not None:
+        urgency, discount_pct = urgency[indices], discount_pct[indices]
+    return (urgency >= MIN_CLEARANCE_URGENCY) | (discount_pct >= MIN_CLEARANCE_DISCOUNT)
+
+
+def score_candidates(
+    catalog: CatalogArrays,
+    candidates: np.ndarray,
+    browsing_history,
+    purchase_history,
+    recently_shown: np.ndarray,
+    rng: Optional[random.Random] = None,
+    similarity: Optional[np.ndarray] = None,
+    preference: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Score candidate positions; additions happen in the same order as the original loop"""
+    scores = catalog.urgency[candidates].copy()
+    if browsing_history:
+        scores[catalog.category_mask(browsing_history)[candidates]] += BROWSING_BOOST
+    if purchase_history:
+        scores[catalog.category_mask(purchase_history)[candidates]] += PURCHASE_BOOST
+    if recently_shown.size:
+        penalized = np.zeros(len(catalog), dtype=bool)
+        penalized[recently_shown] = True
+        scores[penalized[candidates]] -= RECENTLY_SHOWN_PENALTY
+    if similarity is not None:
+        # Summed neighbor scores aligned with candidates (see similarity.NeighborTable.boost)
+        scores += SIMILARITY_BOOST * np.minimum(similarity, 1.0)
+    if preference is not None:
+        # Predicted preference aligned with candidates (see collaborative.FactorModel.preference)
+        scores += PREFERENCE_BOOST * np.clip(preference, 0.0, 1.0)
+    scores += uniform_from_random(len(candidates), *RANDOM_BOOST_RANGE, rng=rng)
+    return scores
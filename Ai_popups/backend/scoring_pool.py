@@ -0,0 +1,357 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+import shared_catalog
+from catalog import CatalogArrays, load_catalog
+from catalog_store import CatalogDelta, CatalogSnapshot, CatalogStore
+from collaborative import FactorStore
+from metrics import popup_stage_seconds
+from models import MAX_POPUP_ITEMS, UserProfile
+from ranking import rank_items
+from selection import top_k
+from similarity import load_neighbors
+from urgency import refresh_urgency
+
+logger = logging.getLogger("clearance")
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+# Edited items forwarded to process workers with every job until all have them; once
+# edits since the pool started cover more items than this, the pool is replaced instead
+MAX_FORWARDED_ITEMS = 16384
+
+# Snapshot held by each worker process, loaded by _init_worker
+_worker_snapshot: Optional[CatalogSnapshot] = None
+# Seconds between the worker's own urgency passes (0 = never) and when it last ran one
+_worker_urgency_interval = 0.0
+_worker_urgency_at = 0.0
+# The worker's view of the collaborative filtering model directory, if there is one
+_worker_factors: Optional[FactorStore] = None
+# Neighbor table as loaded, mapped onto each catalog the worker loads
+_worker_neighbors = None
+# Shared catalog directory the worker follows, and the manifest mtime it last saw there
+_worker_shared_dir: Optional[str] = None
+_worker_manifest_mtime: Optional[int] = None
+
+
+def _init_worker(
+    source: Union[str, CatalogArrays],
+    version: int,
+    shared_dir: Optional[str] = None,
+    urgency_interval: float = 0.0,
+    similarity_path: Optional[str] = None,
+    factor_dir: Optional[str] = None,
+):
+    global _worker_urgency_interval, _worker_factors, _worker_neighbors, _worker_shared_dir
+    _worker_neighbors = load_neighbors(similarity_path)
+    if factor_dir is not None:
+        _worker_factors = FactorStore(factor_dir)
+    _worker_urgency_interval = urgency_interval
+    _worker_shared_dir = shared_dir
+    if shared_dir is not None:
+        # Map the published columns rather than parsing the catalog again
+        _follow_shared()
+    if _worker_snapshot is None:
+        catalog = load_catalog(source) if isinstance(source, str) else source
+        _load_worker_snapshot(CatalogSnapshot(catalog, version))
+
+
+def _load_worker_snapshot(snapshot: CatalogSnapshot):
+    """Make a newly loaded catalog the worker's, preparing it like the parent's store does"""
+    global _worker_snapshot, _worker_urgency_at
+    if _worker_neighbors is not None:
+        snapshot.neighbors = _worker_neighbors.for_catalog(snapshot.catalog)
+    if _worker_factors is not None:
+        _worker_factors.refresh(snapshot.catalog)
+    _worker_snapshot = snapshot
+    # Loaded columns carry the urgency they were saved with
+    _worker_urgency_at = 0.0
+    _refresh_worker_urgency()
+
+
+def _follow_shared():
+    """Pick up versions published to the shared directory, reloads and edits alike.
+
+    A stat() per job. An edit of the catalog the worker holds is applied to
+    its snapshot in place of building a new one (see CatalogSnapshot.follow).
+    """
+    global _worker_snapshot, _worker_manifest_mtime
+    try:
+        mtime = os.stat(os.path.join(_worker_shared_dir, shared_catalog.MANIFEST)).st_mtime_ns
+    except OSError:
+        return
+    if mtime == _worker_manifest_mtime:
+        return
+    manifest = shared_catalog.read_manifest(_worker_shared_dir)
+    if manifest is None or (_worker_snapshot is not None and manifest["version"] == _worker_snapshot.version):
+        _worker_manifest_mtime = mtime
+        return
+    # Unlocked, so publishing never stalls scoring; map_current retries if the version goes away
+    mapped = shared_catalog.map_current(_worker_shared_dir)
+    if mapped is None:
+        return
+    manifest, catalog = mapped
+    _worker_manifest_mtime = mtime
+    source_version = manifest.get("source_version", manifest["version"])
+    if _worker_snapshot is not None and _worker_snapshot.source_version == source_version:
+        _worker_snapshot = _worker_snapshot.follow(catalog, manifest["version"], time.time())
+    else:
+        _load_worker_snapshot(CatalogSnapshot(catalog, manifest["version"], source_version=source_version))
+
+
+def _refresh_worker_urgency():
+    """Keep the worker's urgency as current as the parent's, on the same schedule"""
+    global _worker_urgency_at
+    now = time.time()
+    if _worker_urgency_interval > 0 and now - _worker_urgency_at >= _worker_urgency_interval:
+        refresh_urgency(_worker_snapshot, now)
+        _worker_urgency_at = now
+
+
+def _worker_ready() -> int:
+    return _worker_snapshot.version
+
+
+def _rank_in_worker(
+    user_profile: UserProfile,
+    count: int,
+    target_category: Optional[str],
+    shown_popups: Optional[List[str]],
+    recently_shown: List[str],
+    max_per_category: int,
+    interest: List[str],
+    delta: Optional[CatalogDelta] = None,
+) -> Tuple[int, int, List[str], Dict[str, float]]:
+    global _worker_snapshot
+    if _worker_shared_dir is not None:
+        _follow_shared()
+    elif delta is not None and delta.version > _worker_snapshot.version:
+        # Edits made since this pool started, merged; see ScoringExecutor._forward_edit
+        _worker_snapshot = _worker_snapshot.apply_delta(delta, time.time())
+    _refresh_worker_urgency()
+    snapshot = _worker_snapshot
+    # Only pops what is already due, so checking on every job is cheap
+    snapshot.expire_due(time.time())
+    factors = None
+    if _worker_factors is not None:
+        # A stat() per job; workers load retrained models from the shared directory themselves
+        _worker_factors.refresh(snapshot.catalog)
+        factors = _worker_factors.current
+    # This process's histograms are never rendered; the parent records the stage times
+    timings: Dict[str, float] = {}
+    selected = rank_items(snapshot, user_profile, count, target_category, shown_popups, recently_shown, max_per_category, interest, factors, timings)
+    # Ids rather than positions, so the parent can map them into whichever snapshot it renders from
+    return os.getpid(), snapshot.version, [snapshot.catalog.ids[position] for position in selected], timings
+
+
+class ScoringExecutor:
+    """Runs the candidate/scoring/selection stage inline, in a thread pool or in a process pool.
+
+    Pooled modes never block the event loop on scoring. When more than
+    max_pending requests are already being scored, or one takes longer than
+    timeout seconds, the request gets the cached default popup for its
+    category instead. Inline mode runs on the event loop and has neither
+    limit. Process workers load their own copy of the catalog and
+    recompute urgency and expire items on the same schedule as the parent.
+    With a shared catalog directory they follow published versions
+    themselves. Otherwise the pool is replaced when the store reloads, and
+    edits reach the workers as deltas sent along with their next jobs.
+    """
+
+    def __init__(
+        self,
+        store: CatalogStore,
+        mode: str = "inline",
+        workers: Optional[int] = None,
+        max_pending: int = 64,
+        timeout: float = 0.25,
+        urgency_interval: float = 0.0,
+        similarity_path: Optional[str] = None,
+        factor_dir: Optional[str] = None,
+    ):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Scoring executor mode must be one of {EXECUTOR_MODES}, got {mode!r}")
+        self.store = store
+        self.mode = mode
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.urgency_interval = urgency_interval
+        # Workers load their own neighbor table from here
+        self.similarity_path = similarity_path
+        # ... and memory-map collaborative filtering models from here
+        self.factor_dir = factor_dir
+        self.pending = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.failures = 0
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        self._defaults: Dict[Tuple[int, int, Optional[str]], List[int]] = {}
+        # Edits since the pool started, merged, until every worker has ranked with them
+        self._delta: Optional[CatalogDelta] = None
+        # Worker pid -> version it last ranked with, for the current pool
+        self._worker_versions: Dict[int, int] = {}
+        if mode == "process" and store.shared_dir is None:
+            store.subscribe(self._recycle)
+            store.on_edit(self._forward_edit)
+
+    def _new_pool(self, snapshot: CatalogSnapshot) -> Executor:
+        if self.mode == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scoring")
+        # Spawned workers start clean instead of forking a process that already runs threads
+        # Workers reload the file themselves unless it no longer describes the snapshot
+        source = self.store.path if self.store.path is not None and not snapshot.edited else snapshot.catalog
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(source, snapshot.version, self.store.shared_dir, self.urgency_interval, self.similarity_path, self.factor_dir),
+        )
+
+    def _warm_up(self, pool: Executor) -> List:
+        """Start every worker process now rather than on the first popup requests"""
+        return [pool.submit(_worker_ready) for _ in range(self.workers)]
+
+    async def start(self):
+        if self.mode == "inline" or self._pool is not None:
+            return
+        pool = self._new_pool(self.store.current)
+        if self.mode == "process":
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in self._warm_up(pool)))
+        self._pool = pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle(self, snapshot: CatalogSnapshot, wait: bool = True):
+        """Swap in workers holding the new snapshot; running jobs finish on the old ones"""
+        if self._pool is None:
+            return
+        pool = self._new_pool(snapshot)
+        if wait:
+            # Called from the reload thread, so the old workers keep serving until these are up
+            for future in self._warm_up(pool):
+                future.result()
+        with self._pool_lock:
+            old, self._pool = self._pool, pool
+            self._delta = None
+            self._worker_versions = {}
+        if old is not None:
+            old.shutdown(wait=False)
+
+    def _forward_edit(self, snapshot: CatalogSnapshot, delta: CatalogDelta):
+        """Queue an edit for the workers, merged with the ones they may not have yet"""
+        if self._pool is None:
+            return
+        pending = self._delta
+        positions, columns = delta.positions, list(delta.columns)
+        if pending is not None:
+            positions = np.union1d(pending.positions, positions)
+            columns += [column for column in pending.columns if column not in delta.columns]
+        if len(positions) > MAX_FORWARDED_ITEMS:
+            self._recycle(snapshot)
+        else:
+            # Values as of this snapshot, so workers at any earlier version end up at this one
+            self._delta = CatalogDelta.of(snapshot, positions, columns)
+
+    def _delta_for_workers(self) -> Optional[CatalogDelta]:
+        delta = self._delta
+        if delta is None:
+            return None
+        versions = self._worker_versions
+        if len(versions) >= self.workers and min(versions.values()) >= delta.version:
+            return None
+        return delta
+
+    def default_indices(self, snapshot: CatalogSnapshot, target_category: Optional[str], count: int) -> List[int]:
+        """Most urgent true clearance items for the category, cached per catalog state"""
+        key = (snapshot.version, snapshot.revision, target_category)
+        selected = self._defaults.get(key)
+        if selected is None:
+            if len(self._defaults) > 1024:
+                self._defaults.clear()
+            candidates = snapshot.index.eligible_in(target_category).indices()
+            selected = self._defaults[key] = top_k(candidates, snapshot.catalog.urgency[candidates], MAX_POPUP_ITEMS)
+        return selected[:count]
+
+    async def select(
+        self,
+        engine,
+        snapshot: CatalogSnapshot,
+        user_profile: UserProfile,
+        count: int,
+        target_category: Optional[str],
+        shown_popups: Optional[List[str]],
+    ) -> List[int]:
+        """Best item positions in `snapshot`, or the default popup when scoring is shed or too slow"""
+        if self._pool is None:
+            return engine.select_best_indices(snapshot, user_profile, count, target_category, shown_popups)
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return self._fallback(engine, snapshot, user_profile, target_category, count)
+
+        loop = asyncio.get_running_loop()
+        recent = engine.recently_shown.recent(user_profile.user_id)
+        interest = engine.recent_interest.recent(user_profile.user_id)
+        args = (user_profile, count, target_category, shown_popups, recent, engine.max_per_category, interest)
+        if self.mode == "thread":
+            future = loop.run_in_executor(self._pool, rank_items, snapshot, *args, engine.current_factors())
+        else:
+            pool = self._pool
+            future = loop.run_in_executor(pool, _rank_in_worker, *args, self._delta_for_workers())
+
+        # Count the job until the worker actually finishes, even if we stop waiting for it
+        self.pending += 1
+        future.add_done_callback(self._job_done)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return self._fallback(engine, snapshot, user_profile, target_category, count)
+        except Exception as e:
+            self.failures += 1
+            logger.exception("Scoring job failed, serving the default popup")
+            if isinstance(e, BrokenExecutor):
+                # A worker process died and took the pool with it
+                self._recycle(self.store.current, wait=False)
+            return self._fallback(engine, snapshot, user_profile, target_category, count)
+
+        if self.mode == "thread":
+            selected = result
+        else:
+            pid, version, item_ids, timings = result
+            if pool is self._pool:
+                self._worker_versions[pid] = version
+            popup_stage_seconds.observe_all(timings)
+            lookup = snapshot.catalog.id_to_index
+            selected = [lookup[item_id] for item_id in item_ids if item_id in lookup]
+            # Workers expire items themselves, but one may still hold an older snapshot while
+            # a new pool starts; never show an item whose removal time has passed here
+            removal_at, now = snapshot.catalog.removal_at, time.time()
+            selected = [position for position in selected if removal_at[position] > now]
+        engine.remember_shown(user_profile.user_id, [snapshot.catalog.ids[position] for position in selected])
+        return selected
+
+    def _job_done(self, future: asyncio.Future):
+        self.pending -= 1
+        if not future.cancelled():
+            # Mark the outcome as retrieved; select() reports failures it waited for
+            future.exception()
+
+    def _fallback(self, engine, snapshot: CatalogSnapshot, user_profile: UserProfile, target_category: Optional[str], count: int) -> List[int]:
+        selected = self.default_indices(snapshot, target_category, count)
+        engine.remember_shown(user_profile.user_id, [snapshot.catalog.ids[position] for position in selected])
+        return selected
@@ -0,0 +1,84 @@
+from typing import List
+
+import numpy as np
+
+# Initial candidate pool is this many times the requested count
+POOL_FACTOR = 4
+
+
+def _ranked_pool(candidates: np.ndarray, scores: np.ndarray, size: int) -> np.ndarray:
+    """Positions (into candidates) of the `size` best scores, best first.
+
+    Uses a partial partition instead of a full sort. Items tied with the
+    last score in the pool are admitted in catalog order and the pool is
+    sorted stably, so ties resolve the same way a full stable sort would.
+    """
+    n = len(scores)
+    if size >= n:
+        pool = np.arange(n)
+    else:
+        cutoff = -np.partition(-scores, size - 1)[size - 1]
+        above = np.flatnonzero(scores > cutoff)
+        tied = np.flatnonzero(scores == cutoff)[:size - len(above)]
+        pool = np.sort(np.concatenate((above, tied)))
+    return pool[np.argsort(-scores[pool], kind="stable")]
+
+
+def top_k(candidates: np.ndarray, scores: np.ndarray, k: int) -> List[int]:
+    """Catalog positions of the k best-scoring candidates, best first"""
+    if k <= 0 or not len(candidates):
+        return []
+    return candidates[_ranked_pool(candidates, scores, k)].tolist()
+
+
+def diverse_top_k(
+    candidates: np.ndarray,
+    scores: np.ndarray,
+    categories: np.ndarray,
+    k: int,
+    max_per_category: int = 1,
+) -> List[int]:
+    """Top-k with at most max_per_category items per category in the first pass.
+
+    Slots the diversity pass cannot fill are then filled from the best remaining
+    items regardless of category. The pool of best items grows geometrically
+    until the result is known to match a scan over every candidate, so the cost
+    is a partition of the scores plus a sort of a pool proportional to k.
+    """
+    n = len(candidates)
+    if k <= 0 or not n:
+        return []
+    candidate_categories = categories[candidates]
+    size = min(n, POOL_FACTOR * k)
+    while True:
+        ranked = _ranked_pool(candidates, scores, size)
+        selected: List[int] = []
+        per_category = {}
+        for position in ranked.tolist():
+            code = int(candidate_categories[position])
+            taken = per_category.get(code, 0)
+            if taken < max_per_category:
+                selected.append(position)
+                per_category[code] = taken + 1
+                if len(selected) == k:
+                    break
+        if len(selected) == k or size == n:
+            break
+        # Lower-ranked items outside the pool only matter if their category
+        # still has room in the diversity pass
+        saturated = [code for code, taken in per_category.items() if taken >= max_per_category]
+        outside = np.ones(n, dtype=bool)
+        outside[ranked] = False
+        if not np.any(outside & ~np.isin(candidate_categories, saturated)):
+            break
+        size = min(n, size * POOL_FACTOR)
+
+    # Second pass: fill remaining slots with the best unselected items
+    if len(selected) < k:
+        chosen = set(selected)
+        for position in ranked.tolist():
+            if position not in chosen:
+                selected.append(position)
+                if len(selected) == k:
+                    break
+    return candidates[selected].tolist()
@@ -0,0 +1,724 @@
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from typing import Iterator, List, Optional, Dict, Any, Tuple
+import asyncio
+import hmac
+import ipaddress
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import math
+import os
+import time
+
+import numpy as np
+
+from analytics import InteractionAggregates, RollupStore
+from catalog import CatalogArrays
+from catalog_query import DISCOUNT_EDGES, URGENCY_EDGES, query_catalog
+from catalog_store import CatalogSnapshot, CatalogStore
+from collaborative import CollaborativeTrainer, FactorModel, FactorStore
+from encoding import NO_POPUP_JSON, encode_item, encode_popup
+from http_cache import EncodedBody, ResponseCache, cached_response
+from interactions import InteractionQueue
+from metrics import popup_stage_seconds, registry
+from models import (
+    ClearanceItem,
+    InteractionEvent,
+    InventoryBatch,
+    InventoryUpdate,
+    PopupRequest,
+    PopupResponse,
+    UserProfile,
+)
+from recency import RecencyStore
+from ranking import rank_items
+from scoring_pool import ScoringExecutor
+from sessions import SessionStore
+from similarity import load_neighbors
+from timestamps import parse_timestamp
+from urgency import UrgencyRefresher, urgency_score
+
+logger = logging.getLogger("clearance")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the background services when the server starts and stop them in reverse order"""
+    # Debug output is level-gated; set LOG_LEVEL=DEBUG to see per-request details.
+    # Configured here rather than at import so importing the app leaves logging alone
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+    await interaction_queue.start()
+    # Replay the stored log once so the counters survive restarts
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, interaction_queue.replay)
+    await scoring_executor.start()
+    urgency_refresher.start()
+    await cf_trainer.start()
+    catalog_store.start_expiry()
+    catalog_store.start_watching(CATALOG_WATCH_INTERVAL)
+    try:
+        yield
+    finally:
+        await catalog_store.stop_watching()
+        await catalog_store.stop_expiry()
+        await cf_trainer.stop()
+        await urgency_refresher.stop()
+        scoring_executor.shutdown()
+        await interaction_queue.stop()
+
+app = FastAPI(title="Smart Clearance Pop-ups API", version="1.0.0", lifespan=lifespan)
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Session-Id", "X-Session-Version"],
+)
+
+def finite_or_text(value: float):
+    return value if math.isfinite(value) else str(value)
+
+@app.exception_handler(RequestValidationError)
+async def request_validation_error(request: Request, exc: RequestValidationError):
+    """FastAPI's default 422 response, except that rejected NaN or infinite inputs are echoed
+    as strings; JSON can't carry them, so the default handler failed with a 500"""
+    detail = jsonable_encoder(exc.errors(), custom_encoder={float: finite_or_text})
+    return JSONResponse(status_code=422, content={"detail": detail})
+
+# Upper bound on items per page of /api/clearance-items
+MAX_PAGE_SIZE = 1000
+
+# Items serialized per chunk written by /api/clearance-items/export
+EXPORT_CHUNK_ITEMS = 1000
+
+# Upper bound on events accepted by /api/track-interactions, and on the size of its body
+MAX_INTERACTION_BATCH = 1000
+MAX_INTERACTION_BODY_BYTES = 1024 * 1024
+
+# Upper bound on updates accepted by /api/inventory/bulk
+MAX_INVENTORY_BATCH = 10000
+
+interaction_batch_adapter = TypeAdapter(List[InteractionEvent])
+clearance_items_adapter = TypeAdapter(List[ClearanceItem])
+
+# Clearance catalog data file (.jsonl, .csv or .npz); loaded straight into columns
+CATALOG_PATH = os.getenv("CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "clearance_items.jsonl"))
+
+# Directory where the catalog is published as memory-mapped columns shared by all
+# worker processes; unset keeps a private copy per process
+CATALOG_SHARED_DIR = os.getenv("CATALOG_SHARED_DIR") or None
+
+# Seconds between checks of the catalog file for changes (0 disables the watcher)
+CATALOG_WATCH_INTERVAL = float(os.getenv("CATALOG_WATCH_INTERVAL", "5"))
+
+# Where popup scoring runs: "inline" on the event loop, or a "thread" or "process" pool
+SCORING_EXECUTOR = os.getenv("SCORING_EXECUTOR", "inline")
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "0")) or None
+# Pooled modes only: concurrent scoring jobs before shedding load, and the per-request
+# deadline; requests over either limit get the default popup for their category
+SCORING_MAX_PENDING = int(os.getenv("SCORING_MAX_PENDING", "64"))
+SCORING_TIMEOUT_MS = float(os.getenv("SCORING_TIMEOUT_MS", "250"))
+
+# Seconds between recomputations of urgency and days until removal from removal times
+# and stock (0 keeps the urgency scores given in the catalog)
+URGENCY_REFRESH_INTERVAL = float(os.getenv("URGENCY_REFRESH_INTERVAL", "60"))
+
+# Collaborative filtering: where trained factors are published (shared by all workers) and
+# seconds between retraining runs on the interaction log (0 only serves an existing model)
+CF_MODEL_DIR = os.getenv("CF_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cf_model"))
+CF_TRAIN_INTERVAL = float(os.getenv("CF_TRAIN_INTERVAL", "3600"))
+
+# When set, admin endpoints require this value in the X-Admin-Token header; when unset
+# they only answer requests from the local machine
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Catalog columns a bulk inventory batch may write, directly or through urgency
+INVENTORY_COLUMNS = ("stock", "current_price", "discount_pct", "removal_at", "urgency", "days")
+# Interactions that make an item's neighbors worth boosting for that user
+INTEREST_ACTIONS = {"add_to_cart", "view"}
+
+class ClearanceEngine:
+    def __init__(self, store: CatalogStore, urgency: Optional[UrgencyRefresher] = None, factors: Optional[FactorStore] = None):
+        # Hot-reloadable catalog; each request works on one snapshot of it
+        self.store = store
+        # Recomputes an item's urgency when its stock or removal time changes
+        self.urgency = urgency
+        # Collaborative filtering model trained from the interaction log, if one is published
+        self.factors = factors
+        # Track recently shown items per user to avoid repetition
+        # (last 5 items per user, expiring after an hour)
+        self.recently_shown = RecencyStore(per_user_limit=5, ttl_seconds=3600)
+        # Items each user recently viewed or carted, whose similar items get boosted
+        # (last 10 items per user, expiring after a day)
+        self.recent_interest = RecencyStore(per_user_limit=10, ttl_seconds=86400)
+        self.max_per_category = 1  # Diversity cap for multi-category popups
+    
+    @property
+    def catalog(self) -> CatalogArrays:
+        """Catalog of the current snapshot; read store.current once instead for multi-step work"""
+        return self.store.current.catalog
+    
+    def current_factors(self) -> Optional[FactorModel]:
+        return self.factors.current if self.factors is not None else None
+    
+    def apply_inventory(self, updates: List[InventoryUpdate], all_or_nothing: bool = False) -> Tuple[List[Dict[str, Any]], bool]:
+        """Validate a batch of inventory updates, then apply the accepted ones in one step.
+        
+        The batch is applied to a copy of the current snapshot that is swapped in
+        whole (see CatalogStore.edit), so popup requests, on the event loop or in
+        scoring threads, see either none or all of it, and process workers and
+        other server workers get the new snapshot too. Columns are written with
+        one vectorized assignment per field and only the touched index entries
+        are refreshed. Returns per-item outcomes and whether anything was
+        applied. Only the columns a batch can touch are copied. Blocking; run
+        it off the event loop.
+        """
+        results: List[Dict[str, Any]] = []
+        accepted: List[int] = []
+        lapsed: List[int] = []
+        
+        def change(draft: CatalogSnapshot) -> bool:
+            catalog = draft.catalog
+            lookup = catalog.id_to_index
+            # Field -> (positions, values) of accepted updates; later updates to an item win
+            columns: Dict[str, Tuple[List[int], List[float]]] = {
+                "stock_count": ([], []), "current_price": ([], []), "removal_at": ([], []),
+            }
+            for update in updates:
+                index = lookup.get(update.item_id)
+                if index is None:
+                    results.append({"item_id": update.item_id, "status": "not_found"})
+                    continue
+                problem = None
+                removal_at = None
+                if update.stock_count is None and update.current_price is None and update.removal_at is None:
+                    problem = "No changes given"
+                elif update.current_price is not None and update.current_price > catalog.original_price[index]:
+                    problem = "current_price exceeds original_price"
+                elif update.removal_at is not None:
+                    try:
+                        removal_at = parse_timestamp(update.removal_at)
+                    except ValueError:
+                        problem = "removal_at must be Unix seconds or an ISO-8601 timestamp"
+                if problem is not None:
+                    results.append({"item_id": update.item_id, "status": "rejected", "detail": problem})
+                    continue
+                for field, value in (("stock_count", update.stock_count), ("current_price", update.current_price), ("removal_at", removal_at)):
+                    if value is not None:
+                        columns[field][0].append(index)
+                        columns[field][1].append(value)
+                accepted.append(index)
+                results.append({"item_id": update.item_id, "status": "updated"})
+            
+            if not accepted or (all_or_nothing and len(accepted) < len(updates)):
+                return False
+            for field, (positions, values) in columns.items():
+                if positions:
+                    catalog.update_item(np.array(positions), **{field: np.array(values)})
+            if self.urgency is not None:
+                self.urgency.recompute_items(draft, np.array(columns["stock_count"][0] + columns["removal_at"][0], dtype=np.int64))
+            lapsed.extend(draft.reschedule(columns["removal_at"][0], time.time()).tolist())
+            draft.refresh_items(accepted)
+            return True
+        
+        snapshot = self.store.edit(change, INVENTORY_COLUMNS)
+        if snapshot is None:
+            for result in results:
+                if result["status"] == "updated":
+                    result["status"] = "not_applied"
+            return results, False
+        self.store.notify_change(snapshot, np.unique(accepted), "updated")
+        self.store.notify_change(snapshot, np.array(lapsed, dtype=np.int64), "expired")
+        return results, True
+    
+    def calculate_urgency_score(self, item: ClearanceItem) -> float:
+        """Calculate urgency score based on stock and days until removal"""
+        return urgency_score(item.stock_count, item.days_until_removal)
+    
+    def calculate_dynamic_discount(self, item: ClearanceItem, user_profile: UserProfile) -> int:
+        """Calculate dynamic discount based on urgency and user behavior"""
+        base_discount = ((item.original_price - item.current_price) / item.original_price) * 100
+        
+        # Additional discount based on urgency
+        urgency_bonus = item.urgency_score * 15  # Up to 15% additional
+        
+        # User behavior bonus
+        category_interest = 1.0
+        if item.category in user_profile.browsing_history:
+            category_interest = 1.2
+        if item.category in user_profile.purchase_history:
+            category_interest = 1.5
+            
+        total_discount = min(70, base_discount + (urgency_bonus * category_interest))
+        return int(total_discount)
+    
+    def should_show_popup(self, user_profile: UserProfile, current_page: str) -> bool:
+        """Determine if popup should be shown based on user context"""
+        # Don't show on checkout or cart pages
+        if current_page in ["checkout", "cart", "payment"]:
+            return False
+            
+        # Show probability based on browsing behavior (increased likelihood)
+        browsing_score = len(user_profile.browsing_history) * 0.1
+        return random.random() < min(0.9, 0.7 + browsing_score)  # Much higher chance to show popup
+    
+    def select_best_items(self, user_profile: UserProfile, count: int = 1, target_category: Optional[str] = None, shown_popups: List[str] = None) -> List[ClearanceItem]:
+        """Select the best clearance items for the user with variety"""
+        snapshot = self.store.current
+        return snapshot.catalog.items_at(self.select_best_indices(snapshot, user_profile, count, target_category, shown_popups))
+    
+    def select_best_indices(self, snapshot: CatalogSnapshot, user_profile: UserProfile, count: int = 1, target_category: Optional[str] = None, shown_popups: List[str] = None) -> List[int]:
+        """Catalog positions of the best items in one snapshot, so callers can render from the same snapshot"""
+        recent = self.recently_shown.recent(user_profile.user_id)
+        interest = self.recent_interest.recent(user_profile.user_id)
+        selected = rank_items(snapshot, user_profile, count, target_category, shown_popups, recent, self.max_per_category, interest, self.current_factors())
+        self.remember_shown(user_profile.user_id, [snapshot.catalog.ids[position] for position in selected])
+        return selected
+    
+    def remember_shown(self, user_id: str, item_ids: List[str]):
+        """Track these items as recently shown for this user"""
+        for item_id in item_ids:
+            self.recently_shown.add(user_id, item_id)
+    
+    def record_interest(self, row: Dict[str, Any]):
+        """Interaction listener: remember items the user viewed or added to cart"""
+        if row["action"] not in INTEREST_ACTIONS or not row["user_id"] or not row["item_id"]:
+            return
+        # Replayed rows older than the store's TTL would only be evicted again
+        if time.time() - row["received_at"] > self.recent_interest.ttl_seconds:
+            return
+        self.recent_interest.add(str(row["user_id"]), row["item_id"])
+    
+    def generate_urgency_message(self, item: ClearanceItem) -> str:
+        """Generate urgency message based on item properties"""
+        if item.stock_count <= 2:
+            return f"Only {item.stock_count} left in stock!"
+        elif item.days_until_removal <= 2:
+            return f"Clearance ends in {item.days_until_removal} day{'s' if item.days_until_removal > 1 else ''}!"
+        else:
+            return "Limited time clearance deal!"
+    
+    def generate_sustainability_message(self, item: ClearanceItem) -> str:
+        """Generate sustainability message"""
+        messages = [
+            "Help reduce waste by giving this item a new home 🌱",
+            "Save money and the planet with this clearance find 🌍",
+            "Prevent landfill waste - buy clearance, help Earth 🌿",
+            "Sustainable shopping: rescue this item from disposal ♻️"
+        ]
+        return random.choice(messages)
+
+# Initialize the engine
+catalog_store = CatalogStore(CATALOG_PATH, shared_dir=CATALOG_SHARED_DIR)
+urgency_refresher = UrgencyRefresher(catalog_store, URGENCY_REFRESH_INTERVAL)
+factor_store = FactorStore(CF_MODEL_DIR)
+engine = ClearanceEngine(catalog_store, urgency_refresher, factor_store)
+
+def map_factors(snapshot: CatalogSnapshot):
+    """Map the current model onto a reloaded catalog before requests score against it"""
+    model = factor_store.current
+    if model is not None:
+        model.item_rows(snapshot.catalog)
+
+catalog_store.prepare(map_factors)
+
+# Precomputed content-similarity neighbors (built offline by similarity.py); optional
+SIMILARITY_PATH = os.getenv("SIMILARITY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "similarity.npz"))
+similarity_table = load_neighbors(SIMILARITY_PATH)
+
+def attach_neighbors(snapshot: CatalogSnapshot):
+    """Map the neighbor table onto a snapshot's catalog positions"""
+    # Snapshots following a published edit keep their base's positions, and its table
+    if snapshot.neighbors is None:
+        snapshot.neighbors = similarity_table.for_catalog(snapshot.catalog)
+
+if similarity_table is not None:
+    attach_neighbors(catalog_store.current)
+    catalog_store.prepare(attach_neighbors)
+
+scoring_executor = ScoringExecutor(
+    catalog_store,
+    mode=SCORING_EXECUTOR,
+    workers=SCORING_WORKERS,
+    max_pending=SCORING_MAX_PENDING,
+    timeout=SCORING_TIMEOUT_MS / 1000,
+    urgency_interval=URGENCY_REFRESH_INTERVAL,
+    similarity_path=SIMILARITY_PATH if similarity_table is not None else None,
+    factor_dir=CF_MODEL_DIR,
+)
+
+# Popup sessions: profile and shown items held server-side so clients can send deltas
+POPUP_SESSION_TTL = float(os.getenv("POPUP_SESSION_TTL", "1800"))
+popup_sessions = SessionStore(ttl_seconds=POPUP_SESSION_TTL)
+
+# Encoded catalog responses, reused until the catalog is reloaded or an item changes
+catalog_responses = ResponseCache()
+catalog_store.subscribe(catalog_responses.clear)
+catalog_store.on_edit(catalog_responses.clear)
+
+def log_catalog_change(snapshot: CatalogSnapshot, indices, reason: str):
+    if reason == "expired":
+        logger.info("%d clearance items expired, e.g. %s", len(indices), snapshot.catalog.ids[int(indices[0])])
+
+catalog_store.on_change(log_catalog_change)
+
+# Interaction events are batched into a local SQLite database
+INTERACTIONS_DB = os.getenv("INTERACTIONS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "interactions.db"))
+
+def lookup_item(item_id: str):
+    """(category, original_price, current_price) for an item id, stored with each interaction"""
+    catalog = catalog_store.current.catalog
+    index = catalog.id_to_index.get(item_id)
+    if index is None:
+        return None
+    return catalog.categories[catalog.category[index]], float(catalog.original_price[index]), float(catalog.current_price[index])
+
+interaction_queue = InteractionQueue(INTERACTIONS_DB, item_lookup=lookup_item)
+cf_trainer = CollaborativeTrainer(factor_store, INTERACTIONS_DB, CF_TRAIN_INTERVAL, lambda: catalog_store.current.catalog)
+
+# Dashboard counters and time-series rollups, updated as each interaction is accepted
+interaction_aggregates = InteractionAggregates(lookup_item)
+interaction_rollups = RollupStore(lookup_item)
+interaction_queue.add_listener(interaction_aggregates.apply)
+interaction_queue.add_listener(interaction_rollups.apply)
+interaction_queue.add_listener(engine.record_interest)
+
+registry.gauge("interaction_queue_depth", "Interaction events waiting to be written", lambda: interaction_queue.depth)
+registry.counter("interaction_events_accepted_total", "Interaction events accepted", lambda: interaction_queue.accepted)
+registry.counter("interaction_events_rejected_total", "Interaction events rejected by backpressure", lambda: interaction_queue.rejected)
+registry.counter("interaction_events_written_total", "Interaction events written to SQLite", lambda: interaction_queue.written)
+registry.gauge("catalog_version", "Version of the catalog snapshot being served", lambda: catalog_store.current.version)
+registry.gauge("catalog_items", "Items in the catalog snapshot being served", lambda: len(catalog_store.current.catalog))
+registry.counter("catalog_reloads_total", "Successful catalog reloads", lambda: catalog_store.reloads)
+registry.counter("catalog_reload_failures_total", "Failed catalog reloads", lambda: catalog_store.reload_failures)
+registry.counter("catalog_items_expired_total", "Items taken out of the candidate sets when their removal time passed", lambda: catalog_store.expired)
+registry.counter("catalog_response_cache_hits_total", "Catalog responses served from the encoded cache", lambda: catalog_responses.hits)
+registry.counter("catalog_response_cache_misses_total", "Catalog responses that had to be encoded", lambda: catalog_responses.misses)
+registry.gauge("catalog_response_cache_bytes", "Bytes of encoded responses held in the cache", lambda: catalog_responses.nbytes)
+registry.gauge("scoring_jobs_pending", "Popup scoring jobs running in the worker pool", lambda: scoring_executor.pending)
+registry.counter("scoring_timeouts_total", "Popups served the default because scoring timed out", lambda: scoring_executor.timeouts)
+registry.counter("scoring_rejected_total", "Popups served the default because the scoring pool was full", lambda: scoring_executor.rejected)
+registry.counter("scoring_failures_total", "Popups served the default because a scoring job failed", lambda: scoring_executor.failures)
+registry.counter("urgency_refreshes_total", "Scheduled urgency recomputation passes", lambda: urgency_refresher.passes)
+registry.counter("urgency_items_changed_total", "Item urgency or days-until-removal values changed by those passes", lambda: urgency_refresher.items_changed)
+registry.gauge("urgency_refresh_seconds", "Duration of the last urgency recomputation pass", lambda: urgency_refresher.last_pass_seconds)
+registry.gauge("cf_model_version", "Version of the collaborative filtering model being served (0 = none)", lambda: engine.current_factors().version if engine.current_factors() is not None else 0)
+registry.counter("cf_training_runs_total", "Collaborative filtering models trained by this process", lambda: cf_trainer.runs)
+registry.counter("cf_training_failures_total", "Failed collaborative filtering training runs", lambda: cf_trainer.failures)
+registry.gauge("cf_training_seconds", "Duration of the last collaborative filtering training run", lambda: cf_trainer.last_run_seconds)
+registry.gauge("popup_sessions", "Live server-side popup sessions", lambda: len(popup_sessions))
+registry.gauge("recently_shown_entries", "Entries in the per-user recently shown store", lambda: len(engine.recently_shown))
+registry.gauge("recently_shown_bytes", "Estimated memory used by the recently shown store", lambda: engine.recently_shown.stats()["estimated_bytes"])
+registry.gauge("recent_interest_entries", "Entries in the per-user recent interest store", lambda: len(engine.recent_interest))
+registry.gauge("similarity_links", "Neighbor links in the content-similarity table", lambda: len(similarity_table.indices) if similarity_table is not None else 0)
+
+def is_loopback(host: Optional[str]) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def require_admin(request: Request):
+    if ADMIN_TOKEN:
+        # Constant-time comparison so response timing doesn't leak the token
+        supplied = request.headers.get("X-Admin-Token", "")
+        if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Admin token required")
+    elif request.client is None or not is_loopback(request.client.host):
+        raise HTTPException(status_code=403, detail="Admin endpoints are limited to localhost unless ADMIN_TOKEN is set")
+
+@app.get("/")
+async def root():
+    return {"message": "Smart Clearance Pop-ups API", "status": "running"}
+
+def render_popup_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Wrap an already encoded popup body; encoding is timed as its own stage by the caller"""
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/api/popup", response_model=PopupResponse)
+async def get_popup_recommendation(request: PopupRequest):
+    """Get personalized popup recommendation"""
+    try:
+        with popup_stage_seconds.time("total"):
+            return await recommend_popup(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in popup recommendation")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def recommend_popup(request: PopupRequest) -> Response:
+    # A full profile (re)starts the server-side session; later requests may send only deltas
+    if request.user_profile is not None:
+        session = popup_sessions.start(request.user_profile, request.session_id)
+    else:
+        session = popup_sessions.get(request.session_id)
+        if session is None:
+            raise HTTPException(status_code=409, detail="Unknown or expired session; resend user_profile")
+        # Another worker process, or a lost response, can leave this copy of the session behind the client's
+        if request.base_version != session.version:
+            raise HTTPException(status_code=409, detail="Session is out of date; resend user_profile")
+    if request.profile_delta is not None:
+        session.apply_delta(request.profile_delta)
+    session.add_shown(request.shown_popups, popup_sessions.max_shown)
+    # The client sends these back as session_id and base_version with its next delta
+    headers = {"X-Session-Id": session.id, "X-Session-Version": session.version}
+    user_profile = session.profile
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Popup request received for user: %s", user_profile.user_id)
+        logger.debug("User browsing history: %s", user_profile.browsing_history)
+        logger.debug("Target category: %s", request.target_category)
+    
+    # Check if popup should be shown
+    with popup_stage_seconds.time("should_show"):
+        show = engine.should_show_popup(user_profile, request.current_page)
+    if not show:
+        logger.debug("Popup not shown - engine decided against it")
+        return render_popup_response(NO_POPUP_JSON, headers)
+    
+    # Select best items for user, rendering from the same catalog snapshot
+    snapshot = catalog_store.current
+    item_count = request.count
+    shown_popups = frozenset(session.shown)
+    best_indices = await scoring_executor.select(engine, snapshot, user_profile, item_count, request.target_category, shown_popups)
+    best_items = snapshot.catalog.items_at(best_indices)
+    session.add_shown((item.id for item in best_items), popup_sessions.max_shown)
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Session shown popups: %s", shown_popups)
+        logger.debug("Selected %d items for popup:", len(best_items))
+        for item in best_items:
+            discount_pct = ((item.original_price - item.current_price) / item.original_price) * 100
+            logger.debug("  - %s (Category: %s, Urgency: %.2f, Discount: %.1f%%)", item.name, item.category, item.urgency_score, discount_pct)
+    
+    # If no clearance items available, don't show popup
+    if not best_items:
+        logger.debug("No clearance items available - not showing popup")
+        return render_popup_response(NO_POPUP_JSON, headers)
+    
+    with popup_stage_seconds.time("messages"):
+        # Calculate dynamic discounts for each item
+        discounts = []
+        urgency_messages = []
+        sustainability_messages = []
+        
+        for item in best_items:
+            discount = engine.calculate_dynamic_discount(item, user_profile)
+            discounts.append(discount)
+            
+            urgency_msg = engine.generate_urgency_message(item)
+            urgency_messages.append(urgency_msg)
+            
+            sustainability_msg = engine.generate_sustainability_message(item)
+            sustainability_messages.append(sustainability_msg)
+        
+        # Calculate timer (30-180 seconds based on average urgency)
+        avg_urgency = sum(item.urgency_score for item in best_items) / len(best_items)
+        timer = int(30 + (150 * (1 - avg_urgency)))
+    
+    # Same bytes as PopupResponse(...).model_dump_json(), built from each item's cached JSON
+    with popup_stage_seconds.time("serialize"):
+        body = encode_popup(
+            [snapshot.item_json(position) for position in best_indices],
+            discounts,
+            urgency_messages,
+            sustainability_messages,
+            timer,
+        )
+    
+    logger.debug("Popup response created with %d items", len(best_items))
+    return render_popup_response(body, headers)
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage latency histograms and queue/store gauges in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/clearance-items", response_model=List[ClearanceItem])
+async def get_clearance_items(
+    request: Request,
+    category: Optional[str] = None,
+    min_discount: Optional[float] = None,
+    max_discount: Optional[float] = None,
+    min_urgency: Optional[float] = None,
+    max_urgency: Optional[float] = None,
+    stock_level: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get clearance items, optionally filtered, sorted and paged (all items when no parameters are given)"""
+    snapshot = catalog_store.current
+    params = (category, min_discount, max_discount, min_urgency, max_urgency, stock_level, sort, cursor, limit)
+    
+    def build() -> EncodedBody:
+        try:
+            indices, next_cursor = query_catalog(snapshot, *params)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        body = clearance_items_adapter.dump_json(snapshot.catalog.items_at(indices.tolist()))
+        # Pass X-Next-Cursor back as ?cursor= to fetch the next page
+        return EncodedBody(body, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+    
+    key = listing_cache_key(snapshot.catalog, *params)
+    state = (snapshot.version, snapshot.revision)
+    body = catalog_responses.lookup(key, state) if key is not None else None
+    if body is None:
+        # Serializing and compressing a large listing takes a while; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(None, build)
+        if key is not None:
+            catalog_responses.put(key, state, body)
+    return cached_response(request, body)
+
+# Filter bounds worth caching: the band edges of the secondary indexes, so arbitrary
+# values in query strings can't fill the response cache with one-off entries
+CACHEABLE_DISCOUNTS = frozenset([0.0, 100.0, *DISCOUNT_EDGES])
+CACHEABLE_URGENCIES = frozenset([0.0, 1.0, *URGENCY_EDGES])
+
+def listing_cache_key(catalog: CatalogArrays, category, min_discount, max_discount, min_urgency, max_urgency, stock_level, sort, cursor, limit) -> Optional[Tuple]:
+    """Response cache key for a catalog listing, or None when it is served uncached.
+    
+    Only first pages of known categories with band-edge bounds are cached;
+    sort and stock_level are validated by the query, and errors are never cached.
+    """
+    if cursor is not None or (category is not None and category not in catalog.category_codes):
+        return None
+    if any(value is not None and value not in CACHEABLE_DISCOUNTS for value in (min_discount, max_discount)):
+        return None
+    if any(value is not None and value not in CACHEABLE_URGENCIES for value in (min_urgency, max_urgency)):
+        return None
+    return ("list", category, min_discount, max_discount, min_urgency, max_urgency, stock_level, sort, limit)
+
+def iter_ndjson(catalog: CatalogArrays, indices) -> Iterator[bytes]:
+    """Yield items as NDJSON a chunk at a time so memory stays flat for any catalog size"""
+    for start in range(0, len(indices), EXPORT_CHUNK_ITEMS):
+        chunk = indices[start:start + EXPORT_CHUNK_ITEMS].tolist()
+        yield b"".join(encode_item(catalog, index) + b"\n" for index in chunk)
+
+# Declared before /{item_id} so "export" is not taken for an item id
+@app.get("/api/clearance-items/export")
+async def export_clearance_items(
+    category: Optional[str] = None,
+    min_discount: Optional[float] = None,
+    max_discount: Optional[float] = None,
+    min_urgency: Optional[float] = None,
+    max_urgency: Optional[float] = None,
+    stock_level: Optional[str] = None,
+):
+    """Stream the catalog (optionally filtered) as one JSON item per line"""
+    snapshot = catalog_store.current
+    try:
+        indices, _ = query_catalog(snapshot, category, min_discount, max_discount, min_urgency, max_urgency, stock_level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The generator holds this snapshot, so a reload mid-export doesn't mix catalogs
+    return StreamingResponse(
+        iter_ndjson(snapshot.catalog, indices),
+        media_type="application/x-ndjson",
+        headers={"X-Catalog-Version": str(snapshot.version)},
+    )
+
+@app.get("/api/clearance-items/{item_id}", response_model=ClearanceItem)
+async def get_clearance_item(item_id: str, request: Request):
+    """Get specific clearance item"""
+    snapshot = catalog_store.current
+    
+    def build() -> EncodedBody:
+        index = snapshot.catalog.id_to_index.get(item_id)
+        if index is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return EncodedBody(snapshot.item_json(index))
+    
+    body = catalog_responses.get(("item", item_id), (snapshot.version, snapshot.revision), build)
+    return cached_response(request, body)
+
+@app.post("/api/track-interaction")
+async def track_interaction(data: Dict[str, Any]):
+    """Track user interactions with popups"""
+    # Queued for a batched background write; never waits on disk
+    if not interaction_queue.submit(data):
+        raise HTTPException(status_code=503, detail="Interaction queue is full", headers={"Retry-After": "1"})
+    return {"status": "success", "message": "Interaction tracked"}
+
+@app.post("/api/track-interactions")
+async def track_interactions(request: Request):
+    """Track a batch of user interactions in one request"""
+    # Parsed by hand because sendBeacon posts the JSON array as text/plain. Both limits
+    # are enforced before any event is validated
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_INTERACTION_BODY_BYTES:
+            raise HTTPException(status_code=413, detail=f"Interaction batches are limited to {MAX_INTERACTION_BODY_BYTES} bytes")
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid interaction batch: {e}")
+    if isinstance(payload, list) and len(payload) > MAX_INTERACTION_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_INTERACTION_BATCH} events per batch")
+    try:
+        events = interaction_batch_adapter.validate_python(payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid interaction batch: {e}")
+    if not interaction_queue.submit_many([event.model_dump() for event in events]):
+        raise HTTPException(status_code=503, detail="Interaction queue is full", headers={"Retry-After": "1"})
+    return {"status": "success", "message": f"{len(events)} interactions tracked"}
+
+@app.get("/api/analytics/summary")
+async def get_analytics_summary():
+    """Get analytics summary for the dashboard"""
+    # Maintained incrementally as interactions arrive; never scans the event log
+    return interaction_aggregates.summary()
+
+@app.get("/api/analytics/timeseries")
+async def get_analytics_timeseries(resolution: str = "minute", category: Optional[str] = None, item_id: Optional[str] = None):
+    """Impressions, closes and conversions per minute, hour or day"""
+    if resolution not in interaction_rollups.resolutions:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {sorted(interaction_rollups.resolutions)}")
+    return {
+        "resolution": resolution,
+        "category": category,
+        "item_id": item_id,
+        "buckets": interaction_rollups.series(resolution, category, item_id),
+    }
+
+@app.post("/api/inventory/bulk")
+async def bulk_update_inventory(batch: InventoryBatch, request: Request):
+    """Apply stock, price and removal time changes for many items at once"""
+    require_admin(request)
+    if len(batch.updates) > MAX_INVENTORY_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_INVENTORY_BATCH} updates per batch")
+    loop = asyncio.get_running_loop()
+    results, applied = await loop.run_in_executor(None, engine.apply_inventory, batch.updates, batch.all_or_nothing)
+    body = {
+        "status": "success" if applied else "rejected",
+        "updated": sum(1 for result in results if result["status"] == "updated"),
+        "rejected": sum(1 for result in results if result["status"] in ("rejected", "not_found")),
+        "version": catalog_store.current.version,
+        "results": results,
+    }
+    # A refused all-or-nothing batch is an error; rejecting only some updates is not
+    return JSONResponse(content=body, status_code=422 if batch.all_or_nothing and not applied else 200)
+
+@app.post("/api/admin/catalog/reload")
+async def reload_catalog(request: Request):
+    """Reload the catalog file in the background and swap it in atomically"""
+    require_admin(request)
+    loop = asyncio.get_running_loop()
+    try:
+        snapshot = await loop.run_in_executor(None, catalog_store.reload)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Catalog reload failed: {e}")
+    return {"status": "success", "version": snapshot.version, "item_count": len(snapshot.catalog)}
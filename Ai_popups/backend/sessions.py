@@ -0,0 +1,128 @@
+import secrets
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+from models import ProfileDelta, UserProfile
+
+
+class Session:
+    """Server-side state for one popup session: the user profile and every item shown so far.
+
+    `version` names the profile state: a random token fixed when the session
+    starts plus a sequence bumped by every delta. Clients send back the
+    version they last saw, so a delta is only applied to the profile it was
+    computed against, even when requests land on different worker processes.
+    """
+
+    __slots__ = ("id", "profile", "shown", "last_seen", "token", "sequence")
+
+    def __init__(self, session_id: str, profile: UserProfile, now: float):
+        self.id = session_id
+        self.profile = profile
+        # dict as an insertion-ordered set, so the oldest entries can be dropped first
+        self.shown: Dict[str, None] = {}
+        self.last_seen = now
+        self.token = secrets.token_hex(6)
+        self.sequence = 0
+
+    @property
+    def version(self) -> str:
+        return f"{self.token}.{self.sequence}"
+
+    def apply_delta(self, delta: ProfileDelta):
+        """Append new history entries (keeping them unique) and merge preferences"""
+        profile = self.profile
+        for history, additions in (
+            (profile.browsing_history, delta.browsing_history),
+            (profile.purchase_history, delta.purchase_history),
+        ):
+            for entry in additions:
+                if entry not in history:
+                    history.append(entry)
+        if delta.preferences:
+            profile.preferences.update(delta.preferences)
+        self.sequence += 1
+
+    def add_shown(self, item_ids: Iterable[str], limit: int):
+        shown = self.shown
+        for item_id in item_ids:
+            shown.pop(item_id, None)
+            shown[item_id] = None
+        while len(shown) > limit:
+            del shown[next(iter(shown))]
+
+
+class SessionStore:
+    """Sessions keyed by session id, expiring after `ttl_seconds` without a request.
+
+    Lets /api/popup clients send the full profile once and only the new
+    events afterwards. Session ids are random tokens issued by start(), so
+    only the client a session was issued to can send it deltas. At most `max_sessions` are kept, evicting the least
+    recently active first, and each remembers at most `max_shown` items.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 1800,
+        max_sessions: int = 100_000,
+        max_shown: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_shown = max_shown
+        self.clock = clock
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.evicted_expired = 0
+        self.evicted_idle = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """The live session, or None if it never existed or has expired"""
+        now = self.clock()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if now - session.last_seen >= self.ttl_seconds:
+            del self._sessions[session_id]
+            self.evicted_expired += 1
+            return None
+        session.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def start(self, profile: UserProfile, session_id: Optional[str] = None) -> Session:
+        """Begin a session from a full profile under a new id, or restart the live session
+        `session_id` from one, keeping the items already shown in it"""
+        now = self.clock()
+        previous = self._sessions.pop(session_id, None) if session_id else None
+        if previous is None:
+            session_id = secrets.token_urlsafe(16)
+        session = self._sessions[session_id] = Session(session_id, profile, now)
+        if previous is not None:
+            session.shown = previous.shown
+        self._evict(now)
+        return session
+
+    def _evict(self, now: float):
+        """Drop expired sessions from the idle end, then the least recently active while over the cap"""
+        cutoff = now - self.ttl_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_seen > cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            if session.last_seen <= cutoff:
+                self.evicted_expired += 1
+            else:
+                self.evicted_idle += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "evicted_expired": self.evicted_expired,
+            "evicted_idle": self.evicted_idle,
+        }
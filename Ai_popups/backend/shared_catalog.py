@@ -0,0 +1,229 @@
+"""Catalog columns published as .npy files that every worker process memory-maps.
+
+Layout of the shared directory:
+
+    CURRENT        JSON manifest of the live version, replaced atomically
+    .lock          serializes publishing between processes
+    v<N>/*.npy     one file per column of version N
+
+Workers map a version read-only with copy-on-write, so the page cache holds
+one copy of the catalog however many workers run. Bulk inventory edits are
+published as new versions too (see publish_edit), so every worker sees them.
+The manifest's source_version names the version a chain of edits started
+from; versions sharing it hold the same ids at the same positions.
+"""
+import json
+import os
+import shutil
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog import CatalogArrays, TextColumn
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishing is not serialized, os.replace keeps CURRENT consistent
+    fcntl = None
+
+MANIFEST = "CURRENT"
+# Times map_current() reads CURRENT again when the version it named was removed meanwhile
+MAP_ATTEMPTS = 3
+NUMERIC_COLUMNS = ("category", "urgency", "original_price", "current_price", "stock", "days", "discount_pct", "removal_at")
+TEXT_COLUMNS = ("ids", "names", "categories", "image_urls", "descriptions")
+
+
+class SharedIdIndex:
+    """Open-addressing id -> position table that can live in a mapped file.
+
+    A dict of a million ids costs every worker ~150MB of private memory;
+    this table is one int32/int64 array shared like the other columns.
+    Slots hold position + 1 (0 = empty) and collisions probe linearly.
+    crc32 is used because Python's str hash differs between processes.
+    """
+
+    __slots__ = ("slots", "ids", "mask")
+
+    def __init__(self, slots: np.ndarray, ids: TextColumn):
+        self.slots = slots
+        self.ids = ids
+        self.mask = len(slots) - 1
+
+    @staticmethod
+    def build(ids: Sequence[str]) -> np.ndarray:
+        size = 1 << max(4, (2 * len(ids) - 1).bit_length())
+        mask = size - 1
+        slots = np.zeros(size, dtype=np.int32 if len(ids) < 2 ** 31 - 1 else np.int64)
+        # Python ints: per-element numpy writes are several times slower
+        table = slots.tolist()
+        for position, item_id in enumerate(ids):
+            slot = zlib.crc32(item_id.encode("utf-8")) & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = position + 1
+        slots[:] = table
+        return slots
+
+    def get(self, item_id: str, default: Optional[int] = None) -> Optional[int]:
+        slots, mask = self.slots, self.mask
+        slot = zlib.crc32(item_id.encode("utf-8")) & mask
+        while True:
+            entry = int(slots[slot])
+            if entry == 0:
+                return default
+            if self.ids[entry - 1] == item_id:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def __contains__(self, item_id: str) -> bool:
+        return self.get(item_id) is not None
+
+    def __getitem__(self, item_id: str) -> int:
+        position = self.get(item_id)
+        if position is None:
+            raise KeyError(item_id)
+        return position
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+@contextmanager
+def publish_lock(directory: str):
+    """Exclusive lock across processes while checking for and publishing a version"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish(catalog: CatalogArrays, directory: str, source_mtime: Optional[float]) -> Dict[str, Any]:
+    """Write the catalog as a new version and make it current. Call under publish_lock()."""
+    name, target = _new_version(directory)
+    _save_numeric(catalog, target)
+    for column in TEXT_COLUMNS:
+        values = getattr(catalog, column)
+        text = values if isinstance(values, TextColumn) else TextColumn.from_strings(values)
+        np.save(os.path.join(target, f"{column}.data.npy"), np.frombuffer(text.data, dtype=np.uint8))
+        np.save(os.path.join(target, f"{column}.offsets.npy"), text.offsets)
+        if text.present is not None:
+            np.save(os.path.join(target, f"{column}.present.npy"), text.present)
+    np.save(os.path.join(target, "ids.slots.npy"), SharedIdIndex.build(catalog.ids))
+    return _make_current(directory, name, len(catalog), source_mtime)
+
+
+def publish_edit(catalog: CatalogArrays, directory: str, base: Dict[str, Any], columns: Sequence[str] = NUMERIC_COLUMNS) -> Dict[str, Any]:
+    """Publish an edited copy of version `base` (same ids and text) as a new version.
+
+    Only the numeric `columns` that changed are written; every other file is
+    hard-linked from `base`, so an edit costs at most 8 bytes per item per
+    changed column of disk writes. Call under publish_lock().
+    """
+    name, target = _new_version(directory)
+    _save_numeric(catalog, target, columns)
+    source = os.path.join(directory, base["path"])
+    written = {f"{column}.npy" for column in columns}
+    for entry in os.listdir(source):
+        if entry not in written:
+            try:
+                os.link(os.path.join(source, entry), os.path.join(target, entry))
+            except OSError:  # e.g. a filesystem without hard links
+                shutil.copyfile(os.path.join(source, entry), os.path.join(target, entry))
+    # Keeps the source file's mtime, so workers map this version instead of republishing the file
+    return _make_current(directory, name, len(catalog), base["source_mtime"], base.get("source_version", base["version"]))
+
+
+def _new_version(directory: str) -> Tuple[str, str]:
+    previous = read_manifest(directory)
+    name = f"v{previous['version'] + 1 if previous else 1}"
+    target = os.path.join(directory, name)
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+    return name, target
+
+
+def _save_numeric(catalog: CatalogArrays, target: str, columns: Sequence[str] = NUMERIC_COLUMNS):
+    for column in columns:
+        np.save(os.path.join(target, f"{column}.npy"), getattr(catalog, column))
+
+
+def _make_current(directory: str, name: str, count: int, source_mtime: Optional[float], source_version: Optional[int] = None) -> Dict[str, Any]:
+    version = int(name[1:])
+    manifest = {
+        "version": version, "path": name, "count": count, "source_mtime": source_mtime,
+        "source_version": version if source_version is None else source_version,
+    }
+    write_manifest(directory, manifest)
+    remove_old_versions(directory, keep=name)
+    return manifest
+
+
+def write_manifest(directory: str, manifest: Dict[str, Any]):
+    """Make a version current in one atomic rename"""
+    temporary = os.path.join(directory, MANIFEST + ".tmp")
+    with open(temporary, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temporary, os.path.join(directory, MANIFEST))
+
+
+def remove_old_versions(directory: str, keep: str):
+    # Mappings of deleted files stay valid on POSIX, so workers still on an
+    # older version are unaffected; Windows refuses while they are mapped
+    for entry in os.listdir(directory):
+        if entry.startswith("v") and entry != keep:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+def map_current(directory: str) -> Optional[Tuple[Dict[str, Any], CatalogArrays]]:
+    """Map the current version without taking publish_lock; None when nothing is published.
+
+    Publishing removes the versions before it, so the one CURRENT named may
+    be gone by the time it is mapped. CURRENT names a newer one by then, so
+    read it again and retry.
+    """
+    for attempt in range(MAP_ATTEMPTS):
+        manifest = read_manifest(directory)
+        if manifest is None:
+            return None
+        try:
+            return manifest, map_catalog(directory, manifest)
+        except FileNotFoundError:
+            if attempt == MAP_ATTEMPTS - 1:
+                raise
+
+
+def map_catalog(directory: str, manifest: Dict[str, Any]) -> CatalogArrays:
+    """Memory-map a published version; nothing is parsed or copied per worker"""
+    target = os.path.join(directory, manifest["path"])
+
+    def load(name: str) -> np.ndarray:
+        return np.load(os.path.join(target, f"{name}.npy"), mmap_mode="c")
+
+    def text(column: str) -> TextColumn:
+        present_path = os.path.join(target, f"{column}.present.npy")
+        present = np.load(present_path, mmap_mode="r") if os.path.exists(present_path) else None
+        return TextColumn(load(f"{column}.data"), load(f"{column}.offsets"), present)
+
+    ids = text("ids")
+    return CatalogArrays(
+        ids, text("names"), list(text("categories")), load("category"),
+        load("urgency"), load("original_price"), load("current_price"), load("stock"), load("days"),
+        text("image_urls"), text("descriptions"), discount_pct=load("discount_pct"),
+        id_index=SharedIdIndex(np.load(os.path.join(target, "ids.slots.npy"), mmap_mode="r"), ids),
+        removal_at=load("removal_at"),
+    )
@@ -0,0 +1,178 @@
+"""Content-based item similarity: an offline neighbor build and its request-time lookup.
+
+Build the table whenever the catalog's text changes:
+
+    python similarity.py data/clearance_items.jsonl data/similarity.npz
+
+Each item becomes a sparse vector of TF-IDF weighted name and description
+terms plus its category and price band. The top neighbors of every item by
+cosine similarity are stored as a CSR table keyed by item id. At request
+time the neighbor rows of a user's recent items are looked up and summed;
+no vectors are touched.
+"""
+import argparse
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from catalog import CatalogArrays, load_catalog
+
+logger = logging.getLogger("clearance")
+
+# Neighbors kept per item, and the weakest similarity worth keeping
+DEFAULT_TOP_N = 20
+MIN_SIMILARITY = 0.1
+
+# Weight of the category and price band features relative to the text terms
+CATEGORY_WEIGHT = 0.5
+PRICE_BAND_WEIGHT = 0.3
+# Upper edges of the current_price bands
+PRICE_BAND_EDGES = [10, 25, 50, 100, 250, 500]
+
+# Rows multiplied against the whole catalog at once while building
+BUILD_CHUNK_ROWS = 256
+
+
+class NeighborTable:
+    """Top-N similar items per item in CSR form: row i's neighbors are
+    indices[indptr[i]:indptr[i + 1]] with the matching similarity scores.
+
+    Rows and neighbor indices are positions in `ids`. for_catalog() remaps
+    them onto a catalog's positions, dropping items the catalog lacks.
+    """
+
+    __slots__ = ("ids", "indptr", "indices", "scores")
+
+    def __init__(self, ids: List[str], indptr: np.ndarray, indices: np.ndarray, scores: np.ndarray):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            ids=np.array(list(self.ids), dtype=str),
+            indptr=self.indptr,
+            indices=self.indices,
+            scores=self.scores,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "NeighborTable":
+        with np.load(path) as data:
+            return cls(data["ids"].tolist(), data["indptr"], data["indices"], data["scores"])
+
+    def for_catalog(self, catalog: CatalogArrays) -> "NeighborTable":
+        """The same table with rows and neighbors as positions in `catalog`"""
+        from scipy.sparse import csr_matrix
+
+        lookup = catalog.id_to_index
+        positions = np.fromiter((lookup.get(item_id, -1) for item_id in self.ids), dtype=np.int64, count=len(self.ids))
+        rows = np.repeat(positions, np.diff(self.indptr))
+        columns = positions[self.indices]
+        keep = (rows >= 0) & (columns >= 0)
+        n = len(catalog)
+        matrix = csr_matrix((self.scores[keep], (rows[keep], columns[keep])), shape=(n, n))
+        return NeighborTable(catalog.ids, matrix.indptr, matrix.indices.astype(np.int32), matrix.data.astype(np.float32))
+
+    def boost(self, items: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """Summed similarity of each candidate to `items` (positions), aligned with the
+        ascending `candidates` array; only the items' neighbor rows are read"""
+        boost = np.zeros(len(candidates), dtype=np.float64)
+        if not len(items) or not len(candidates):
+            return boost
+        indptr = self.indptr
+        neighbors = np.concatenate([self.indices[indptr[item]:indptr[item + 1]] for item in items])
+        scores = np.concatenate([self.scores[indptr[item]:indptr[item + 1]] for item in items])
+        slots = np.searchsorted(candidates, neighbors)
+        found = slots < len(candidates)
+        found[found] = candidates[slots[found]] == neighbors[found]
+        np.add.at(boost, slots[found], scores[found])
+        return boost
+
+
+def item_features(catalog: CatalogArrays):
+    """L2-normalized sparse feature rows: text terms, category and price band"""
+    from scipy.sparse import csr_matrix, hstack
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+
+    n = len(catalog)
+    texts = (f"{catalog.names[i]} {catalog.descriptions[i] or ''}" for i in range(n))
+    # Words only: numbers such as model or item numbers say nothing about similarity
+    vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True, token_pattern=r"(?u)\b[^\W\d]\w+\b", dtype=np.float32)
+    terms = vectorizer.fit_transform(texts)
+
+    rows = np.arange(n)
+    categories = csr_matrix(
+        (np.full(n, CATEGORY_WEIGHT, dtype=np.float32), (rows, catalog.category)),
+        shape=(n, len(catalog.categories)),
+    )
+    bands = np.searchsorted(PRICE_BAND_EDGES, catalog.current_price, side="right")
+    price_bands = csr_matrix(
+        (np.full(n, PRICE_BAND_WEIGHT, dtype=np.float32), (rows, bands)),
+        shape=(n, len(PRICE_BAND_EDGES) + 1),
+    )
+    return normalize(hstack([terms, categories, price_bands], format="csr"))
+
+
+def build_neighbors(catalog: CatalogArrays, top_n: int = DEFAULT_TOP_N, min_similarity: float = MIN_SIMILARITY) -> NeighborTable:
+    """Top-N most similar items for every item by cosine similarity of item_features()"""
+    features = item_features(catalog)
+    transposed = features.T.tocsr()
+    n = len(catalog)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indices: List[np.ndarray] = []
+    scores: List[np.ndarray] = []
+    for start in range(0, n, BUILD_CHUNK_ROWS):
+        block = (features[start:start + BUILD_CHUNK_ROWS] @ transposed).tocsr()
+        for offset in range(block.shape[0]):
+            row = start + offset
+            lo, hi = block.indptr[offset], block.indptr[offset + 1]
+            columns, values = block.indices[lo:hi], block.data[lo:hi]
+            keep = (columns != row) & (values >= min_similarity)
+            columns, values = columns[keep], values[keep]
+            if len(values) > top_n:
+                best = np.argpartition(-values, top_n)[:top_n]
+                columns, values = columns[best], values[best]
+            order = np.argsort(-values, kind="stable")
+            indices.append(columns[order].astype(np.int32))
+            scores.append(values[order].astype(np.float32))
+            indptr[row + 1] = indptr[row] + len(order)
+    return NeighborTable(
+        list(catalog.ids),
+        indptr,
+        np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+        np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32),
+    )
+
+
+def load_neighbors(path: Optional[str]) -> Optional[NeighborTable]:
+    """The table at `path`, or None (similarity scoring off) if there is none"""
+    if not path:
+        return None
+    try:
+        return NeighborTable.load(path)
+    except FileNotFoundError:
+        logger.info("No similarity table at %s; build one with `python similarity.py`", path)
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("catalog", help="catalog file (.jsonl, .csv or .npz)")
+    parser.add_argument("output", help="where to write the neighbor table (.npz)")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N, help="neighbors kept per item")
+    args = parser.parse_args()
+    table = build_neighbors(load_catalog(args.catalog), args.top_n)
+    table.save(args.output)
+    print(f"{len(table)} items, {len(table.indices)} neighbor links -> {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Importing the app must not touch the developer's interaction log or start background work
+_scratch = tempfile.mkdtemp(prefix="clearance-tests-")
+os.environ.setdefault("INTERACTIONS_DB", os.path.join(_scratch, "interactions.db"))
+os.environ.setdefault("CF_MODEL_DIR", os.path.join(_scratch, "cf_model"))
+os.environ.setdefault("SIMILARITY_PATH", os.path.join(_scratch, "similarity.npz"))
+os.environ.setdefault("CATALOG_WATCH_INTERVAL", "0")
+os.environ.setdefault("CF_TRAIN_INTERVAL", "0")
+
+from catalog import CatalogArrays  # noqa: E402
+
+CATEGORIES = ["electronics", "clothing", "home", "fitness", "office"]
+
+
+def make_records(size: int, **overrides):
+    """`size` deterministic item records cycling through CATEGORIES; overrides apply to every record"""
+    records = []
+    for i in range(size):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        original_price = 20.0 + i
+        record = {
+            "id": f"item{i}",
+            "name": f"Item {i}",
+            "original_price": original_price,
+            "current_price": round(original_price * (0.3 + 0.1 * (i % 5)), 2),
+            "category": category,
+            "stock_count": 1 + i % 15,
+            "days_until_removal": 1 + i % 10,
+            "urgency_score": round(0.5 + 0.05 * (i % 10), 2),
+        }
+        record.update(overrides)
+        records.append(record)
+    return records
+
+
+@pytest.fixture
+def catalog() -> CatalogArrays:
+    return CatalogArrays.from_records(make_records(50))
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import server
+    return server
+
+
+@pytest.fixture(scope="session")
+def client(app_module):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_module.app) as client:
+        yield client
@@ -0,0 +1,32 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+
+def make_request(host, token=None):
+    headers = [(b"x-admin-token", token.encode())] if token is not None else []
+    return Request({"type": "http", "headers": headers, "client": (host, 1234) if host else None})
+
+
+def test_without_a_token_only_loopback_is_admitted(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    app_module.require_admin(make_request("127.0.0.1"))
+    app_module.require_admin(make_request("::1"))
+    for host in ("10.0.0.5", "testclient", None):
+        with pytest.raises(HTTPException) as raised:
+            app_module.require_admin(make_request(host))
+        assert raised.value.status_code == 403
+
+
+def test_with_a_token_it_is_required_from_every_host(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "s3cret")
+    app_module.require_admin(make_request("10.0.0.5", "s3cret"))
+    for token in (None, "", "s3cre", "s3cret!", "é"):
+        with pytest.raises(HTTPException):
+            app_module.require_admin(make_request("127.0.0.1", token))
+
+
+def test_admin_endpoints_refuse_remote_clients_by_default(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    assert client.post("/api/admin/catalog/reload").status_code == 403
+    assert client.post("/api/inventory/bulk", json={"updates": [{"item_id": "x", "stock_count": 1}]}).status_code == 403
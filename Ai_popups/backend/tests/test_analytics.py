@@ -0,0 +1,69 @@
+import sqlite3
+
+from sqlalchemy import inspect
+
+from analytics import InteractionAggregates, RollupStore
+from interactions import create_interaction_db, iter_rows, to_row
+
+ITEMS = {"a": ("home", 100.0, 60.0)}
+
+
+def lookup(item_id):
+    return ITEMS.get(item_id)
+
+
+def conversion(discount=None, stamped=True):
+    data = {"item_id": "a"}
+    if discount is not None:
+        data["discount_used"] = discount
+    row = to_row({"user_id": "u", "action": "add_to_cart", "data": data}, received_at=0.0)
+    if stamped:
+        row["category"], row["original_price"], row["current_price"] = ITEMS["a"]
+    return row
+
+
+def test_revenue_applies_the_reported_discount_to_the_original_price():
+    aggregates = InteractionAggregates(lookup)
+    # The 45% discount already includes the 40% markdown; it is not applied to the marked-down price again
+    aggregates.apply(conversion(45))
+    assert aggregates.summary()["revenue_generated"] == 55.0
+    # Without a reported discount the customer paid the current price
+    aggregates.apply(conversion())
+    assert aggregates.summary()["revenue_generated"] == 115.0
+    assert aggregates.summary()["average_discount"] == 45.0
+
+
+def test_revenue_uses_the_price_stored_with_the_event():
+    aggregates = InteractionAggregates(lookup)
+    row = conversion(50)
+    ITEMS["a"] = ("home", 200.0, 60.0)
+    try:
+        aggregates.apply(row)
+        # Rows from before events carried prices fall back to the catalog
+        aggregates.apply(conversion(50, stamped=False))
+    finally:
+        ITEMS["a"] = ("home", 100.0, 60.0)
+    assert aggregates.summary()["revenue_generated"] == 150.0
+    assert aggregates.summary()["top_categories"] == [{"category": "home", "conversions": 2}]
+
+
+def test_rollups_use_the_stored_category():
+    rollups = RollupStore(lambda item_id: None)
+    rollups.apply(conversion(10))
+    assert rollups.series("minute", category="home", now=0)[-1]["conversions"] == 1
+
+
+def test_existing_databases_gain_the_item_columns(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE interactions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id VARCHAR, action VARCHAR NOT NULL,"
+            " item_id VARCHAR, timestamp VARCHAR, received_at FLOAT NOT NULL, data TEXT)"
+        )
+        conn.execute("INSERT INTO interactions (user_id, action, item_id, received_at) VALUES ('u', 'add_to_cart', 'a', 0)")
+    db = create_interaction_db(str(path))
+    columns = {column["name"] for column in inspect(db).get_columns("interactions")}
+    assert {"category", "original_price", "current_price"} <= columns
+    [row] = iter_rows(db)
+    assert row["category"] is None and row["item_id"] == "a"
+    db.dispose()
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+SMALL_RUN = ["--sizes", "200", "--concurrency", "2", "--iterations", "5", "--requests", "10", "--profiles", "20"]
+
+
+def run_benchmarks(*args):
+    script = os.path.join(BACKEND_DIR, "benchmarks", "run_benchmarks.py")
+    return subprocess.run([sys.executable, script, *SMALL_RUN, *args], cwd=BACKEND_DIR, env=os.environ.copy(), capture_output=True, text=True)
+
+
+def test_report_and_regression_check(tmp_path):
+    report_path = tmp_path / "report.json"
+    result = run_benchmarks("--output", str(report_path))
+    assert result.returncode == 0, result.stderr
+    report = json.loads(report_path.read_text())
+    (size,) = report["results"]
+    assert size["catalog_size"] == 200
+    assert {"select_best_items", "serialize_response"} <= set(size["micro"])
+    assert [level["concurrency"] for level in size["http"]] == [2]
+
+    # A baseline ten times faster than this run makes every p95 a regression
+    for stats in list(size["micro"].values()) + size["http"]:
+        stats["p95_ms"] /= 10
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report))
+    result = run_benchmarks("--compare", str(baseline), "--output", str(tmp_path / "again.json"))
+    assert result.returncode == 1
+    assert "REGRESSION size=200" in result.stderr
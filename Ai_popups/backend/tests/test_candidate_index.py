@@ -0,0 +1,65 @@
+import numpy as np
+
+from candidate_index import Bitset, CandidateIndex
+from scoring import clearance_mask
+
+
+def test_bitset_round_trips_and_combines():
+    mask = np.zeros(130, dtype=bool)
+    mask[[0, 63, 64, 129]] = True
+    bits = Bitset.from_mask(mask)
+    assert bits.indices().tolist() == [0, 63, 64, 129]
+    assert bits.count() == 4
+    assert 64 in bits and 65 not in bits
+
+    other = Bitset.from_indices(130, np.array([63, 100]))
+    assert (bits & other).indices().tolist() == [63]
+    assert (bits | other).indices().tolist() == [0, 63, 64, 100, 129]
+    assert bits.andnot(other).indices().tolist() == [0, 64, 129]
+
+    bits.clear_many(np.array([0, 129]))
+    bits.set_many(np.array([5]))
+    assert bits.indices().tolist() == [5, 63, 64]
+    assert bits.contains_many(np.array([5, 6])).tolist() == [True, False]
+
+
+def test_eligible_in_category(catalog):
+    index = CandidateIndex(catalog)
+    expected = np.flatnonzero(clearance_mask(catalog) & catalog.category_mask(["home"]))
+    assert index.eligible_in("home").indices().tolist() == expected.tolist()
+    assert not index.eligible_in("unknown").any()
+
+
+def test_exclusions_are_small_sorted_position_arrays(catalog):
+    index = CandidateIndex(catalog, max_sessions=2)
+    first = index.exclusions("s1", ["item3", "item1", "missing"])
+    assert first.tolist() == [1, 3]
+    # A superset of what the session already sent is folded in
+    assert index.exclusions("s1", ["item1", "item3", "item2"]).tolist() == [1, 2, 3]
+    # A list that is no longer a superset starts over
+    assert index.exclusions("s1", ["item4"]).tolist() == [4]
+
+    index.exclusions("s2", ["item5"])
+    index.exclusions("s3", ["item6"])
+    assert list(index.sessions) == ["s2", "s3"]
+
+
+def test_without_leaves_the_candidates_untouched(catalog):
+    index = CandidateIndex(catalog)
+    candidates = index.eligible_in(None)
+    shown = index.exclusions("s", [catalog.ids[i] for i in candidates.indices()[:2]])
+    remaining = index.without(candidates, shown)
+    assert remaining.count() == candidates.count() - 2
+    assert not remaining.contains_many(shown).any()
+    assert candidates.contains_many(shown).all()
+
+
+def test_expire_and_refresh(catalog):
+    index = CandidateIndex(catalog)
+    position = int(index.eligible.indices()[0])
+    index.expire(np.array([position]))
+    index.refresh_item(position)
+    assert position not in index.eligible
+    index.unexpire(np.array([position]))
+    index.refresh_items(np.array([position]))
+    assert position in index.eligible
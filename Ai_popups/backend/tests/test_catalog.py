@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pytest
+
+from catalog import DAY_SECONDS, CatalogArrays, TextColumn, load_catalog, parse_timestamp, save_npz
+from conftest import make_records
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def test_formats_load_the_same_columns(tmp_path):
+    records = make_records(12, removal_at=1_700_000_000)
+    records[3]["description"] = "Has a description"
+    write_jsonl(tmp_path / "items.jsonl", records)
+    with open(tmp_path / "items.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[3]))
+        writer.writeheader()
+        writer.writerows(records)
+    jsonl = load_catalog(str(tmp_path / "items.jsonl"))
+    save_npz(jsonl, str(tmp_path / "items.npz"))
+
+    for path in ("items.csv", "items.npz"):
+        other = load_catalog(str(tmp_path / path))
+        assert list(other.ids) == list(jsonl.ids)
+        for column in ("category", "urgency", "original_price", "current_price", "stock", "days", "removal_at"):
+            np.testing.assert_array_equal(getattr(other, column), getattr(jsonl, column))
+        assert other.item(3) == jsonl.item(3)
+        assert other.item(3).description == "Has a description"
+        assert other.item(4).description is None
+
+
+def test_missing_removal_times_count_from_the_file_not_the_load(tmp_path):
+    path = tmp_path / "items.jsonl"
+    write_jsonl(path, make_records(4))
+    written = 1_700_000_000.0
+    os.utime(path, (written, written))
+    first, second = load_catalog(str(path)), load_catalog(str(path))
+    # Every restart, reload and worker process derives the same removal times
+    np.testing.assert_array_equal(first.removal_at, written + first.days * DAY_SECONDS)
+    np.testing.assert_array_equal(second.removal_at, first.removal_at)
+
+
+def test_invalid_records_name_their_line(tmp_path):
+    records = make_records(3)
+    del records[1]["current_price"]
+    write_jsonl(tmp_path / "items.jsonl", records)
+    with pytest.raises(ValueError, match="invalid record 2"):
+        load_catalog(str(tmp_path / "items.jsonl"))
+
+
+def test_duplicate_ids_are_rejected():
+    with pytest.raises(ValueError, match="duplicate"):
+        CatalogArrays.from_records(make_records(2, id="same"))
+
+
+def test_update_item_keeps_discount_in_step(catalog):
+    catalog.update_item(np.array([0, 1]), current_price=np.array([10.0, 21.0]))
+    assert catalog.discount_pct[0] == pytest.approx(50.0)
+    assert catalog.discount_pct[1] == pytest.approx(0.0)
+    with pytest.raises(ValueError):
+        catalog.update_item(0, name="renamed")
+
+
+def test_parse_timestamp():
+    assert parse_timestamp(None) != parse_timestamp(None)  # NaN when absent
+    assert parse_timestamp("1700000000") == 1_700_000_000
+    assert parse_timestamp("2023-11-14T22:13:20Z") == 1_700_000_000
+    assert parse_timestamp("2023-11-14T23:13:20+01:00") == 1_700_000_000
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", float("nan"), 1e300, -1.0, "10000-01-01T00:00:00"])
+def test_parse_timestamp_rejects_unusable_times(value):
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
+
+
+def test_catalog_records_with_unusable_removal_times_are_rejected():
+    with pytest.raises(ValueError, match="invalid record 1"):
+        CatalogArrays.from_records(make_records(1, removal_at="inf"))
+
+
+def test_text_column_round_trips_missing_and_unicode_values():
+    values = ["plain", None, "", "naïve café ☕"]
+    column = TextColumn.from_strings(values)
+    assert list(column) == values
+    assert column.offsets.dtype == np.uint32
+    # One shared buffer, not a str object per value
+    assert isinstance(column.data, bytes)
+    assert column.nbytes == len(column.data) + column.offsets.nbytes + column.present.nbytes
+    # The presence mask is only kept when something is missing
+    assert TextColumn.from_strings(["a", ""]).present is None
+
+
+def test_separated_text_must_match_the_item_count():
+    blob = np.frombuffer("one\x1ftwo".encode(), dtype=np.uint8)
+    assert list(TextColumn.from_separated(blob, np.array([True, True]))) == ["one", "two"]
+    with pytest.raises(ValueError, match="item count"):
+        TextColumn.from_separated(blob, np.array([True, True, True]))
+
+
+def test_text_with_the_separator_cannot_be_saved(tmp_path):
+    records = make_records(2)
+    records[1]["name"] = "bad\x1fname"
+    with pytest.raises(ValueError, match="separator"):
+        save_npz(CatalogArrays.from_records(records), str(tmp_path / "items.npz"))
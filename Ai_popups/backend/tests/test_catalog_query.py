@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from catalog import CatalogArrays
+from catalog_query import BucketIndex, query_catalog
+from catalog_store import CatalogSnapshot
+from conftest import make_records
+
+
+@pytest.fixture
+def snapshot():
+    return CatalogSnapshot(CatalogArrays.from_records(make_records(200)), version=3)
+
+
+def test_bucket_index_moves_only_changed_items():
+    index = BucketIndex(np.array([0.05, 0.15, 0.95]), [0.1, 0.5])
+    assert index.select(0.1, 0.4).indices().tolist() == [1]
+    index.refresh_many(np.array([0, 2]), np.array([0.2, 0.99]))
+    assert index.select(0.1, 0.4).indices().tolist() == [0, 1]
+    index.refresh(1, 0.7)
+    assert index.select(0.6, None).indices().tolist() == [1, 2]
+
+
+def test_filters_match_a_scan(snapshot):
+    catalog = snapshot.catalog
+    indices, cursor = query_catalog(snapshot, category="home", min_discount=35, max_urgency=0.8, stock_level="plenty")
+    expected = np.flatnonzero(
+        catalog.category_mask(["home"]) & (catalog.discount_pct >= 35) & (catalog.urgency <= 0.8) & (catalog.stock >= 10)
+    )
+    assert indices.tolist() == expected.tolist()
+    assert cursor is None
+
+
+@pytest.mark.parametrize("sort", [None, "price", "-urgency", "stock"])
+def test_pages_cover_the_sorted_catalog_once(snapshot, sort):
+    pages, cursor = [], None
+    while True:
+        page, cursor = query_catalog(snapshot, sort=sort, cursor=cursor, limit=17)
+        pages.extend(page.tolist())
+        if cursor is None:
+            break
+    everything, _ = query_catalog(snapshot, sort=sort)
+    assert pages == everything.tolist()
+    assert len(set(pages)) == len(snapshot.catalog)
+    if sort:
+        column = snapshot.catalog.current_price if sort == "price" else snapshot.catalog.stock if sort == "stock" else -snapshot.catalog.urgency
+        assert np.all(np.diff(column[pages]) >= 0)
+
+
+def test_cursors_are_tied_to_version_and_sort(snapshot):
+    _, cursor = query_catalog(snapshot, sort="price", limit=5)
+    with pytest.raises(ValueError, match="different sort"):
+        query_catalog(snapshot, sort="stock", cursor=cursor, limit=5)
+    reloaded = CatalogSnapshot(snapshot.catalog, version=4)
+    with pytest.raises(ValueError, match="older catalog"):
+        query_catalog(reloaded, sort="price", cursor=cursor, limit=5)
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        query_catalog(snapshot, cursor="???")
+
+
+def test_cursors_survive_edits(snapshot):
+    first, cursor = query_catalog(snapshot, sort="price", limit=5)
+    catalog = snapshot.catalog.copy_numeric()
+    edited = CatalogSnapshot(catalog, snapshot.version + 1, base=snapshot)
+    # Raise the price of an item not yet paged past
+    later = int(np.argmax(catalog.current_price))
+    catalog.update_item(np.array([later]), current_price=catalog.original_price[[later]])
+    edited.refresh_items([later])
+    second, _ = query_catalog(edited, sort="price", cursor=cursor, limit=5)
+    assert len(second) == 5 and not set(first.tolist()) & set(second.tolist())
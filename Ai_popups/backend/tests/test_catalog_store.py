@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pytest
+
+from catalog import CatalogArrays
+from catalog_store import CatalogStore
+from conftest import make_records
+
+
+def write_catalog(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def test_reload_swaps_in_a_new_snapshot(tmp_path):
+    path = tmp_path / "items.jsonl"
+    write_catalog(path, make_records(5))
+    store = CatalogStore(str(path))
+    before = store.current
+    prepared, swapped = [], []
+    store.prepare(lambda snapshot: prepared.append(store.current is before))
+    store.subscribe(swapped.append)
+
+    write_catalog(path, make_records(8))
+    after = store.reload()
+    assert store.current is after and after.version == before.version + 1
+    # Preparers see the new snapshot before it is visible, listeners after
+    assert prepared == [True] and swapped == [after]
+    # The old snapshot is untouched for requests still holding it
+    assert len(before.catalog) == 5 and len(after.catalog) == 8
+
+
+def test_failed_reload_keeps_serving_the_previous_snapshot(tmp_path):
+    path = tmp_path / "items.jsonl"
+    write_catalog(path, make_records(5))
+    store = CatalogStore(str(path))
+    before = store.current
+    path.write_text("{not json\n")
+    with pytest.raises(ValueError):
+        store.reload()
+    assert store.current is before
+    assert store.reload_failures == 1
+    # The broken file is not retried until it changes again
+    assert not store.source_changed()
+
+
+def test_edit_copies_the_snapshot_and_its_indexes(tmp_path):
+    store = CatalogStore.from_catalog(CatalogArrays.from_records(make_records(20)))
+    before = store.current
+    eligible = before.index.eligible.indices()
+    position = int(eligible[0])
+    assert store.edit(lambda draft: False) is None and store.current is before
+
+    def change(draft):
+        # Full price is never a clearance deal
+        draft.catalog.update_item(np.array([position]), current_price=draft.catalog.original_price[[position]])
+        draft.refresh_items([position])
+        return True
+
+    after = store.edit(change)
+    assert store.current is after and after.version == before.version + 1
+    assert position not in after.index.eligible_in(None).indices()
+    assert np.array_equal(before.index.eligible.indices(), eligible)
+    assert before.catalog.discount_pct[position] > 0 and after.catalog.discount_pct[position] == 0
+    assert after.catalog.layout is before.catalog.layout
+
+
+def test_edit_listeners_get_a_delta_older_copies_can_apply():
+    store = CatalogStore.from_catalog(CatalogArrays.from_records(make_records(20)))
+    before = store.current
+    position = int(before.index.eligible.indices()[0])
+    deltas = []
+    store.on_edit(lambda snapshot, delta: deltas.append(delta))
+
+    def change(draft):
+        draft.catalog.update_item(np.array([position]), current_price=draft.catalog.original_price[[position]])
+        draft.refresh_items([position])
+        return True
+
+    after = store.edit(change, ("current_price", "discount_pct"))
+    # Columns the edit cannot write are shared rather than copied
+    assert after.catalog.stock is before.catalog.stock
+    [delta] = deltas
+    assert delta.version == after.version and delta.positions.tolist() == [position]
+    assert set(delta.columns) == {"current_price", "discount_pct"}
+
+    applied = before.apply_delta(delta, 0.0)
+    assert applied.version == after.version and applied.source_version == before.source_version
+    assert np.array_equal(applied.index.eligible.indices(), after.index.eligible.indices())
+    assert applied.catalog.discount_pct[position] == 0 and before.catalog.discount_pct[position] > 0
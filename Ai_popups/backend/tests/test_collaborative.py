@@ -0,0 +1,111 @@
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+import shared_catalog
+from catalog import CatalogArrays
+from collaborative import CollaborativeTrainer, FactorStore, feedback_matrix, train_and_publish, train_als
+from conftest import make_records
+from interactions import create_interaction_db, interactions_table
+
+# Two groups of users, each interested in its own three items
+GROUPS = [(range(0, 4), ["item0", "item1", "item2"]), (range(4, 8), ["item3", "item4", "item5"])]
+
+
+def group_feedback(skip=()):
+    for users, items in GROUPS:
+        for user in users:
+            for item in items:
+                if (f"user{user}", item) not in skip:
+                    yield f"user{user}", item, 1.0
+
+
+def write_feedback(path, feedback):
+    db = create_interaction_db(path)
+    with db.begin() as conn:
+        conn.execute(interactions_table.insert(), [
+            {"user_id": user_id, "item_id": item_id, "action": "view", "received_at": time.time()}
+            for user_id, item_id, _ in feedback
+        ] + [{"user_id": "user0", "item_id": "item9", "action": "popup_shown", "received_at": time.time()}])
+
+
+def test_feedback_matrix_sums_repeated_pairs():
+    users, items, matrix = feedback_matrix([("a", "x", 1.0), ("b", "y", 3.0), ("a", "x", 3.0)])
+    assert users == ["a", "b"] and items == ["x", "y"]
+    assert matrix.toarray().tolist() == [[4.0, 0.0], [0.0, 3.0]]
+
+
+def test_als_prefers_what_similar_users_liked():
+    users, items, matrix = feedback_matrix(group_feedback(skip={("user0", "item2")}))
+    user_factors, item_factors = train_als(matrix, factors=4, iterations=15)
+    predicted = item_factors @ user_factors[users.index("user0")]
+    seen, unseen_in_group, other_group = (predicted[items.index(item)] for item in ("item0", "item2", "item3"))
+    assert seen > 0.9
+    assert unseen_in_group > 0.01 > abs(other_group)
+
+
+def test_published_model_scores_catalog_candidates(tmp_path):
+    db_path = str(tmp_path / "events.db")
+    write_feedback(db_path, group_feedback(skip={("user0", "item2")}))
+    manifest = train_and_publish(db_path, str(tmp_path / "model"))
+    # Only view/add_to_cart events count
+    assert manifest["items"] == 6 and manifest["users"] == 8
+    # Too recent to retrain
+    assert train_and_publish(db_path, str(tmp_path / "model"), min_age=3600) is None
+
+    store = FactorStore(str(tmp_path / "model"))
+    catalog = CatalogArrays.from_records(make_records(8))
+    assert store.refresh(catalog) and not store.refresh(catalog)
+    model = store.current
+    candidates = np.array([2, 3, 7])
+    preference = model.preference("user0", catalog, candidates)
+    assert preference[0] > preference[1]
+    # Items the model never saw get no preference; unknown users get none at all
+    assert preference[2] == 0.0
+    assert model.preference("stranger", catalog, candidates) is None
+
+
+def test_store_keeps_its_model_when_the_published_one_is_removed_meanwhile(tmp_path, monkeypatch):
+    db_path, directory = str(tmp_path / "events.db"), str(tmp_path / "model")
+    write_feedback(db_path, group_feedback())
+    train_and_publish(db_path, directory)
+    store = FactorStore(directory)
+    assert store.refresh()
+    removed = train_and_publish(db_path, directory)
+    train_and_publish(db_path, directory)
+    # CURRENT was read just before the trainer published again and removed that version
+    reads = [removed]
+    read_manifest = shared_catalog.read_manifest
+    monkeypatch.setattr(shared_catalog, "read_manifest", lambda directory: reads.pop() if reads else read_manifest(directory))
+    assert not store.refresh() and store.current.version == 1
+    assert store.refresh() and store.current.version == 3
+
+
+def loaded_modules():
+    return set(sys.modules)
+
+
+def test_trainer_process_trains_without_loading_the_app(tmp_path):
+    db_path = str(tmp_path / "events.db")
+    write_feedback(db_path, group_feedback())
+    store = FactorStore(str(tmp_path / "model"))
+    catalog = CatalogArrays.from_records(make_records(8))
+    trainer = CollaborativeTrainer(store, db_path, 3600, lambda: catalog)
+
+    async def run():
+        await trainer.start()
+        try:
+            for _ in range(300):
+                if store.current is not None:
+                    break
+                await asyncio.sleep(0.05)
+            return await asyncio.wrap_future(trainer._pool.submit(loaded_modules))
+        finally:
+            await trainer.stop()
+
+    modules = asyncio.run(run())
+    assert store.current is not None and trainer.runs == 1
+    assert "collaborative" in modules
+    assert not {"server", "fastapi", "uvicorn", "catalog_store"} & modules
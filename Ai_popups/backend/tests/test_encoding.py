@@ -0,0 +1,23 @@
+from encoding import NO_POPUP_JSON, encode_item, encode_popup
+from models import PopupResponse
+
+
+def test_item_json_matches_the_model(catalog):
+    catalog.descriptions = type(catalog.descriptions).from_strings(["Café ☕ \"quoted\""] + [None] * (len(catalog) - 1))
+    for index in (0, 1, len(catalog) - 1):
+        assert encode_item(catalog, index) == catalog.item(index).model_dump_json().encode()
+
+
+def test_popup_body_matches_the_model(catalog):
+    items = catalog.items_at([0, 3])
+    body = encode_popup([encode_item(catalog, 0), encode_item(catalog, 3)], [40, 55], ["Only 1 left in stock!", "Hurry"], ["Save 🌍"], 75)
+    expected = PopupResponse(
+        show_popup=True,
+        items=items,
+        discount_percentages=[40, 55],
+        urgency_messages=["Only 1 left in stock!", "Hurry"],
+        sustainability_messages=["Save 🌍"],
+        timer_seconds=75,
+    )
+    assert body == expected.model_dump_json().encode()
+    assert NO_POPUP_JSON == PopupResponse(show_popup=False).model_dump_json().encode()
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import numpy as np
+
+from catalog import CatalogArrays
+from catalog_store import CatalogSnapshot, CatalogStore
+from conftest import make_records
+from expiry import ExpiryQueue
+from models import UserProfile
+from recency import RecencyStore
+from scoring_pool import ScoringExecutor
+
+PROFILE = UserProfile(user_id="u", browsing_history=["home"], purchase_history=[])
+
+
+def test_queue_pops_due_items_once_in_any_order():
+    removal_at = np.array([30.0, 10.0, 20.0, 40.0])
+    queue = ExpiryQueue(removal_at)
+    assert queue.next_due() == 10.0
+    assert queue.pop_due(5.0).tolist() == []
+    assert queue.pop_due(25.0).tolist() == [1, 2]
+    assert queue.pop_due(25.0).tolist() == []
+    assert queue.next_due() == 30.0
+
+
+def test_rescheduled_items_pop_at_their_new_time():
+    removal_at = np.array([10.0, 20.0])
+    queue = ExpiryQueue(removal_at)
+    removal_at[0] = 50.0
+    queue.schedule([0])
+    # The superseded entry at 10 is skipped
+    assert queue.pop_due(30.0).tolist() == [1]
+    assert queue.pop_due(60.0).tolist() == [0]
+    assert len(queue) == 0 or queue.next_due() > 60.0
+
+
+def test_copied_queue_follows_its_own_column():
+    removal_at = np.array([10.0, 20.0])
+    queue = ExpiryQueue(removal_at)
+    edited = removal_at.copy()
+    edited[1] = 5.0
+    copy = queue.copy(edited)
+    copy.schedule([1])
+    assert copy.pop_due(6.0).tolist() == [1]
+    assert queue.pop_due(6.0).tolist() == []
+
+
+def test_snapshot_takes_expired_items_out_of_the_candidates():
+    now = time.time()
+    catalog = CatalogArrays.from_records(make_records(10))
+    catalog.removal_at[:] = now + 100
+    catalog.removal_at[3] = now + 10
+    snapshot = CatalogSnapshot(catalog, 1)
+    assert 3 in snapshot.index.eligible_in(None).indices()
+    assert snapshot.expire_due(now + 20).tolist() == [3]
+    assert 3 not in snapshot.index.eligible_in(None).indices()
+    # A later removal time brings it back
+    catalog.removal_at[3] = now + 200
+    assert snapshot.reschedule([3], now + 20).tolist() == []
+    snapshot.refresh_items([3])
+    assert 3 in snapshot.index.eligible_in(None).indices()
+
+
+def run_selection(app_module, store, before_second=None):
+    engine = app_module.ClearanceEngine(store)
+    executor = ScoringExecutor(store, mode="process", workers=1, timeout=30)
+
+    async def run():
+        await executor.start()
+        try:
+            first = await executor.select(engine, store.current, PROFILE, 3, "home", frozenset())
+            before_second(first)
+            # Recently shown items are ranked down; compare like for like
+            engine.recently_shown = RecencyStore(per_user_limit=5, ttl_seconds=3600)
+            second = await executor.select(engine, store.current, PROFILE, 3, "home", frozenset())
+            return first, second
+        finally:
+            executor.shutdown()
+
+    first, second = asyncio.run(run())
+    assert executor.failures == executor.timeouts == 0
+    return first, second
+
+
+def test_process_workers_expire_items_as_their_time_passes(app_module):
+    records = make_records(40)
+    for number, record in enumerate(records):
+        # Even items outscore odd ones whatever the random boost; both stay eligible by discount
+        record.update(urgency_score=1.0 if number % 2 == 0 else 0.4, current_price=round(record["original_price"] * 0.4, 2))
+    catalog = CatalogArrays.from_records(records)
+    deadline = time.time() + 2.0
+    even = np.arange(len(catalog)) % 2 == 0
+    catalog.removal_at[:] = np.where(even, deadline, deadline + 3600)
+    store = CatalogStore.from_catalog(catalog)
+    checked_before_deadline = []
+
+    def wait_for_deadline(first):
+        checked_before_deadline.append(time.time() < deadline)
+        # Only the worker's copy still has the deadline, so only its own expiry can drop them
+        catalog.removal_at[:] = deadline + 3600
+        time.sleep(max(deadline - time.time(), 0) + 0.05)
+
+    first, second = run_selection(app_module, store, wait_for_deadline)
+    if checked_before_deadline[0]:
+        assert all(position % 2 == 0 for position in first)
+    assert len(second) == 3
+    assert not any(position % 2 == 0 for position in second)
+
+
+def test_items_lapsed_in_the_parent_are_dropped_from_worker_results(app_module):
+    catalog = CatalogArrays.from_records(make_records(40))
+    store = CatalogStore.from_catalog(catalog)
+
+    def lapse_in_parent(first):
+        # The worker still holds the old removal times, as a worker of a retiring pool would
+        catalog.removal_at[first] = 1.0
+
+    first, second = run_selection(app_module, store, lapse_in_parent)
+    assert len(first) == 3
+    assert not set(first) & set(second)
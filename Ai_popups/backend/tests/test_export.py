@@ -0,0 +1,23 @@
+import json
+
+
+def test_export_streams_one_item_per_line(client, app_module):
+    response = client.get("/api/clearance-items/export?category=electronics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["x-catalog-version"] == str(app_module.catalog_store.current.version)
+    lines = response.content.splitlines()
+    listed = client.get("/api/clearance-items?category=electronics").json()
+    assert [json.loads(line) for line in lines] == listed
+
+
+def test_export_chunks_do_not_split_items(app_module, catalog):
+    import numpy as np
+
+    chunks = list(app_module.iter_ndjson(catalog, np.arange(len(catalog))))
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    assert sum(chunk.count(b"\n") for chunk in chunks) == len(catalog)
+
+
+def test_export_rejects_bad_filters(client):
+    assert client.get("/api/clearance-items/export?stock_level=lots").status_code == 400
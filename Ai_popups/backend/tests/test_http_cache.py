@@ -0,0 +1,90 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from http_cache import MIN_COMPRESS_BYTES, EncodedBody, ResponseCache, cached_response
+
+BODY = b"[" + b'{"id":"x"},' * MIN_COMPRESS_BYTES + b"{}]"
+
+
+def make_request(accept_encoding="", if_none_match=None):
+    headers = [(b"accept-encoding", accept_encoding.encode())]
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+def test_each_coding_has_its_own_etag():
+    body = EncodedBody(BODY)
+    identity = cached_response(make_request(), body)
+    gzipped = cached_response(make_request("gzip"), body)
+    assert identity.headers["etag"] == body.etag()
+    assert gzipped.headers["etag"] == body.etag("gzip") != body.etag()
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(gzipped.body) == BODY
+    for response in (identity, gzipped):
+        assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_revalidation_only_matches_the_negotiated_coding():
+    body = EncodedBody(BODY)
+    assert cached_response(make_request("gzip", body.etag("gzip")), body).status_code == 304
+    assert cached_response(make_request("", f'W/{body.etag()}'), body).status_code == 304
+    # A gzip copy can't be revalidated as the identity representation, or vice versa
+    assert cached_response(make_request("", body.etag("gzip")), body).status_code == 200
+    assert cached_response(make_request("gzip", body.etag()), body).status_code == 200
+
+
+def test_small_bodies_are_not_compressed():
+    body = EncodedBody(b"{}")
+    response = cached_response(make_request("gzip, br"), body)
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == body.etag()
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=1000)
+    bodies = [EncodedBody(bytes([65 + i]) * 240) for i in range(5)]
+    for i, body in enumerate(bodies):
+        cache.put(i, 1, body)
+    assert cache.nbytes == 960
+    assert cache.lookup(0, 1) is None and cache.lookup(4, 1) is bodies[4]
+    # Too large to be worth keeping
+    cache.put("big", 1, EncodedBody(b"x" * 300))
+    assert cache.lookup("big", 1) is None
+
+
+def test_cache_entries_are_tied_to_catalog_state():
+    cache = ResponseCache()
+    built = []
+    build = lambda: built.append(1) or EncodedBody(b"x")  # noqa: E731
+    cache.get("k", (1, 0), build)
+    cache.get("k", (1, 0), build)
+    cache.get("k", (1, 1), build)
+    assert len(built) == 2 and cache.hits == 1 and cache.misses == 2
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+@pytest.mark.parametrize("query, cached", [
+    ("", True),
+    ("?category=home&min_discount=40&limit=10", True),
+    ("?min_urgency=0.7&sort=-urgency", True),
+    ("?min_discount=41.5", False),
+    ("?category=nothing-like-this", False),
+])
+def test_only_whitelisted_listings_are_cached(client, app_module, query, cached):
+    app_module.catalog_responses.clear()
+    first = client.get("/api/clearance-items" + query)
+    second = client.get("/api/clearance-items" + query, headers={"If-None-Match": first.headers["etag"]})
+    assert first.status_code == 200 and second.status_code == 304
+    assert (len(app_module.catalog_responses) == 1) == cached
+
+
+def test_cursor_pages_are_served_uncached(client, app_module):
+    first = client.get("/api/clearance-items?limit=2&sort=price")
+    app_module.catalog_responses.clear()
+    page = client.get("/api/clearance-items?limit=2&sort=price&cursor=" + first.headers["x-next-cursor"])
+    assert page.status_code == 200 and len(page.json()) == 2
+    assert len(app_module.catalog_responses) == 0
@@ -0,0 +1,63 @@
+import asyncio
+
+from interactions import InteractionQueue, iter_rows
+
+
+def test_queue_batches_events_into_sqlite_and_replays_them(tmp_path):
+    queue = InteractionQueue(str(tmp_path / "events.db"), batch_size=2, flush_interval=0.01)
+    seen = []
+    queue.add_listener(seen.append)
+
+    async def run():
+        await queue.start()
+        assert queue.submit({"user_id": "u", "action": "popup_shown", "data": {"item_id": 7}})
+        assert queue.submit_many([{"user_id": "u", "action": "add_to_cart", "data": {"item_id": "a"}}] * 2)
+        db = queue.db
+        await queue.stop()
+        return db
+
+    db = asyncio.run(run())
+    assert [row["action"] for row in seen] == ["popup_shown", "add_to_cart", "add_to_cart"]
+    assert queue.written == 3 and queue.accepted == 3
+    rows = list(iter_rows(db))
+    assert [row["item_id"] for row in rows] == ["7", "a", "a"]
+    assert rows[0]["data"] == {"item_id": 7}
+
+    replayed = []
+    queue.db = db
+    queue._listeners = [replayed.append]
+    queue.replay()
+    assert [row["item_id"] for row in replayed] == ["7", "a", "a"]
+
+
+def test_queue_pushes_back_when_full_or_stopped(tmp_path):
+    queue = InteractionQueue(str(tmp_path / "events.db"), max_queue=2)
+    assert not queue.submit({"action": "x"})
+
+    async def run():
+        await queue.start()
+        # A batch is taken whole or not at all
+        assert not queue.submit_many([{"action": "x"}] * 3)
+        assert queue.submit_many([{"action": "x"}] * 2)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert queue.rejected == 4
+    assert queue.written == 2
+
+
+def test_accepted_events_are_stamped_with_the_item(tmp_path):
+    items = {"a": ("home", 100.0, 60.0)}
+    queue = InteractionQueue(str(tmp_path / "events.db"), item_lookup=items.get)
+
+    async def run():
+        await queue.start()
+        queue.submit({"user_id": "u", "action": "add_to_cart", "data": {"item_id": "a"}})
+        queue.submit({"user_id": "u", "action": "add_to_cart", "data": {"item_id": "gone"}})
+        db = queue.db
+        await queue.stop()
+        return db
+
+    rows = list(iter_rows(asyncio.run(run())))
+    assert (rows[0]["category"], rows[0]["original_price"], rows[0]["current_price"]) == ("home", 100.0, 60.0)
+    assert rows[1]["category"] is None
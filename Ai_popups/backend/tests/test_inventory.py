@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+TOKEN = "inventory-tests"
+
+
+@pytest.fixture
+def admin(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", TOKEN)
+    return {"X-Admin-Token": TOKEN}
+
+
+def post_bulk(client, admin, updates, **extra):
+    body = json.dumps({"updates": updates, **extra})
+    return client.post("/api/inventory/bulk", content=body, headers={**admin, "Content-Type": "application/json"})
+
+
+@pytest.mark.parametrize("removal_at", [float("nan"), float("inf"), 1e300, "inf", "nan", -5])
+def test_unusable_removal_times_are_rejected(client, admin, removal_at):
+    response = post_bulk(client, admin, [{"item_id": "1", "removal_at": removal_at}])
+    assert response.status_code == 422
+    assert "removal_at" in str(response.json()["detail"])
+
+
+def test_bulk_update_swaps_in_an_edited_snapshot(app_module, client, admin):
+    store = app_module.catalog_store
+    before = store.current
+    item_id = before.catalog.ids[0]
+    stock = int(before.catalog.stock[0])
+    response = post_bulk(client, admin, [{"item_id": item_id, "stock_count": stock + 7}, {"item_id": "missing", "stock_count": 1}])
+    body = response.json()
+    assert response.status_code == 200 and body["updated"] == 1 and body["rejected"] == 1
+    after = store.current
+    assert after is not before and after.edited and body["version"] == after.version
+    assert after.catalog.stock[0] == stock + 7
+    # Requests still holding the previous snapshot never see part of a batch
+    assert before.catalog.stock[0] == stock
+
+
+def test_refused_batch_leaves_the_snapshot_alone(app_module, client, admin):
+    store = app_module.catalog_store
+    before = store.current
+    item_id = before.catalog.ids[0]
+    updates = [{"item_id": item_id, "stock_count": 3}, {"item_id": item_id, "current_price": 1e9}]
+    response = post_bulk(client, admin, updates, all_or_nothing=True)
+    assert response.status_code == 422
+    assert [result["status"] for result in response.json()["results"]] == ["not_applied", "rejected"]
+    assert store.current is before
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_bulk_update_reaches_process_workers(app_module, tmp_path, shared):
+    import asyncio
+
+    from catalog_store import CatalogStore
+    from conftest import make_records
+    from models import InventoryUpdate, UserProfile
+    from scoring_pool import ScoringExecutor
+
+    path = tmp_path / "items.jsonl"
+    path.write_text("".join(json.dumps(record) + "\n" for record in make_records(40)))
+    store = CatalogStore(str(path), shared_dir=str(tmp_path / "shared") if shared else None)
+    engine = app_module.ClearanceEngine(store)
+    executor = ScoringExecutor(store, mode="process", workers=1, timeout=30)
+    profile = UserProfile(user_id="u", browsing_history=["home"], purchase_history=[])
+
+    async def run():
+        await executor.start()
+        try:
+            first = await executor.select(engine, store.current, profile, 3, "home", frozenset())
+            pool = executor._pool
+            ids = [store.current.catalog.ids[position] for position in first]
+            # End the clearance window of everything the workers just picked
+            updates = [InventoryUpdate(item_id=item_id, removal_at=1.0) for item_id in ids]
+            loop = asyncio.get_running_loop()
+            _, applied = await loop.run_in_executor(None, engine.apply_inventory, updates)
+            assert applied
+            second = await executor.select(engine, store.current, profile, 3, "home", frozenset())
+            # Workers pick the edit up as they are; an edit never respawns the pool
+            assert executor._pool is pool
+            return ids, [store.current.catalog.ids[position] for position in second]
+        finally:
+            executor.shutdown()
+
+    before, after = asyncio.run(run())
+    assert len(before) == len(after) == 3
+    assert not set(before) & set(after)
+    assert executor.failures == executor.timeouts == 0
@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+
+def test_importing_the_app_leaves_logging_alone():
+    code = "import logging, server; print(len(logging.getLogger().handlers))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=os.environ.copy(), capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "0"
+
+
+def test_background_services_run_while_the_app_is_up(client, app_module):
+    assert app_module.interaction_queue.db is not None
+    assert app_module.catalog_store._expiry_task is not None
+    assert not app_module.app.router.on_startup and not app_module.app.router.on_shutdown
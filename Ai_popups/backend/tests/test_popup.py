@@ -0,0 +1,64 @@
+import pytest
+
+from models import PopupResponse
+
+PROFILE = {"user_id": "popup-user", "browsing_history": ["electronics"], "purchase_history": []}
+
+
+@pytest.fixture
+def always_show(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.engine, "should_show_popup", lambda profile, page: True)
+
+
+def start(client, **extra):
+    response = client.post("/api/popup", json={"user_profile": PROFILE, "current_page": "home", **extra})
+    assert response.status_code == 200
+    return response
+
+
+def test_popup_body_is_a_valid_response(client, always_show):
+    response = start(client, count=2)
+    popup = PopupResponse.model_validate_json(response.content)
+    assert popup.show_popup and len(popup.items) == 2
+
+
+def test_null_shown_popups_is_treated_as_empty(client, always_show):
+    response = start(client, session_data={"shown_popups": None})
+    assert response.json()["show_popup"]
+
+
+@pytest.mark.parametrize("shown", ["item", [1, 2], {"a": 1}])
+def test_malformed_shown_popups_is_rejected(client, shown):
+    response = client.post("/api/popup", json={"user_profile": PROFILE, "current_page": "home", "session_data": {"shown_popups": shown}})
+    assert response.status_code == 422
+
+
+def test_deltas_must_name_the_session_version(client, always_show):
+    started = start(client)
+    version = started.headers["x-session-version"]
+    delta = {"session_id": started.headers["x-session-id"], "current_page": "home", "profile_delta": {"browsing_history": ["home"]}}
+
+    applied = client.post("/api/popup", json={**delta, "base_version": version})
+    assert applied.status_code == 200
+    newer = applied.headers["x-session-version"]
+    assert newer != version and applied.headers["x-session-id"] == delta["session_id"]
+
+    # Replaying the old version (e.g. a response that never reached the client) is refused
+    assert client.post("/api/popup", json={**delta, "base_version": version}).status_code == 409
+    # So is a version from another worker's copy of the session
+    assert client.post("/api/popup", json={**delta, "base_version": "elsewhere.3"}).status_code == 409
+    # And a delta naming no version at all
+    assert client.post("/api/popup", json=delta).status_code == 422
+    assert client.post("/api/popup", json={**delta, "base_version": newer}).status_code == 200
+
+
+def test_sessions_are_not_keyed_by_user_id(client, always_show):
+    start(client)
+    # Knowing someone's user id is not enough to change their session
+    delta = {"session_id": PROFILE["user_id"], "current_page": "home", "base_version": "x.0", "profile_delta": {"browsing_history": ["home"]}}
+    assert client.post("/api/popup", json=delta).status_code == 409
+
+
+def test_unknown_sessions_get_a_conflict(client):
+    response = client.post("/api/popup", json={"session_id": "never-started", "base_version": "x.0", "current_page": "home"})
+    assert response.status_code == 409
@@ -0,0 +1,47 @@
+from recency import RecencyStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_per_user_limit_keeps_the_newest_items():
+    store = RecencyStore(per_user_limit=2, clock=FakeClock())
+    for item_id in ("a", "b", "c"):
+        store.add("u", item_id)
+    assert store.recent("u") == ["b", "c"]
+    # Re-adding moves an item to the end instead of duplicating it
+    store.add("u", "b")
+    assert store.recent("u") == ["c", "b"]
+    assert len(store) == 2
+    assert store.evicted_over_user_limit == 1
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    store = RecencyStore(ttl_seconds=10, clock=clock)
+    store.add("u", "a")
+    clock.now += 5
+    store.add("u", "b")
+    assert store.contains("u", "a")
+    clock.now += 6
+    assert not store.contains("u", "a")
+    assert store.recent("u") == ["b"]
+    clock.now += 10
+    assert store.recent("u") == []
+    assert len(store) == 0
+
+
+def test_idle_users_are_evicted_over_the_entry_ceiling():
+    clock = FakeClock()
+    store = RecencyStore(max_entries=2, clock=clock)
+    store.add("u1", "a")
+    store.add("u2", "b")
+    store.add("u3", "c")
+    assert store.recent("u1") == []
+    assert store.recent("u3") == ["c"]
+    assert store.stats()["evicted_idle_users"] == 1
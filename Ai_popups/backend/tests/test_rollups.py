@@ -0,0 +1,28 @@
+from analytics import RollupStore
+
+
+def event(action, received_at, item_id="a"):
+    return {"action": action, "item_id": item_id, "received_at": received_at, "category": "home", "original_price": 1.0, "current_price": 1.0}
+
+
+def test_counts_land_in_their_minute():
+    rollups = RollupStore(lambda item_id: None)
+    rollups.apply(event("popup_shown", 120))
+    rollups.apply(event("popup_shown", 150))
+    rollups.apply(event("popup_closed", 179))
+    rollups.apply(event("unknown", 179))
+    series = rollups.series("minute", now=179)
+    assert len(series) == 60
+    assert series[-1] == {"start": "1970-01-01T00:02:00+00:00", "impressions": 2, "closes": 1, "conversions": 0}
+    assert rollups.series("minute", item_id="b", now=179)[-1]["impressions"] == 0
+
+
+def test_old_minutes_fold_into_hours_without_losing_counts():
+    rollups = RollupStore(lambda item_id: None)
+    for minute in range(180):
+        rollups.apply(event("add_to_cart", minute * 60))
+    hours = rollups.series("hour", category="home", now=179 * 60)
+    assert [bucket["conversions"] for bucket in hours[-3:]] == [60, 60, 60]
+    # Only the most recent hour is still kept per minute
+    assert sum(bucket["conversions"] for bucket in rollups.series("minute", now=179 * 60)) == 60
+    assert sum(bucket["conversions"] for bucket in rollups.series("day", now=179 * 60)) == 180
@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+
+from models import UserProfile
+from scoring import (
+    BROWSING_BOOST,
+    PURCHASE_BOOST,
+    RANDOM_BOOST_RANGE,
+    RECENTLY_SHOWN_PENALTY,
+    STATE_TRANSFER_MIN_DRAWS,
+    clearance_mask,
+    is_true_clearance,
+    score_candidates,
+    uniform_from_random,
+)
+
+
+def test_uniform_from_random_matches_the_generator():
+    for n in (3, STATE_TRANSFER_MIN_DRAWS + 10):
+        rng, reference = random.Random(7), random.Random(7)
+        draws = uniform_from_random(n, 0.1, 0.5, rng)
+        expected = [reference.uniform(0.1, 0.5) for _ in range(n)]
+        assert draws.tolist() == expected
+        # The generator continues where the per-item loop would have left it
+        assert rng.random() == reference.random()
+
+
+def test_clearance_mask_agrees_with_scalar_rule(catalog):
+    mask = clearance_mask(catalog)
+    for i in range(len(catalog)):
+        assert mask[i] == is_true_clearance(catalog.urgency[i], catalog.discount_pct[i])
+
+
+def test_score_candidates_applies_boosts_and_penalty(catalog):
+    profile = UserProfile(user_id="u", browsing_history=["electronics"], purchase_history=["home"])
+    candidates = np.arange(len(catalog))
+    recently_shown = np.array([0])
+    scores = score_candidates(
+        catalog, candidates, profile.browsing_history, profile.purchase_history, recently_shown, random.Random(1)
+    )
+    reference = random.Random(1)
+    noise = np.array([reference.uniform(*RANDOM_BOOST_RANGE) for _ in candidates])
+    expected = catalog.urgency.copy()
+    expected[catalog.category_mask(["electronics"])] += BROWSING_BOOST
+    expected[catalog.category_mask(["home"])] += PURCHASE_BOOST
+    expected[0] -= RECENTLY_SHOWN_PENALTY
+    np.testing.assert_allclose(scores, expected + noise)
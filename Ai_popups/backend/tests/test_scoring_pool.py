@@ -0,0 +1,56 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+import scoring_pool
+from catalog import CatalogArrays
+from catalog_store import CatalogStore
+from conftest import BACKEND_DIR, make_records
+from metrics import popup_stage_seconds
+from models import UserProfile
+from scoring_pool import ScoringExecutor
+
+PROFILE = UserProfile(user_id="u", browsing_history=["home"], purchase_history=[])
+
+
+def test_entry_module_builds_nothing_on_import():
+    # Spawned workers re-run the parent's main module; it must not load the app
+    code = "import sys, main; print('server' in sys.modules, 'catalog_store' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=os.environ.copy(), capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "False"]
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_every_mode_ranks_from_the_snapshot(app_module, mode):
+    store = CatalogStore.from_catalog(CatalogArrays.from_records(make_records(40)))
+    engine = app_module.ClearanceEngine(store)
+    executor = ScoringExecutor(store, mode=mode, workers=1, timeout=30)
+    before = popup_stage_seconds.labels("candidates").count
+
+    async def run():
+        await executor.start()
+        try:
+            return await executor.select(engine, store.current, PROFILE, 3, "home", frozenset(["item2"]))
+        finally:
+            executor.shutdown()
+
+    selected = asyncio.run(run())
+    catalog = store.current.catalog
+    assert len(selected) == 3
+    assert {catalog.categories[catalog.category[position]] for position in selected} == {"home"}
+    assert 2 not in selected
+    assert executor.failures == executor.timeouts == 0
+    # Stage times measured in worker processes are recorded in this process
+    assert popup_stage_seconds.labels("candidates").count == before + 1
+
+
+def test_worker_loads_the_source_when_nothing_is_published(tmp_path, monkeypatch):
+    for name in ("_worker_snapshot", "_worker_shared_dir", "_worker_manifest_mtime", "_worker_factors", "_worker_neighbors"):
+        monkeypatch.setattr(scoring_pool, name, None)
+    catalog = CatalogArrays.from_records(make_records(10))
+    scoring_pool._init_worker(catalog, 4, shared_dir=str(tmp_path / "empty"))
+    assert scoring_pool._worker_snapshot.version == 4
+    assert scoring_pool._worker_snapshot.catalog is catalog
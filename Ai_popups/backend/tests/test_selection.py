@@ -0,0 +1,47 @@
+import numpy as np
+
+from selection import diverse_top_k, top_k
+
+
+def brute_force_diverse(candidates, scores, categories, k, max_per_category):
+    order = np.argsort(-scores, kind="stable")
+    selected, per_category = [], {}
+    for position in order.tolist():
+        code = int(categories[candidates[position]])
+        if per_category.get(code, 0) < max_per_category:
+            selected.append(position)
+            per_category[code] = per_category.get(code, 0) + 1
+    for position in order.tolist():
+        if position not in selected:
+            selected.append(position)
+    return candidates[selected[:k]].tolist()
+
+
+def test_top_k_matches_a_stable_sort():
+    rng = np.random.default_rng(0)
+    candidates = np.arange(100, 300)
+    # Rounded scores produce ties, which must resolve in catalog order
+    scores = np.round(rng.random(200), 1)
+    for k in (1, 5, 50, 500):
+        expected = candidates[np.argsort(-scores, kind="stable")][:k].tolist()
+        assert top_k(candidates, scores, k) == expected
+    assert top_k(candidates[:0], scores[:0], 3) == []
+
+
+def test_diverse_top_k_matches_a_full_scan():
+    rng = np.random.default_rng(1)
+    categories = rng.integers(0, 4, size=1000)
+    candidates = np.sort(rng.choice(1000, size=400, replace=False))
+    scores = np.round(rng.random(400), 2)
+    for k in (1, 3, 4, 6, 30):
+        for cap in (1, 2):
+            assert diverse_top_k(candidates, scores, categories, k, cap) == brute_force_diverse(candidates, scores, categories, k, cap)
+
+
+def test_diverse_top_k_takes_one_per_category_first():
+    categories = np.array([0, 0, 0, 1])
+    candidates = np.arange(4)
+    scores = np.array([0.9, 0.8, 0.7, 0.1])
+    assert diverse_top_k(candidates, scores, categories, 2) == [0, 3]
+    # Slots the diversity pass cannot fill go to the best remaining items
+    assert diverse_top_k(candidates, scores, categories, 3) == [0, 3, 1]
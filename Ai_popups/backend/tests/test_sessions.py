@@ -0,0 +1,55 @@
+from models import ProfileDelta, UserProfile
+from sessions import SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def profile():
+    return UserProfile(user_id="u", browsing_history=["home"], purchase_history=[])
+
+
+def test_deltas_append_unique_entries_and_bump_the_version():
+    store = SessionStore(clock=FakeClock())
+    session = store.start(profile())
+    version = session.version
+    session.apply_delta(ProfileDelta(browsing_history=["home", "office"], preferences={"theme": "dark"}))
+    assert session.profile.browsing_history == ["home", "office"]
+    assert session.profile.preferences == {"theme": "dark"}
+    assert session.version != version
+
+
+def test_restarting_a_session_keeps_shown_items_but_not_the_version():
+    store = SessionStore(clock=FakeClock(), max_shown=2)
+    session = store.start(profile())
+    session.add_shown(["a", "b", "c"], store.max_shown)
+    assert list(session.shown) == ["b", "c"]
+    restarted = store.start(profile(), session.id)
+    assert restarted.id == session.id and list(restarted.shown) == ["b", "c"]
+    assert restarted.version != session.version
+
+
+def test_session_ids_are_issued_by_the_store():
+    store = SessionStore(clock=FakeClock())
+    first, second = store.start(profile()), store.start(profile())
+    # Both are for user "u"; each gets its own unguessable id
+    assert first.id != second.id and len(first.id) >= 20
+    # An id the store never issued starts a new session instead of naming one
+    assert store.start(profile(), "u").id != "u" and store.get("u") is None
+
+
+def test_sessions_expire_and_are_capped():
+    clock = FakeClock()
+    store = SessionStore(ttl_seconds=10, max_sessions=2, clock=clock)
+    a = store.start(profile()).id
+    clock.now = 5
+    b = store.start(profile()).id
+    c = store.start(profile()).id
+    assert store.get(a) is None and store.evicted_idle == 1
+    clock.now = 16
+    assert store.get(b) is None and store.get(c) is None
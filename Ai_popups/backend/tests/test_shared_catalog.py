@@ -0,0 +1,112 @@
+import json
+import os
+
+import numpy as np
+
+import shared_catalog
+from catalog import CatalogArrays
+from catalog_store import CatalogStore
+from conftest import make_records
+
+
+def test_published_catalog_maps_back_identically(tmp_path):
+    records = make_records(30)
+    records[4]["description"] = "Only this one"
+    catalog = CatalogArrays.from_records(records)
+    with shared_catalog.publish_lock(str(tmp_path)):
+        manifest = shared_catalog.publish(catalog, str(tmp_path), 1.0)
+    mapped = shared_catalog.map_catalog(str(tmp_path), manifest)
+    assert manifest["version"] == 1 and manifest["count"] == 30
+    assert [mapped.item(i) for i in range(30)] == [catalog.item(i) for i in range(30)]
+    # Columns are views of the mapping, not private copies
+    assert isinstance(mapped.urgency.base, np.memmap)
+    assert mapped.id_to_index.get("item17") == 17 and "nope" not in mapped.id_to_index
+
+
+def test_shared_id_index_handles_collisions():
+    ids = [f"id{i}" for i in range(1000)]
+    index = shared_catalog.SharedIdIndex(shared_catalog.SharedIdIndex.build(ids), ids)
+    assert all(index[item_id] == position for position, item_id in enumerate(ids))
+    assert index.get("id1000") is None
+
+
+def test_stores_share_published_versions(tmp_path):
+    source = tmp_path / "items.jsonl"
+    source.write_text("".join(json.dumps(record) + "\n" for record in make_records(10)))
+    shared = str(tmp_path / "shared")
+    first = CatalogStore(str(source), shared_dir=shared)
+    second = CatalogStore(str(source), shared_dir=shared)
+    # The second worker maps what the first published instead of publishing again
+    assert first.current.version == second.current.version == 1
+
+    source.write_text("".join(json.dumps(record) + "\n" for record in make_records(12)))
+    first.reload()
+    assert second.source_changed()
+    assert len(second.reload().catalog) == 12
+    assert second.current.version == first.current.version == 2
+
+
+def test_edits_are_published_to_other_workers(tmp_path):
+    source = tmp_path / "items.jsonl"
+    source.write_text("".join(json.dumps(record) + "\n" for record in make_records(10)))
+    shared = str(tmp_path / "shared")
+    first = CatalogStore(str(source), shared_dir=shared)
+    second = CatalogStore(str(source), shared_dir=shared)
+    names = os.stat(os.path.join(shared, "v1", "names.data.npy"))
+    prices = os.stat(os.path.join(shared, "v1", "current_price.npy"))
+    before = second.current
+
+    def change(draft):
+        draft.catalog.update_item(np.array([3]), stock_count=np.array([99]))
+        draft.refresh_items([3])
+        return True
+
+    edited = first.edit(change)
+    assert edited.version == 2 and first.current is edited
+    assert second.source_changed()
+    followed = second.reload()
+    assert followed.catalog.stock[3] == 99
+    # The other worker builds on the snapshot it had instead of loading from scratch
+    assert followed.source_version == before.source_version == 1
+    assert followed.catalog.layout is before.catalog.layout
+    # An edit is not a change of the source file, so nobody republishes the file over it
+    assert not first.source_changed() and not second.source_changed()
+    # Only changed columns are rewritten; text and the rest are linked from the previous version
+    assert os.stat(os.path.join(shared, "v2", "names.data.npy")).st_ino == names.st_ino
+    assert os.stat(os.path.join(shared, "v2", "current_price.npy")).st_ino == prices.st_ino
+    assert np.load(os.path.join(shared, "v2", "stock.npy"))[3] == 99
+
+
+def test_edit_builds_on_the_latest_published_version(tmp_path):
+    source = tmp_path / "items.jsonl"
+    source.write_text("".join(json.dumps(record) + "\n" for record in make_records(10)))
+    shared = str(tmp_path / "shared")
+    first = CatalogStore(str(source), shared_dir=shared)
+    second = CatalogStore(str(source), shared_dir=shared)
+
+    def set_stock(position, value):
+        def change(draft):
+            draft.catalog.update_item(np.array([position]), stock_count=np.array([value]))
+            draft.refresh_items([position])
+            return True
+        return change
+
+    first.edit(set_stock(1, 50))
+    # `second` has not reloaded yet; its edit must keep the first one
+    second.edit(set_stock(2, 60))
+    assert second.current.version == 3
+    assert second.current.catalog.stock[1] == 50 and second.current.catalog.stock[2] == 60
+
+
+def test_mapping_retries_when_the_current_version_is_removed(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    assert shared_catalog.map_current(directory) is None
+    with shared_catalog.publish_lock(directory):
+        stale = shared_catalog.publish(CatalogArrays.from_records(make_records(5)), directory, 1.0)
+        shared_catalog.publish(CatalogArrays.from_records(make_records(6)), directory, 2.0)
+    # CURRENT was read just before the next publish removed the version it named
+    reads = [stale]
+    read_manifest = shared_catalog.read_manifest
+    monkeypatch.setattr(shared_catalog, "read_manifest", lambda directory: reads.pop() if reads else read_manifest(directory))
+    manifest, catalog = shared_catalog.map_current(directory)
+    assert manifest["version"] == 2 and len(catalog) == 6
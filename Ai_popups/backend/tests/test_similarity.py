@@ -0,0 +1,64 @@
+import numpy as np
+
+from catalog import CatalogArrays
+from conftest import make_records
+from similarity import NeighborTable, build_neighbors, load_neighbors
+
+
+def catalog_with_text():
+    records = make_records(6)
+    texts = [
+        ("Wireless Headphones", "Noise cancelling wireless headphones"),
+        ("Bluetooth Headphones", "Wireless bluetooth headphones with mic"),
+        ("Garden Hose", "Expandable garden hose"),
+        ("Yoga Mat", "Non-slip yoga mat"),
+        ("Desk Lamp", "LED desk lamp"),
+        ("Garden Gloves", "Garden gloves for pruning"),
+    ]
+    for record, (name, description) in zip(records, texts):
+        record.update(name=name, description=description)
+    return CatalogArrays.from_records(records)
+
+
+def neighbors_of(table: NeighborTable, position: int):
+    return table.indices[table.indptr[position]:table.indptr[position + 1]].tolist()
+
+
+def test_items_sharing_terms_are_neighbors():
+    table = build_neighbors(catalog_with_text(), top_n=2)
+    assert neighbors_of(table, 0)[0] == 1
+    assert 5 in neighbors_of(table, 2)
+    # Never its own neighbor, and at most top_n each
+    assert all(position not in neighbors_of(table, position) for position in range(len(table)))
+    assert max(np.diff(table.indptr)) <= 2
+
+
+def test_saved_table_remaps_onto_a_reordered_catalog(tmp_path):
+    catalog = catalog_with_text()
+    path = str(tmp_path / "similarity.npz")
+    build_neighbors(catalog).save(path)
+    table = load_neighbors(path)
+    # Same items in reverse order, minus the last one
+    reordered = CatalogArrays.from_items([catalog.item(i) for i in range(4, -1, -1)])
+    mapped = table.for_catalog(reordered)
+    assert len(mapped) == 5
+    headphones, other = reordered.id_to_index[catalog.ids[0]], reordered.id_to_index[catalog.ids[1]]
+    assert other in neighbors_of(mapped, headphones)
+    assert all(0 <= position < 5 for position in mapped.indices)
+
+
+def test_boost_sums_neighbor_scores_over_candidates():
+    table = NeighborTable(
+        ["a", "b", "c", "d"],
+        np.array([0, 2, 3, 3, 3]),
+        np.array([1, 2, 2], dtype=np.int32),
+        np.array([0.5, 0.25, 0.375], dtype=np.float32),
+    )
+    candidates = np.array([1, 2, 3])
+    assert table.boost(np.array([0, 1]), candidates).tolist() == [0.5, 0.625, 0.0]
+    assert table.boost(np.array([], dtype=np.int64), candidates).tolist() == [0.0, 0.0, 0.0]
+
+
+def test_missing_table_turns_the_boost_off(tmp_path):
+    assert load_neighbors(str(tmp_path / "none.npz")) is None
+    assert load_neighbors(None) is None
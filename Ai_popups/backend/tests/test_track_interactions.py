@@ -0,0 +1,25 @@
+import json
+
+
+def test_batch_is_accepted(client):
+    events = [{"user_id": "u", "action": "popup_shown", "timestamp": "2024-01-01T00:00:00Z", "data": {"item_id": "1"}}]
+    response = client.post("/api/track-interactions", content=json.dumps(events), headers={"Content-Type": "text/plain"})
+    assert response.status_code == 200
+    assert response.json()["message"] == "1 interactions tracked"
+
+
+def test_oversized_batch_is_refused_before_validation(client, app_module):
+    # Invalid events: a 422 here would mean they were validated before the count check
+    events = [{"bogus": True}] * (app_module.MAX_INTERACTION_BATCH + 1)
+    response = client.post("/api/track-interactions", content=json.dumps(events))
+    assert response.status_code == 413
+
+
+def test_oversized_body_is_refused_before_parsing(client, app_module):
+    response = client.post("/api/track-interactions", content=b"[" + b" " * app_module.MAX_INTERACTION_BODY_BYTES + b"]")
+    assert response.status_code == 413
+
+
+def test_malformed_batch_is_rejected(client):
+    assert client.post("/api/track-interactions", content=b"not json").status_code == 422
+    assert client.post("/api/track-interactions", content=b'[{"user_id": "u"}]').status_code == 422
@@ -0,0 +1,64 @@
+import numpy as np
+
+import shared_catalog
+from catalog import DAY_SECONDS, CatalogArrays
+from catalog_store import CatalogSnapshot, CatalogStore
+from conftest import make_records
+from urgency import UrgencyRefresher, recompute_urgency, refresh_urgency, urgency_score, urgency_scores
+
+NOW = 1_700_000_000.0
+
+
+def test_vectorized_scores_match_the_scalar_formula():
+    stock = np.array([0, 3, 9, 10, 25])
+    days_left = np.array([0.0, 1.5, 6.9, 7.0, 30.0])
+    assert urgency_scores(stock, days_left).tolist() == [urgency_score(s, d) for s, d in zip(stock.tolist(), days_left.tolist())]
+
+
+def test_recompute_derives_days_and_urgency_from_removal_times():
+    catalog = CatalogArrays.from_records(make_records(3, removal_at=NOW + 2.5 * DAY_SECONDS, stock_count=1))
+    changed = recompute_urgency(catalog, NOW)
+    assert changed.tolist() == [0, 1, 2]
+    assert catalog.days.tolist() == [3, 3, 3]
+    assert catalog.urgency[0] == urgency_score(1, 2.5)
+    # Nothing changes when recomputed at the same moment
+    assert len(recompute_urgency(catalog, NOW)) == 0
+
+
+def test_shared_columns_become_private_before_a_pass(tmp_path):
+    catalog = CatalogArrays.from_records(make_records(20, removal_at=NOW + DAY_SECONDS))
+    with shared_catalog.publish_lock(str(tmp_path)):
+        manifest = shared_catalog.publish(catalog, str(tmp_path), 1.0)
+    snapshot = CatalogSnapshot(shared_catalog.map_catalog(str(tmp_path), manifest), version=1)
+    refresh_urgency(snapshot, NOW)
+    mapped = snapshot.catalog
+    for column in ("urgency", "days"):
+        assert getattr(mapped, column).flags.owndata
+    # Columns the pass doesn't write stay mapped
+    assert isinstance(mapped.stock.base, np.memmap)
+    np.testing.assert_array_equal(mapped.days, np.ones(20))
+    # The published files are untouched for other workers
+    fresh = shared_catalog.map_catalog(str(tmp_path), manifest)
+    np.testing.assert_array_equal(fresh.days, catalog.days)
+
+
+def test_far_removal_times_do_not_overflow_days():
+    catalog = CatalogArrays.from_records(make_records(2))
+    catalog.removal_at[:] = [np.inf, 1e300]
+    recompute_urgency(catalog, NOW)
+    assert catalog.days.tolist() == [1_000_000, 1_000_000]
+
+
+def test_pass_over_the_current_snapshot_swaps_in_a_copy():
+    store = CatalogStore.from_catalog(CatalogArrays.from_records(make_records(20, removal_at=NOW + 2 * DAY_SECONDS, stock_count=30)))
+    before = store.current
+    urgency = before.catalog.urgency.copy()
+    refresher = UrgencyRefresher(store, 60, clock=lambda: NOW + DAY_SECONDS)
+    assert refresher.refresh() == 20
+    after = store.current
+    # Requests still reading the previous snapshot see none of the pass
+    assert after is not before and np.array_equal(before.catalog.urgency, urgency)
+    assert after.catalog.days.tolist() == [1] * 20 and after.catalog.urgency[0] == urgency_score(30, 1.0)
+    assert after.version == before.version and after.revision != before.revision and not after.edited
+    # Nothing to change, nothing swapped
+    assert refresher.refresh() == 0 and store.current is after
@@ -0,0 +1,25 @@
+import math
+from datetime import datetime, timezone
+
+# Latest moment datetime can represent (9999-12-31T23:59:59Z); later removal times are rejected
+MAX_TIMESTAMP = 253402300799.0
+
+
+def parse_timestamp(value) -> float:
+    """Unix seconds from a number or an ISO-8601 string (UTC unless it has an offset); NaN if absent.
+
+    Raises ValueError for NaN, infinities and times outside 1970-9999, which
+    would otherwise overflow the integer days-until-removal column.
+    """
+    if value is None or value == "":
+        return float("nan")
+    try:
+        seconds = float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        seconds = moment.timestamp()
+    if not math.isfinite(seconds) or not 0 <= seconds <= MAX_TIMESTAMP:
+        raise ValueError(f"Timestamp out of range: {value!r}")
+    return seconds
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from catalog import DAY_SECONDS, CatalogArrays
+from catalog_store import LOCAL_COLUMNS, CatalogSnapshot, CatalogStore
+
+logger = logging.getLogger("clearance")
+
+# Stock at or above this level, and removal at least this many days away, add no urgency
+URGENCY_STOCK_LEVEL = 10
+URGENCY_HORIZON_DAYS = 7
+STOCK_WEIGHT = 0.6
+TIME_WEIGHT = 0.4
+
+# Days until removal are capped here (about 2700 years)
+MAX_DAYS_LEFT = 1_000_000
+
+# Scores are rounded so an item's urgency only changes every ~25 minutes as its removal
+# approaches, instead of on every pass; that keeps cached responses valid between changes
+URGENCY_DECIMALS = 3
+
+
+def urgency_score(stock_count: int, days_left: float) -> float:
+    """Urgency from stock and (possibly fractional) days until removal"""
+    stock_factor = max(0, (URGENCY_STOCK_LEVEL - stock_count) / URGENCY_STOCK_LEVEL)
+    time_factor = max(0, (URGENCY_HORIZON_DAYS - days_left) / URGENCY_HORIZON_DAYS)
+    # np.round rather than round() so single items match the vectorized pass exactly
+    return float(np.round(min(1.0, (stock_factor * STOCK_WEIGHT) + (time_factor * TIME_WEIGHT)), URGENCY_DECIMALS))
+
+
+def urgency_scores(stock: np.ndarray, days_left: np.ndarray) -> np.ndarray:
+    """Vectorized urgency_score over whole columns"""
+    stock_factor = np.maximum(0, (URGENCY_STOCK_LEVEL - stock) / URGENCY_STOCK_LEVEL)
+    time_factor = np.maximum(0, (URGENCY_HORIZON_DAYS - days_left) / URGENCY_HORIZON_DAYS)
+    return np.round(np.minimum(1.0, (stock_factor * STOCK_WEIGHT) + (time_factor * TIME_WEIGHT)), URGENCY_DECIMALS)
+
+
+def recompute_urgency(catalog: CatalogArrays, now: float, indices: Optional[np.ndarray] = None) -> np.ndarray:
+    """Rewrite urgency and days-until-removal from removal times and stock, for every item or
+    only those at `indices`; returns the positions that changed"""
+    removal_at, stock, current_urgency, current_days = catalog.removal_at, catalog.stock, catalog.urgency, catalog.days
+    if indices is not None:
+        indices = np.asarray(indices, dtype=np.int64)
+        removal_at, stock = removal_at[indices], stock[indices]
+        current_urgency, current_days = current_urgency[indices], current_days[indices]
+    # Capped before the integer cast so no removal time can overflow the days column
+    days_left = np.fmin(np.fmax(removal_at - now, 0.0) / DAY_SECONDS, MAX_DAYS_LEFT)
+    days = np.ceil(days_left).astype(np.int64)
+    urgency = urgency_scores(stock, days_left)
+    changed = (urgency != current_urgency) | (days != current_days)
+    positions = np.flatnonzero(changed) if indices is None else indices[changed]
+    # Only changed entries are written, so a mapped column (per-item updates) copies few pages
+    catalog.urgency[positions] = urgency[changed]
+    catalog.days[positions] = days[changed]
+    return positions
+
+
+def privatize_columns(catalog: CatalogArrays, columns: Sequence[str] = ("urgency", "days")):
+    """Replace columns mapped from the shared catalog directory with private copies.
+
+    Urgency passes rewrite these columns as removal times approach, which
+    would copy their pages into every worker one by one anyway. Copying them
+    once up front (16 bytes per item per process) leaves every other
+    column's pages shared.
+    """
+    for column in columns:
+        values = getattr(catalog, column)
+        if isinstance(values, np.memmap) or isinstance(values.base, np.memmap):
+            setattr(catalog, column, np.array(values))
+
+
+def refresh_urgency(snapshot: CatalogSnapshot, now: float) -> int:
+    """One full pass over a snapshot in place, keeping its indexes and caches in step; returns
+    items changed. Only for snapshots no other thread reads, like one not swapped in yet."""
+    privatize_columns(snapshot.catalog)
+    changed = recompute_urgency(snapshot.catalog, now)
+    snapshot.refresh_items(changed, bands=("urgency",))
+    return len(changed)
+
+
+class UrgencyRefresher:
+    """Keeps urgency and days-until-removal live for the store's snapshots.
+
+    The current snapshot gets a vectorized pass every `interval` seconds and
+    reloaded snapshots get one before they are swapped in. A pass over the
+    current snapshot writes a copy of the urgency and days columns that is
+    swapped in whole (see CatalogStore.edit), so a request, on the event loop
+    or in a scoring thread, never sees half of one. An interval of 0 keeps
+    the urgency scores from the catalog.
+    """
+
+    def __init__(self, store: CatalogStore, interval: float, clock: Callable[[], float] = time.time):
+        self.store = store
+        self.interval = interval
+        self.clock = clock
+        self.passes = 0
+        self.items_changed = 0
+        self.last_pass_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+        if self.enabled:
+            store.prepare(self.refresh)
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def refresh(self, snapshot: Optional[CatalogSnapshot] = None) -> int:
+        """One pass over `snapshot`, in place, or else over a copy of the current one. Blocking."""
+        t0 = time.perf_counter()
+        now = self.clock()
+        if snapshot is not None:
+            changed = refresh_urgency(snapshot, now)
+        else:
+            changed = self._refresh_current(now)
+        self.last_pass_seconds = time.perf_counter() - t0
+        self.passes += 1
+        self.items_changed += changed
+        return changed
+
+    def _refresh_current(self, now: float) -> int:
+        changed: List[int] = []
+
+        def change(draft: CatalogSnapshot) -> bool:
+            positions = recompute_urgency(draft.catalog, now)
+            draft.refresh_items(positions, bands=("urgency",))
+            changed.append(len(positions))
+            return len(positions) > 0
+
+        # Local: each process derives urgency itself, so nothing is published or forwarded
+        self.store.edit(change, LOCAL_COLUMNS, local=True)
+        return changed[0]
+
+    def recompute_items(self, snapshot: CatalogSnapshot, indices: Sequence[int]):
+        """Recompute items after a stock or removal change; the caller refreshes the indexes"""
+        if self.enabled:
+            recompute_urgency(snapshot.catalog, self.clock(), indices)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # Off the loop: the pass waits behind any reload or edit in progress
+                changed = await loop.run_in_executor(None, self.refresh)
+            except Exception:
+                logger.exception("Urgency refresh failed")
+            else:
+                logger.debug("Urgency refresh changed %d items in %.3fs", changed, self.last_pass_seconds)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            # The snapshot loaded at startup still carries the catalog's scores
+            self.refresh()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -56,6 +56,13 @@ if %errorlevel% neq 0 (
 
 echo ✅ Backend dependencies installed
 
+:: Build the item similarity table used to boost items like the ones a shopper viewed
+echo Building item similarity table...
+python similarity.py data\clearance_items.jsonl data\similarity.npz
+if %errorlevel% neq 0 (
+    echo ⚠️ Similarity table build failed; popups will be served without the similar-items boost
+)
+
 cd ..
 
 echo 🎉 Setup complete!
@@ -63,6 +63,14 @@ fi
 
 echo "✅ Backend dependencies installed"
 
+# Build the item similarity table used to boost items like the ones a shopper viewed
+echo "Building item similarity table..."
+python similarity.py data/clearance_items.jsonl data/similarity.npz
+
+if [ $? -ne 0 ]; then
+    echo "⚠️ Similarity table build failed; popups will be served without the similar-items boost"
+fi
+
 cd ..
 
 echo "🎉 Setup complete!"
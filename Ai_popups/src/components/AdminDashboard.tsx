@@ -14,12 +14,17 @@ interface AnalyticsData {
   }>
 }
 
+const ANALYTICS_REFRESH_MS = 15000
+
 export function AdminDashboard() {
   const [analytics, setAnalytics] = useState<AnalyticsData | null>(null)
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
     fetchAnalytics()
+    // Summary is served from running counters, so polling is cheap
+    const refresh = setInterval(fetchAnalytics, ANALYTICS_REFRESH_MS)
+    return () => clearInterval(refresh)
   }, [])
 
   const fetchAnalytics = async () => {
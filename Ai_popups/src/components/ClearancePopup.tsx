@@ -35,6 +35,11 @@ export function ClearancePopup() {
     hidePopup()
   }
 
+  const handleViewItem = (item: any) => {
+    // A closer look at a popup item counts as a view, like opening it in the store
+    trackInteraction('view', { item_id: item.id })
+  }
+
   const handleAddToCart = (item: any, discount: number) => {
     // Add to cart
     addToCart({
@@ -118,7 +123,7 @@ export function ClearancePopup() {
                 {popupData.items.map((item, idx) => (
                   <div className="popup-layout" key={item.id}>
                     {/* Product Image */}
-                    <div className="popup-image">
+                    <div className="popup-image" onClick={() => handleViewItem(item)}>
                       <img 
                         src={item.image_url || '/placeholder.jpg'} 
                         alt={item.name}
@@ -133,7 +138,7 @@ export function ClearancePopup() {
                     </div>
                     {/* Product Details */}
                     <div className="popup-details">
-                      <h4 className="product-name">{item.name}</h4>
+                      <h4 className="product-name" onClick={() => handleViewItem(item)}>{item.name}</h4>
                       <p className="product-description">{item.description}</p>
                       {/* Price */}
                       <div className="price-section">
@@ -805,7 +805,7 @@ const CATEGORY_PRODUCTS: Record<string, any[]> = {
 }
 
 export function MockStore() {
-  const { showPopup, updateUserProfile, userProfile, popupsDisabled, enablePopups } = usePopup()
+  const { showPopup, updateUserProfile, userProfile, popupsDisabled, enablePopups, trackInteraction } = usePopup()
   const { addToCart } = useCart()
   const [viewedItems, setViewedItems] = useState<Set<string>>(new Set())
   const [selectedCategory, setSelectedCategory] = useState<string | null>(null)
@@ -837,6 +837,8 @@ export function MockStore() {
     if (!viewedItems.has(product.id)) {
       setViewedItems(prev => new Set([...prev, product.id]))
     }
+    // Viewed items boost similar clearance items in later popups
+    trackInteraction('view', { item_id: product.id })
   }
 
   const handleTriggerPopup = () => {
@@ -1,4 +1,4 @@
-import { createContext, useContext, useState, useEffect, type ReactNode } from 'react'
+import { createContext, useContext, useState, useEffect, useRef, type ReactNode } from 'react'
 import axios from 'axios'
 
 // Types
@@ -56,15 +56,71 @@ const defaultUserProfile: UserProfile = {
 
 const API_BASE = 'http://localhost:8000'
 
+// Number of items requested per popup
+const POPUP_ITEM_COUNT = 1
+
+// Interaction events are buffered and sent in batches
+const INTERACTION_FLUSH_MS = 5000
+const INTERACTION_BATCH_SIZE = 20
+
+// Lengths of the profile histories the server's session already holds, and the
+// session version they belong to (deltas are only applied to that version)
+interface SyncedProfile {
+  browsing: number
+  purchase: number
+  sessionId: string
+  version: string
+}
+
+// True when next only appends to prev, so the new tail can be sent as a delta
+const extendsHistory = (prev: string[], next: string[]) =>
+  next.length >= prev.length && prev.every((entry, i) => next[i] === entry)
+
+interface InteractionEvent {
+  user_id: string
+  action: string
+  timestamp: string
+  data?: any
+}
+
+// Send a batch of events, preferring sendBeacon so it survives page unloads.
+// A text/plain body keeps the beacon a simple CORS request.
+const sendInteractions = (events: InteractionEvent[]) => {
+  const url = `${API_BASE}/api/track-interactions`
+  const body = JSON.stringify(events)
+  if (navigator.sendBeacon && navigator.sendBeacon(url, new Blob([body], { type: 'text/plain' }))) {
+    return
+  }
+  axios.post(url, body, { headers: { 'Content-Type': 'text/plain' } }).catch((error) => {
+    console.error('Failed to track interactions:', error)
+  })
+}
+
 export function PopupProvider({ children }: { children: ReactNode }) {
   const [popupData, setPopupData] = useState<PopupData | null>(null)
   const [userProfile, setUserProfile] = useState<UserProfile>(defaultUserProfile)
   const [isPopupVisible, setIsPopupVisible] = useState(false)
   const [popupsDisabled, setPopupsDisabled] = useState(false)
   const [shownPopupsThisSession, setShownPopupsThisSession] = useState<Set<string>>(new Set())
+  const pendingInteractions = useRef<InteractionEvent[]>([])
+  // null until the server has our full profile; afterwards only new history entries are sent
+  const syncedProfile = useRef<SyncedProfile | null>(null)
+  // Id the server issued for our session; resending the full profile with it keeps
+  // the items already shown in that session
+  const sessionId = useRef<string | null>(null)
 
   const updateUserProfile = (updates: Partial<UserProfile>) => {
-    setUserProfile(prev => ({ ...prev, ...updates }))
+    setUserProfile(prev => {
+      const next = { ...prev, ...updates }
+      if (!extendsHistory(prev.browsing_history, next.browsing_history) ||
+          !extendsHistory(prev.purchase_history, next.purchase_history) ||
+          updates.preferences || updates.user_id) {
+        // Not expressible as a delta: resend the whole profile next time
+        syncedProfile.current = null
+        if (updates.user_id) sessionId.current = null
+      }
+      return next
+    })
   }
 
   const disablePopups = () => {
@@ -80,19 +136,42 @@ export function PopupProvider({ children }: { children: ReactNode }) {
     trackInteraction('popups_enabled', { user_id: userProfile.user_id })
   }
 
-  const trackInteraction = async (action: string, data?: any) => {
-    try {
-      await axios.post(`${API_BASE}/api/track-interaction`, {
-        user_id: userProfile.user_id,
-        action,
-        timestamp: new Date().toISOString(),
-        data
-      })
-    } catch (error) {
-      console.error('Failed to track interaction:', error)
+  const flushInteractions = () => {
+    if (pendingInteractions.current.length === 0) return
+    const events = pendingInteractions.current
+    pendingInteractions.current = []
+    sendInteractions(events)
+  }
+
+  const trackInteraction = (action: string, data?: any) => {
+    pendingInteractions.current.push({
+      user_id: userProfile.user_id,
+      action,
+      timestamp: new Date().toISOString(),
+      data
+    })
+    if (pendingInteractions.current.length >= INTERACTION_BATCH_SIZE) {
+      flushInteractions()
     }
   }
 
+  // Flush buffered interactions periodically and when the page is hidden
+  useEffect(() => {
+    const flushTimer = setInterval(flushInteractions, INTERACTION_FLUSH_MS)
+    const onVisibilityChange = () => {
+      if (document.visibilityState === 'hidden') flushInteractions()
+    }
+    window.addEventListener('pagehide', flushInteractions)
+    document.addEventListener('visibilitychange', onVisibilityChange)
+
+    return () => {
+      clearInterval(flushTimer)
+      window.removeEventListener('pagehide', flushInteractions)
+      document.removeEventListener('visibilitychange', onVisibilityChange)
+      flushInteractions()
+    }
+  }, [])
+
   const fetchPopupRecommendation = async (currentPage: string = 'home', targetCategory?: string) => {
     try {
       // Don't show popups if disabled
@@ -103,12 +182,48 @@ export function PopupProvider({ children }: { children: ReactNode }) {
 
       console.log('Fetching popup recommendation for user:', userProfile)
       console.log('Target category:', targetCategory)
-      const response = await axios.post(`${API_BASE}/api/popup`, {
-        user_profile: userProfile,
-        current_page: currentPage,
-        target_category: targetCategory,
-        session_data: { shown_popups: Array.from(shownPopupsThisSession) }
-      })
+      // The server keeps the profile and shown items per session, so after the
+      // first request only the id and any new history entries are sent
+      const requestPopup = () => {
+        const synced = syncedProfile.current
+        const sessionFields = synced
+          ? {
+              session_id: synced.sessionId,
+              base_version: synced.version,
+              profile_delta: {
+                browsing_history: userProfile.browsing_history.slice(synced.browsing),
+                purchase_history: userProfile.purchase_history.slice(synced.purchase)
+              }
+            }
+          : { user_profile: userProfile, session_id: sessionId.current ?? undefined }
+        return axios.post(`${API_BASE}/api/popup`, {
+          ...sessionFields,
+          current_page: currentPage,
+          target_category: targetCategory,
+          count: POPUP_ITEM_COUNT
+        })
+      }
+      let response
+      try {
+        response = await requestPopup()
+      } catch (error) {
+        if (!axios.isAxiosError(error) || error.response?.status !== 409) throw error
+        // The server dropped our session (expired or restarted) or holds a different
+        // version of it (another worker): resend the full profile
+        syncedProfile.current = null
+        response = await requestPopup()
+      }
+      const version = response.headers['x-session-version']
+      const issuedId = response.headers['x-session-id']
+      sessionId.current = issuedId ?? null
+      syncedProfile.current = version && issuedId
+        ? {
+            browsing: userProfile.browsing_history.length,
+            purchase: userProfile.purchase_history.length,
+            sessionId: issuedId,
+            version
+          }
+        : null
       const popupResponse: PopupData = response.data
       console.log('Popup response received:', popupResponse)
       
@@ -120,8 +235,9 @@ export function PopupProvider({ children }: { children: ReactNode }) {
           return
         }
         
-        // Add to shown popups set
-        setShownPopupsThisSession(prev => new Set([...prev, itemId]))
+        // Add every shown item to the shown popups set
+        const itemIds = popupResponse.items.map((item) => item.id)
+        setShownPopupsThisSession(prev => new Set([...prev, ...itemIds]))
         
         setPopupData(popupResponse)
         setIsPopupVisible(true)